@@ -0,0 +1,104 @@
+# benchmarks/bench_filename_dates.py
+# Compara el motor de fechas por nombre (metadata_reader.parse_dates) con el
+# extractor anterior de cuatro expresiones regulares buscadas una tras otra.
+#
+# Uso:
+#   python benchmarks/bench_filename_dates.py [--names 1000000] [--unique 0.6]
+#
+# --unique es la fracción de nombres distintos (el resto se repite, como pasa
+# cuando fotos y vídeos o el vigilante vuelven a preguntar por el mismo archivo).
+
+import argparse
+import gc
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metadata_reader
+
+
+def legacy_parse_date_from_filename(filepath):
+    """Copia del extractor original de visagevault.py (referencia para comparar)."""
+    filename = os.path.basename(filepath)
+    match = re.search(r'(20\d{2})(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])', filename)
+    if match:
+        return match.group(1), match.group(2)
+    match = re.search(r'(0[1-9]|[12]\d|3[01])[-._](0[1-9]|1[0-2])[-._](20\d{2})', filename)
+    if match:
+        return match.group(3), match.group(2)
+    match = re.search(r'(20\d{2})[-._](0[1-9]|1[0-2])[-._](0[1-9]|[12]\d|3[01])', filename)
+    if match:
+        return match.group(1), match.group(2)
+    match = re.search(r'(0[1-9]|[12]\d|3[01])(0[1-9]|1[0-2])(20\d{2})', filename)
+    if match:
+        return match.group(3), match.group(2)
+    return None, None
+
+
+TEMPLATES = (
+    "IMG-{y}{m}{d}-WA{n:04d}.jpg",               # WhatsApp Android
+    "IMG_{y}{m}{d}_{n:06d}.jpg",                 # Android
+    "PXL_{y}{m}{d}_{n:09d}.jpg",                 # Pixel
+    "Screenshot_{y}{m}{d}-{n:06d}.png",          # Captura Android
+    "Screenshot {y}-{m}-{d} at 10.{n:02d}.00.png",  # Captura macOS
+    "PHOTO-{y}-{m}-{d}-12-34-{n:02d}.jpg",       # WhatsApp iOS
+    "{y}-{m}-{d} 12.34.{n:02d}.jpg",             # Exportación de Fotos iOS
+    "{d}-{m}-{y}.jpg",
+    "IMG-{d}{m}{y}.jpg",
+    "DSC{n:05d}.JPG",                            # Sin fecha en el nombre
+    "IMG_{n:04d}.HEIC",                          # iPhone, sin fecha
+)
+
+
+def build_names(count, unique_ratio, seed=1234):
+    rng = random.Random(seed)
+    unique = max(1, int(count * unique_ratio))
+    pool = []
+    for n in range(unique):
+        template = rng.choice(TEMPLATES)
+        pool.append("/fotos/{}/".format(n % 500) + template.format(
+            y=rng.randint(2005, 2025), m=f"{rng.randint(1, 12):02d}",
+            d=f"{rng.randint(1, 28):02d}", n=n
+        ))
+    return [pool[rng.randrange(unique)] if i >= unique else pool[i] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del extractor de fechas por nombre")
+    parser.add_argument("--names", type=int, default=1_000_000, help="Nombres sintéticos")
+    parser.add_argument("--unique", type=float, default=0.6, help="Fracción de nombres distintos")
+    args = parser.parse_args()
+
+    names = build_names(args.names, args.unique)
+
+    # Igual que timeit: sin el recolector de basura, que añade ruido con listas de 1M tuplas
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    legacy = [legacy_parse_date_from_filename(p) for p in names]
+    legacy_time = time.perf_counter() - start
+
+    metadata_reader._parse_basename_date.cache_clear()
+    start = time.perf_counter()
+    engine = metadata_reader.parse_dates(names)
+    engine_time = time.perf_counter() - start
+    gc.enable()
+
+    # Las convenciones antiguas deben dar exactamente lo mismo
+    mismatches = [(p, a, b) for p, a, b in zip(names, legacy, engine) if a[0] and a != b]
+    if mismatches:
+        raise AssertionError(f"{len(mismatches)} diferencias, p.ej. {mismatches[:3]}")
+
+    print(f"{args.names} nombres ({args.unique:.0%} distintos)")
+    print(f"{'extractor':>12} {'segundos':>10} {'nombres/s':>12}")
+    print(f"{'4 regex':>12} {legacy_time:>10.3f} {args.names / legacy_time:>12.0f}")
+    print(f"{'parse_dates':>12} {engine_time:>10.3f} {args.names / engine_time:>12.0f}")
+    print(f"speedup: {legacy_time / engine_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_packed_store.py
+# Compara leer miniaturas como un JPEG suelto por archivo (open + read) frente
+# al almacén empaquetado de packed_store (índice SQLite + mmap), y el espacio
+# que ocupa cada uno en disco.
+#
+# Uso:
+#   python benchmarks/bench_packed_store.py [--items 20000] [--size 6000] [--reads 5000]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packed_store import PackedStore
+
+
+def disk_usage(root):
+    """Bytes ocupados en disco (bloques, no tamaño aparente) y número de archivos."""
+    total = files = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            st = os.stat(os.path.join(dirpath, name))
+            total += getattr(st, "st_blocks", 0) * 512 or st.st_size
+            files += 1
+    return total, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del almacén empaquetado de miniaturas")
+    parser.add_argument("--items", type=int, default=20000, help="Miniaturas del corpus")
+    parser.add_argument("--size", type=int, default=6000, help="Bytes de cada miniatura")
+    parser.add_argument("--reads", type=int, default=5000, help="Lecturas aleatorias a medir")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    keys = [f"{i:064x}_128" for i in range(args.items)]
+    sample = random.Random(0).choices(keys, k=args.reads)
+
+    with tempfile.TemporaryDirectory(prefix="vv_pack_") as root:
+        loose_dir = os.path.join(root, "loose")
+        os.mkdir(loose_dir)
+        start = time.perf_counter()
+        for key in keys:
+            with open(os.path.join(loose_dir, f"{key}.jpg"), "wb") as f:
+                f.write(payload)
+        loose_write = time.perf_counter() - start
+
+        store = PackedStore(os.path.join(root, "packed"))
+        start = time.perf_counter()
+        for offset in range(0, len(keys), 3):
+            store.put_many((key, payload) for key in keys[offset:offset + 3])
+        packed_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in sample:
+            with open(os.path.join(loose_dir, f"{key}.jpg"), "rb") as f:
+                f.read()
+        loose_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in sample:
+            store.get(key)
+        packed_read = time.perf_counter() - start
+
+        loose_bytes, loose_files = disk_usage(loose_dir)
+        packed_bytes, packed_files = disk_usage(store.directory)
+        store.close()
+
+    print(f"{args.items} miniaturas de {args.size} bytes, {args.reads} lecturas aleatorias")
+    print(f"{'almacén':<12} {'escritura s':>12} {'lecturas/s':>12} {'archivos':>9} {'MB en disco':>12}")
+    for name, write_s, read_s, files, size in (
+        ("sueltos", loose_write, loose_read, loose_files, loose_bytes),
+        ("empaquetado", packed_write, packed_read, packed_files, packed_bytes),
+    ):
+        print(f"{name:<12} {write_s:>12.2f} {args.reads / read_s:>12.0f} {files:>9} {size / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_thumbnails.py
+# Mide miniaturas por segundo con la decodificación completa de antes
+# (Image.open + load) frente a open_image_reduced (draft de libjpeg y
+# miniatura EXIF embebida), sobre un corpus sintético de JPEG grandes.
+#
+# Uso:
+#   python benchmarks/bench_thumbnails.py [--images 20] [--width 6000] [--height 4000] [--exif-thumb 320]
+#
+# --exif-thumb 0 genera los JPEG sin miniatura EXIF (solo se mide el draft).
+
+import argparse
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import thumbnail_generator
+
+
+def build_exif_with_thumbnail(thumb_jpeg: bytes) -> bytes:
+    """Bloque APP1 mínimo: IFD0 vacía + IFD1 apuntando a la miniatura."""
+    ifd1_offset = 8 + 2 + 4
+    data_offset = ifd1_offset + 2 + 2 * 12 + 4
+    tiff = b"II*\x00" + struct.pack("<I", 8)
+    tiff += struct.pack("<H", 0) + struct.pack("<I", ifd1_offset)
+    tiff += struct.pack("<H", 2)
+    tiff += struct.pack("<HHII", 0x0201, 4, 1, data_offset)
+    tiff += struct.pack("<HHII", 0x0202, 4, 1, len(thumb_jpeg))
+    tiff += struct.pack("<I", 0)
+    return b"Exif\x00\x00" + tiff + thumb_jpeg
+
+
+def build_corpus(root, count, width, height, exif_thumb):
+    """JPEG con degradado y textura (comprimen como una foto, no como un color plano)."""
+    paths = []
+    base = Image.radial_gradient("L").resize((width, height))
+    # Ruido a 1/4 y ampliado: textura con detalle fino, pero sin el grano
+    # por píxel que ninguna foto real tiene (inflaría la decodificación)
+    noise = Image.effect_noise((width // 4, height // 4), 40).resize((width, height), Image.BICUBIC)
+    image = Image.merge("RGB", (base, noise, Image.linear_gradient("L").resize((width, height))))
+    for i in range(count):
+        path = os.path.join(root, f"IMG_{i:04d}.jpg")
+        kwargs = {"quality": 90}
+        if exif_thumb:
+            thumb = image.copy()
+            thumb.thumbnail((exif_thumb, exif_thumb))
+            buffer = io.BytesIO()
+            thumb.save(buffer, "JPEG", quality=80)
+            kwargs["exif"] = build_exif_with_thumbnail(buffer.getvalue())
+        image.save(path, "JPEG", **kwargs)
+        paths.append(path)
+    return paths
+
+
+def legacy_open(path, target):
+    img = Image.open(path)
+    img.load()
+    return img
+
+
+def run(paths, open_func, target):
+    """Decodifica + pirámide completa, igual que generate_image_thumbnail."""
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        img = open_func(path, target)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        thumbnail_generator._save_image_pyramid(img, f"bench_{i}")
+        img.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación para miniaturas")
+    parser.add_argument("--images", type=int, default=20, help="Número de JPEG del corpus")
+    parser.add_argument("--width", type=int, default=6000, help="Ancho de cada JPEG")
+    parser.add_argument("--height", type=int, default=4000, help="Alto de cada JPEG")
+    parser.add_argument("--exif-thumb", type=int, default=320,
+                        help="Lado de la miniatura EXIF embebida (0 = sin miniatura)")
+    args = parser.parse_args()
+
+    target = max(thumbnail_generator.THUMBNAIL_LEVELS)
+    with tempfile.TemporaryDirectory(prefix="vv_thumbs_") as root:
+        corpus_dir = os.path.join(root, "corpus")
+        os.mkdir(corpus_dir)
+        # Caché aparte: el benchmark no toca la de la App
+        thumbnail_generator._cache_dir = Path(root) / "cache"
+        thumbnail_generator._cache_dir.mkdir()
+
+        print(f"Generando {args.images} JPEG de {args.width}x{args.height}...")
+        paths = build_corpus(corpus_dir, args.images, args.width, args.height, args.exif_thumb)
+
+        results = [
+            ("completa (antes)", run(paths, legacy_open, target)),
+            ("reducida (ahora)", run(paths, thumbnail_generator.open_image_reduced, target)),
+        ]
+
+    exif_note = f"miniatura EXIF de {args.exif_thumb}px" if args.exif_thumb else "sin miniatura EXIF"
+    print(f"{args.images} JPEG de {args.width * args.height / 1e6:.0f} MP, {exif_note}, "
+          f"niveles {thumbnail_generator.THUMBNAIL_LEVELS}")
+    print(f"{'decodificación':<18} {'segundos':>10} {'miniaturas/s':>13} {'speedup':>8}")
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print(f"{name:<18} {elapsed:>10.3f} {len(paths) / elapsed:>13.1f} {baseline / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_walker.py
+# Mide el recorrido de carpetas (photo_finder.scan_media) simulando la latencia
+# de un montaje de red (NFS/SMB) en cada llamada a os.scandir.
+#
+# Uso:
+#   python benchmarks/bench_walker.py [--latency-ms 5] [--dirs 300] [--files 20]
+#
+# Sirve para elegir DEFAULT_NETWORK_SCAN_WORKERS en photo_finder.py.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import photo_finder
+
+
+def build_tree(root, num_dirs, files_per_dir):
+    """Crea un árbol sintético de carpetas anidadas con fotos y vídeos vacíos."""
+    dirs = [root]
+    for i in range(num_dirs):
+        # Cada carpeta cuelga de una anterior: mezcla de profundidad y anchura
+        parent = dirs[i // 4]
+        path = os.path.join(parent, f"carpeta_{i:04d}")
+        os.mkdir(path)
+        dirs.append(path)
+        for j in range(files_per_dir):
+            ext = ".mp4" if j % 10 == 0 else ".jpg"
+            open(os.path.join(path, f"IMG_{i:04d}_{j:03d}{ext}"), "wb").close()
+
+
+def run_benchmark(root, latency_s, worker_counts):
+    original_scandir = os.scandir
+
+    def slow_scandir(path):
+        time.sleep(latency_s)  # Ida y vuelta simulada al servidor
+        return original_scandir(path)
+
+    os.scandir = slow_scandir
+    try:
+        reference = None
+        results = []
+        for workers in worker_counts:
+            start = time.perf_counter()
+            photos, videos, snapshot = photo_finder.scan_media(root, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            output = (set(photos), set(videos), set(snapshot))
+            if reference is None:
+                reference = output
+            elif output != reference:
+                raise AssertionError(f"workers={workers} devuelve un resultado distinto al serie")
+
+            results.append((workers, elapsed, len(photos), len(videos), len(snapshot)))
+        return results
+    finally:
+        os.scandir = original_scandir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del recorrido de carpetas")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Latencia simulada por scandir")
+    parser.add_argument("--dirs", type=int, default=300, help="Número de carpetas")
+    parser.add_argument("--files", type=int, default=20, help="Archivos por carpeta")
+    parser.add_argument("--workers", default="1,2,4,8,16,32", help="Lista de hilos a probar")
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="vv_bench_") as root:
+        build_tree(root, args.dirs, args.files)
+        results = run_benchmark(root, args.latency_ms / 1000.0, worker_counts)
+
+    print(f"Latencia simulada: {args.latency_ms} ms por scandir, "
+          f"{args.dirs + 1} carpetas, {args.files} archivos por carpeta")
+    print(f"{'hilos':>6} {'segundos':>10} {'carpetas/s':>11} {'speedup':>8}")
+    serial_time = results[0][1]
+    for workers, elapsed, _, _, num_dirs in results:
+        print(f"{workers:>6} {elapsed:>10.3f} {num_dirs / elapsed:>11.1f} {serial_time / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
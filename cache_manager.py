@@ -0,0 +1,232 @@
+# cache_manager.py
+# Gestor de las cachés de visagevault_cache: cada una tiene un presupuesto en
+# bytes y, en segundo plano, se desaloja lo usado hace más tiempo (LRU) hasta
+# volver a caber. Lleva también las estadísticas por caché (aciertos, tamaño,
+# desalojos) que enseña la App.
+#
+# Tres tipos de caché:
+# - Almacenes empaquetados (packed_store): miniaturas locales, de Drive y caras.
+#   El propio almacén cuenta aciertos/fallos y guarda el último acceso.
+# - Directorios de archivos sueltos (drive_cache: descargas completas de Drive).
+#   El último acceso es la fecha de modificación, que se actualiza al usarlos.
+# - En memoria (image_cache: imágenes decodificadas), que llevan su propio
+#   LRU y contadores; aquí solo se les da el presupuesto y se enseñan.
+#
+# Sin Qt: el hilo de mantenimiento cede el paso con scan_scheduler.
+
+import os
+import threading
+import time
+
+import config_manager
+from packed_store import compact_all
+from scan_scheduler import scheduler
+
+MB = 1024 * 1024
+
+# Presupuestos por defecto (se pueden cambiar en la configuración, en MB)
+DEFAULT_BUDGETS_MB = {
+    "local_snapshot_cache": 8192,
+    "drive_snapshot_cache": 1024,
+    "face_cache": 1024,
+    "drive_cache": 2048,
+    "decoded_images": 256,
+}
+# Al pasarse del presupuesto se recorta hasta esta fracción, para no desalojar en cada pasada
+EVICTION_TARGET_RATIO = 0.9
+# Proporción de espacio muerto con la que se compacta una caché que ocupa más que su presupuesto
+OVER_BUDGET_COMPACT_RATIO = 0.2
+# Cada cuánto se revisan los presupuestos y se compacta
+MAINTENANCE_INTERVAL_S = 300
+
+
+class StoreCache:
+    """Caché sobre un almacén empaquetado (packed_store.PackedStore)."""
+
+    def __init__(self, name, store, budget_bytes):
+        self.name = name
+        self.store = store
+        self.budget_bytes = budget_bytes
+
+    def size_bytes(self) -> int:
+        return self.store.stats()["bytes"]
+
+    def counters(self) -> dict:
+        return dict(self.store.counters)
+
+    def enforce_budget(self, checkpoint=None) -> int:
+        if self.size_bytes() <= self.budget_bytes:
+            return 0
+        # Tras compactar puede quedar hasta OVER_BUDGET_COMPACT_RATIO de espacio muerto
+        # por segmento: los datos vivos se recortan contando con ello
+        target = self.budget_bytes * EVICTION_TARGET_RATIO * (1 - OVER_BUDGET_COMPACT_RATIO)
+        evicted = self.store.evict(int(target), checkpoint)
+        # Lo desalojado es espacio muerto repartido por los segmentos: se recupera ya
+        self.store.compact(dead_ratio=OVER_BUDGET_COMPACT_RATIO, checkpoint=checkpoint)
+        return evicted
+
+
+class DirectoryCache:
+    """Caché de archivos sueltos en un directorio (sin subcarpetas)."""
+
+    def __init__(self, name, directory, budget_bytes):
+        self.name = name
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def lookup(self, path) -> bool:
+        """¿Está en caché? Cuenta el acierto/fallo y marca el uso (mtime) para el LRU."""
+        found = os.path.exists(path) and os.path.getsize(path) > 0
+        with self._lock:
+            self._counters["hits" if found else "misses"] += 1
+        if found:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return found
+
+    def _files(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        files = []
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                continue
+        return files
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def enforce_budget(self, checkpoint=None) -> int:
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.budget_bytes:
+            return 0
+        target = int(self.budget_bytes * EVICTION_TARGET_RATIO)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            if checkpoint:
+                checkpoint()
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._counters["evictions"] += evicted
+        return evicted
+
+
+class CacheManager:
+    """
+    Un único gestor por proceso (ver 'cache_manager' al final del módulo).
+
+        cache_manager.register_store("face_cache", open_store(ruta))
+        cache_manager.register_directory("drive_cache", ruta)
+        cache_manager.start_background_maintenance()
+        cache_manager.stats()   # para la ventana de estadísticas
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._caches = {}
+        self._thread = None
+
+    def _budget_bytes(self, name) -> int:
+        budget_mb = config_manager.get_cache_budgets_mb().get(name, DEFAULT_BUDGETS_MB.get(name, 1024))
+        return int(budget_mb * MB)
+
+    def register_store(self, name, store):
+        with self._lock:
+            self._caches[name] = StoreCache(name, store, self._budget_bytes(name))
+
+    def register_directory(self, name, directory):
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            cache = self._caches.get(name)
+            if isinstance(cache, DirectoryCache) and cache.directory == directory:
+                return
+            self._caches[name] = DirectoryCache(name, directory, self._budget_bytes(name))
+
+    def register_memory(self, cache):
+        """Caché en memoria con la misma interfaz (p.ej. image_cache.decoded_images)."""
+        cache.budget_bytes = self._budget_bytes(cache.name)
+        cache.enforce_budget()
+        with self._lock:
+            self._caches[cache.name] = cache
+
+    def get(self, name):
+        with self._lock:
+            return self._caches.get(name)
+
+    def set_budget_mb(self, name, budget_mb: int):
+        config_manager.set_cache_budget_mb(name, budget_mb)
+        cache = self.get(name)
+        if cache is not None:
+            cache.budget_bytes = int(budget_mb * MB)
+
+    def enforce_budgets(self, checkpoint=None) -> int:
+        with self._lock:
+            caches = list(self._caches.values())
+        evicted = 0
+        for cache in caches:
+            try:
+                evicted += cache.enforce_budget(checkpoint)
+            except Exception as e:
+                print(f"Error desalojando la caché {cache.name}: {e}")
+        return evicted
+
+    def stats(self) -> list:
+        """Una fila por caché: nombre, bytes, presupuesto, aciertos, fallos, tasa y desalojos."""
+        with self._lock:
+            caches = list(self._caches.values())
+        rows = []
+        for cache in caches:
+            counters = cache.counters()
+            lookups = counters["hits"] + counters["misses"]
+            rows.append({
+                "name": cache.name,
+                "bytes": cache.size_bytes(),
+                "budget_bytes": cache.budget_bytes,
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "hit_rate": counters["hits"] / lookups if lookups else None,
+                "evictions": counters["evictions"],
+            })
+        return rows
+
+    def _maintenance_loop(self, interval_s):
+        scheduler.enter("background_io")
+        while True:
+            time.sleep(interval_s)
+            self.enforce_budgets(checkpoint=scheduler.checkpoint)
+            compact_all(checkpoint=scheduler.checkpoint)
+
+    def start_background_maintenance(self, interval_s: float = MAINTENANCE_INTERVAL_S):
+        """Hilo (daemon) que aplica los presupuestos y compacta cada 'interval_s' segundos."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._maintenance_loop, args=(interval_s,), name="cache-maintenance", daemon=True
+            )
+            self._thread.start()
+
+
+cache_manager = CacheManager()
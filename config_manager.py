@@ -123,6 +123,28 @@ def get_config_path():
 
     return target_config
 
+def get_cache_root():
+    """
+    Carpeta visagevault_cache: junto al programa si es portable/desarrollo,
+    ~/.cache/visagevault/ si está instalado.
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if os.access(base_dir, os.W_OK):
+        return os.path.join(base_dir, "visagevault_cache")
+    user_home = os.path.expanduser("~")
+    return os.path.join(user_home, ".cache", "visagevault")
+
+def get_db_path():
+    """
+    Ruta de visagevault.db, con el mismo criterio que la configuración:
+    junto al programa si es portable/desarrollo, ~/.local/share/visagevault/ si está instalado.
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if os.access(base_dir, os.W_OK):
+        return os.path.join(base_dir, "visagevault.db")
+    user_home = os.path.expanduser("~")
+    return os.path.join(user_home, ".local", "share", "visagevault", "visagevault.db")
+
 def load_config():
     config_path = get_config_path()
     if not os.path.exists(config_path):
@@ -171,6 +193,38 @@ def set_drive_folder_id(folder_id):
     config['drive_folder_id'] = folder_id
     save_config(config)
 
+def get_scan_workers():
+    config = load_config()
+    # 0 = automático (en paralelo solo en montajes de red)
+    return config.get('scan_workers', 0)
+
+def set_scan_workers(workers):
+    config = load_config()
+    config['scan_workers'] = workers
+    save_config(config)
+
+def get_decode_processes():
+    config = load_config()
+    # 0 = desactivado (las miniaturas se decodifican en los hilos de la App)
+    return config.get('decode_processes', 0)
+
+def set_decode_processes(processes):
+    config = load_config()
+    config['decode_processes'] = processes
+    save_config(config)
+
+def get_cache_budgets_mb():
+    config = load_config()
+    # {nombre de caché: MB}; las que falten usan el valor por defecto de cache_manager
+    return config.get('cache_budgets_mb', {})
+
+def set_cache_budget_mb(cache_name, budget_mb):
+    config = load_config()
+    budgets = config.get('cache_budgets_mb', {})
+    budgets[cache_name] = budget_mb
+    config['cache_budgets_mb'] = budgets
+    save_config(config)
+
 # --- SEGURIDAD CAJA FUERTE ---
 
 def get_safe_password_hash():
@@ -40,6 +40,8 @@ class VisageVaultDB:
         if not self.is_worker:
             try:
                 self._connect_main_db()
+                self._create_tables()
+                self._check_migrations()
             except Exception as e:
                 print(f"Error inicializando DB: {e}")
 
@@ -185,7 +187,7 @@ class VisageVaultDB:
             videos_to_restore = []
 
             # Clasificación simple por extensión
-            VIDEO_EXTS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.mpeg', '.mpg')
+            VIDEO_EXTS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.mpeg', '.mpg', '.3gp', '.m4v')
 
             for r in rows:
                 path = r[0]
@@ -225,7 +227,11 @@ class VisageVaultDB:
                     year TEXT,
                     month TEXT,
                     scanned_for_faces INTEGER DEFAULT 0,
-                    is_hidden INTEGER DEFAULT 0
+                    is_hidden INTEGER DEFAULT 0,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER,
+                    dhash TEXT
                 )
             """)
             self.conn.execute("""
@@ -234,7 +240,10 @@ class VisageVaultDB:
                     filepath TEXT UNIQUE,
                     year TEXT,
                     month TEXT,
-                    is_hidden INTEGER DEFAULT 0
+                    is_hidden INTEGER DEFAULT 0,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER
                 )
             """)
             self.conn.execute("""
@@ -276,6 +285,50 @@ class VisageVaultDB:
                     original_date TEXT
                 )
             """)
+            # Foto del árbol de carpetas del último escaneo (re-escaneo incremental)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS directories (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT,
+                    mtime_ns INTEGER,
+                    photo_count INTEGER DEFAULT 0,
+                    video_count INTEGER DEFAULT 0,
+                    subdir_count INTEGER DEFAULT 0,
+                    scanned_at_ns INTEGER
+                )
+            """)
+            # Cola de checkpoint: archivos ya descubiertos por el recorrido pero aún
+            # sin fecha en photos/videos. Si la App se cierra a mitad de una primera
+            # importación, el siguiente arranque continúa desde aquí.
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS scan_queue (
+                    path TEXT PRIMARY KEY,
+                    is_video INTEGER DEFAULT 0,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER
+                )
+            """)
+
+            # Ajustes internos del escaneo (p.ej. firma de las reglas de exclusión)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS scan_settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+            # Miniaturas ya generadas en la caché de disco. La clave sale de ruta +
+            # tamaño + mtime: la galería resuelve las miniaturas válidas con una
+            # consulta, sin un stat por archivo.
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    filepath TEXT PRIMARY KEY,
+                    thumb_key TEXT NOT NULL,
+                    size INTEGER,
+                    mtime_ns INTEGER
+                )
+            """)
 
             # Índices
             self.conn.execute("CREATE INDEX IF NOT EXISTS idx_photos_hidden ON photos(is_hidden)")
@@ -285,6 +338,7 @@ class VisageVaultDB:
             self.conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_year_month ON videos(year, month)")
             self.conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_person ON faces(person_id)")
             self.conn.execute("CREATE INDEX IF NOT EXISTS idx_drive_parent ON drive_photos(parent_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_directories_parent ON directories(parent)")
 
     def _check_migrations(self):
         try:
@@ -294,12 +348,19 @@ class VisageVaultDB:
                 cols = [col['name'] for col in cursor.fetchall()]
                 if 'is_hidden' not in cols:
                     self.conn.execute("ALTER TABLE photos ADD COLUMN is_hidden INTEGER DEFAULT 0")
+                # Huella del archivo (detección de ediciones) y hash de duplicados
+                for col, col_type in (('size', 'INTEGER'), ('mtime_ns', 'INTEGER'), ('inode', 'INTEGER'), ('dhash', 'TEXT')):
+                    if col not in cols:
+                        self.conn.execute(f"ALTER TABLE photos ADD COLUMN {col} {col_type}")
 
                 # Migración VÍDEOS
                 cursor = self.conn.execute("PRAGMA table_info(videos)")
                 cols = [col['name'] for col in cursor.fetchall()]
                 if 'is_hidden' not in cols:
                     self.conn.execute("ALTER TABLE videos ADD COLUMN is_hidden INTEGER DEFAULT 0")
+                for col in ('size', 'mtime_ns', 'inode'):
+                    if col not in cols:
+                        self.conn.execute(f"ALTER TABLE videos ADD COLUMN {col} INTEGER")
 
                 # Migración DRIVE
                 cursor = self.conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drive_photos'")
@@ -360,16 +421,72 @@ class VisageVaultDB:
         return {row['filepath']: (row['year'], row['month']) for row in cursor.fetchall()}
 
     def bulk_upsert_photos(self, photos_list):
+        """photos_list: [(ruta, año, mes, size, mtime_ns, inode)]"""
         # NOTA: En cargas masivas iniciales NO escribimos en MetaDB uno a uno por rendimiento.
         # Solo actualizamos MetaDB cuando el usuario cambia algo manualmente.
         with self.conn:
             self.conn.executemany("""
-                INSERT INTO photos (filepath, year, month)
-                VALUES (?, ?, ?)
+                INSERT INTO photos (filepath, year, month, size, mtime_ns, inode)
+                VALUES (?, ?, ?, ?, ?, ?)
                 ON CONFLICT(filepath) DO UPDATE SET
                 year=excluded.year,
-                month=excluded.month
+                month=excluded.month,
+                size=excluded.size,
+                mtime_ns=excluded.mtime_ns,
+                inode=excluded.inode
             """, photos_list)
+            # Mismo commit: el lote sale de la cola de checkpoint a la vez que entra
+            self.conn.executemany("DELETE FROM scan_queue WHERE path = ?", [(row[0],) for row in photos_list])
+
+    def load_photo_fingerprints(self):
+        """Devuelve {ruta: (size, mtime_ns, inode)} de las fotos indexadas."""
+        cursor = self.conn.execute("SELECT filepath, size, mtime_ns, inode FROM photos")
+        return {row['filepath']: (row['size'], row['mtime_ns'], row['inode']) for row in cursor.fetchall()}
+
+    def update_photo_fingerprints(self, rows, invalidate=False):
+        """
+        rows: [(size, mtime_ns, inode, ruta)].
+        Con invalidate=True el archivo cambió en disco: se descartan sus caras y
+        su hash de duplicados para que los workers los recalculen.
+        """
+        if not rows: return
+        with self.conn:
+            if invalidate:
+                self.conn.executemany("""
+                    DELETE FROM faces WHERE photo_id IN (SELECT id FROM photos WHERE filepath = ?)
+                """, [(r[3],) for r in rows])
+                self.conn.executemany("""
+                    UPDATE photos SET size = ?, mtime_ns = ?, inode = ?, scanned_for_faces = 0, dhash = NULL
+                    WHERE filepath = ?
+                """, rows)
+            else:
+                self.conn.executemany(
+                    "UPDATE photos SET size = ?, mtime_ns = ?, inode = ? WHERE filepath = ?", rows
+                )
+
+    def refresh_fingerprint(self, filepath, is_video=False):
+        """Tras una edición hecha por la propia App (fecha EXIF, ojos rojos) se acepta la huella nueva."""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return
+        table = "videos" if is_video else "photos"
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE {table} SET size = ?, mtime_ns = ?, inode = ? WHERE filepath = ?",
+                (st.st_size, st.st_mtime_ns, st.st_ino, filepath)
+            )
+
+    def load_photo_dhashes(self):
+        """Devuelve {ruta: dhash o None} de las fotos visibles."""
+        cursor = self.conn.execute("SELECT filepath, dhash FROM photos WHERE is_hidden = 0")
+        return {row['filepath']: row['dhash'] for row in cursor.fetchall()}
+
+    def save_photo_dhashes(self, rows):
+        """rows: [(dhash, ruta)]"""
+        if not rows: return
+        with self.conn:
+            self.conn.executemany("UPDATE photos SET dhash = ? WHERE filepath = ?", rows)
 
     def bulk_delete_photos(self, paths_list):
         if not paths_list: return
@@ -411,14 +528,32 @@ class VisageVaultDB:
         return None, None
 
     def bulk_upsert_videos(self, videos_list):
+        """videos_list: [(ruta, año, mes, size, mtime_ns, inode)]"""
         with self.conn:
             self.conn.executemany("""
-                INSERT INTO videos (filepath, year, month)
-                VALUES (?, ?, ?)
+                INSERT INTO videos (filepath, year, month, size, mtime_ns, inode)
+                VALUES (?, ?, ?, ?, ?, ?)
                 ON CONFLICT(filepath) DO UPDATE SET
                 year=excluded.year,
-                month=excluded.month
+                month=excluded.month,
+                size=excluded.size,
+                mtime_ns=excluded.mtime_ns,
+                inode=excluded.inode
             """, videos_list)
+            self.conn.executemany("DELETE FROM scan_queue WHERE path = ?", [(row[0],) for row in videos_list])
+
+    def load_video_fingerprints(self):
+        """Devuelve {ruta: (size, mtime_ns, inode)} de los vídeos indexados."""
+        cursor = self.conn.execute("SELECT filepath, size, mtime_ns, inode FROM videos")
+        return {row['filepath']: (row['size'], row['mtime_ns'], row['inode']) for row in cursor.fetchall()}
+
+    def update_video_fingerprints(self, rows):
+        """rows: [(size, mtime_ns, inode, ruta)]. Lo derivado del vídeo es solo la miniatura."""
+        if not rows: return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE videos SET size = ?, mtime_ns = ?, inode = ? WHERE filepath = ?", rows
+            )
 
     def bulk_delete_videos(self, paths_list):
         if not paths_list: return
@@ -426,6 +561,153 @@ class VisageVaultDB:
             tuples = [(p,) for p in paths_list]
             self.conn.executemany("DELETE FROM videos WHERE filepath = ?", tuples)
 
+    def load_directory_snapshot(self):
+        """Devuelve {carpeta: (padre, mtime_ns, n_fotos, n_vídeos, n_subcarpetas, escaneado_ns)}."""
+        try:
+            cursor = self.conn.execute("""
+                SELECT path, parent, mtime_ns, photo_count, video_count, subdir_count, scanned_at_ns
+                FROM directories
+            """)
+        except sqlite3.OperationalError:
+            return {}
+        return {
+            row['path']: (row['parent'], row['mtime_ns'], row['photo_count'],
+                          row['video_count'], row['subdir_count'], row['scanned_at_ns'])
+            for row in cursor.fetchall()
+        }
+
+    def save_directory_snapshot(self, changed_rows, removed_paths):
+        """Guarda solo las carpetas que cambiaron y borra las que ya no existen."""
+        if not changed_rows and not removed_paths: return
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO directories (path, parent, mtime_ns, photo_count, video_count, subdir_count, scanned_at_ns)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                parent=excluded.parent,
+                mtime_ns=excluded.mtime_ns,
+                photo_count=excluded.photo_count,
+                video_count=excluded.video_count,
+                subdir_count=excluded.subdir_count,
+                scanned_at_ns=excluded.scanned_at_ns
+            """, changed_rows)
+            self.conn.executemany("DELETE FROM directories WHERE path = ?", [(p,) for p in removed_paths])
+
+    def save_walk_checkpoint(self, directory_rows, queued_files):
+        """
+        Checkpoint del recorrido, en UNA transacción:
+        directory_rows: [(carpeta, padre, mtime_ns, n_fotos, n_vídeos, n_subcarpetas, escaneado_ns)]
+        queued_files: [(ruta, is_video, size, mtime_ns, inode)] nuevos aún sin indexar.
+        Una carpeta solo queda en el snapshot con todos sus archivos en la BD o en la cola.
+        """
+        if not directory_rows and not queued_files: return
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO scan_queue (path, is_video, size, mtime_ns, inode)
+                VALUES (?, ?, ?, ?, ?)
+            """, queued_files)
+            self.conn.executemany("""
+                INSERT INTO directories (path, parent, mtime_ns, photo_count, video_count, subdir_count, scanned_at_ns)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                parent=excluded.parent,
+                mtime_ns=excluded.mtime_ns,
+                photo_count=excluded.photo_count,
+                video_count=excluded.video_count,
+                subdir_count=excluded.subdir_count,
+                scanned_at_ns=excluded.scanned_at_ns
+            """, directory_rows)
+
+    def load_scan_queue(self):
+        """Devuelve ([fotos], [vídeos]) pendientes de un escaneo anterior que no terminó."""
+        try:
+            cursor = self.conn.execute("SELECT path, is_video FROM scan_queue")
+        except sqlite3.OperationalError:
+            return [], []
+        photos, videos = [], []
+        for row in cursor.fetchall():
+            (videos if row['is_video'] else photos).append(row['path'])
+        return photos, videos
+
+    def remove_from_scan_queue(self, paths):
+        if not paths: return
+        with self.conn:
+            self.conn.executemany("DELETE FROM scan_queue WHERE path = ?", [(p,) for p in paths])
+
+    def get_scan_setting(self, key):
+        try:
+            row = self.conn.execute("SELECT value FROM scan_settings WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row['value'] if row else None
+
+    def set_scan_setting(self, key, value):
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO scan_settings (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value=excluded.value
+            """, (key, value))
+
+    def save_thumbnails(self, rows):
+        """rows: [(ruta, clave_miniatura, size, mtime_ns)] (ver thumbnail_generator.drain_generated_thumbnails)"""
+        if not rows: return
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO thumbnails (filepath, thumb_key, size, mtime_ns) VALUES (?, ?, ?, ?)
+                ON CONFLICT(filepath) DO UPDATE SET
+                thumb_key=excluded.thumb_key,
+                size=excluded.size,
+                mtime_ns=excluded.mtime_ns
+            """, rows)
+
+    def load_thumbnail_keys(self, is_video=False):
+        """
+        {ruta: clave_miniatura} de los archivos cuya miniatura corresponde a la
+        huella guardada en la BD. Si el archivo cambió, la huella no cuadra y
+        no aparece (se regenerará al mostrarlo).
+        """
+        table = "videos" if is_video else "photos"
+        cursor = self.conn.execute(f"""
+            SELECT t.filepath, t.thumb_key FROM thumbnails t
+            JOIN {table} m ON m.filepath = t.filepath
+            WHERE m.size = t.size AND m.mtime_ns = t.mtime_ns
+        """)
+        return {row['filepath']: row['thumb_key'] for row in cursor.fetchall()}
+
+    def get_media_missing_thumbnails(self):
+        """
+        [(ruta, es_video)] de fotos y vídeos visibles sin miniatura válida en la
+        tabla 'thumbnails', de los más recientes a los más antiguos (así se
+        pregeneran: lo primero que se ve al abrir la galería).
+        """
+        cursor = self.conn.execute("""
+            SELECT filepath, is_video FROM (
+                SELECT m.filepath, 0 AS is_video, m.year, m.month, m.mtime_ns FROM photos m
+                LEFT JOIN thumbnails t ON t.filepath = m.filepath
+                    AND t.size = m.size AND t.mtime_ns = m.mtime_ns
+                WHERE COALESCE(m.is_hidden, 0) = 0 AND t.filepath IS NULL
+                UNION ALL
+                SELECT m.filepath, 1 AS is_video, m.year, m.month, m.mtime_ns FROM videos m
+                LEFT JOIN thumbnails t ON t.filepath = m.filepath
+                    AND t.size = m.size AND t.mtime_ns = m.mtime_ns
+                WHERE COALESCE(m.is_hidden, 0) = 0 AND t.filepath IS NULL
+            )
+            ORDER BY year DESC, month DESC, mtime_ns DESC
+        """)
+        return [(row['filepath'], bool(row['is_video'])) for row in cursor.fetchall()]
+
+    def pop_thumbnail_keys(self, paths):
+        """Olvida las miniaturas de estas rutas y devuelve {ruta: clave} para borrar los archivos."""
+        if not paths: return {}
+        keys = {}
+        with self.conn:
+            for path in paths:
+                row = self.conn.execute("SELECT thumb_key FROM thumbnails WHERE filepath = ?", (path,)).fetchone()
+                if row:
+                    keys[path] = row['thumb_key']
+            self.conn.executemany("DELETE FROM thumbnails WHERE filepath = ?", [(p,) for p in paths])
+        return keys
+
     def get_hidden_videos(self):
         cursor = self.conn.execute("SELECT filepath FROM videos WHERE is_hidden = 1")
         return [row['filepath'] for row in cursor.fetchall()]
@@ -445,6 +727,23 @@ class VisageVaultDB:
         """)
         return cursor.fetchall()
 
+    def save_face_scan_result(self, photo_id, faces):
+        """
+        Guarda las caras de una foto y la marca como escaneada en la MISMA transacción:
+        si la App se cierra a mitad, la foto se repite entera y no quedan caras duplicadas.
+        faces: [(encoding_blob, location_str)]. Devuelve los ids de las caras.
+        """
+        face_ids = []
+        with self.conn:
+            for encoding_blob, location_str in faces:
+                cursor = self.conn.execute("""
+                    INSERT INTO faces (photo_id, encoding, location)
+                    VALUES (?, ?, ?)
+                """, (photo_id, encoding_blob, location_str))
+                face_ids.append(cursor.lastrowid)
+            self.conn.execute("UPDATE photos SET scanned_for_faces = 1 WHERE id = ?", (photo_id,))
+        return face_ids
+
     def mark_photo_as_scanned(self, photo_id):
         with self.conn:
             self.conn.execute("UPDATE photos SET scanned_for_faces = 1 WHERE id = ?", (photo_id,))
@@ -0,0 +1,140 @@
+# decode_pool.py
+# Decodificación de miniaturas y vistas previas en procesos aparte (opcional,
+# ver config_manager.get_decode_processes). Revelar un RAW, decodificar y
+# reducir con Lanczos en los hilos de la App compite con la interfaz por el
+# GIL y por la memoria; en un pool de procesos escala con los núcleos.
+#
+# Los procesos solo devuelven bytes (los JPEG de la pirámide o el RGB de una
+# vista previa): la escritura en el almacén sigue en el proceso de la App y la
+# interfaz solo los envuelve en QImage/QPixmap.
+#
+# Sin Qt. Con el pool desactivado todo va como antes, en el hilo que llama.
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config_manager
+import thumbnail_generator
+from raw_reader import open_raw_array
+
+# Prioridad de CPU de los procesos: por debajo de la interfaz, por encima de los escaneos
+DECODE_PROCESS_NICE = 5
+
+_pool = None
+_processes = None
+_pool_lock = threading.Lock()
+
+
+def _init_process():
+    if hasattr(os, "nice"):
+        try:
+            os.nice(DECODE_PROCESS_NICE)
+        except OSError:
+            pass
+
+
+def _get_pool():
+    """Pool compartido, creado en el primer uso. None si está desactivado."""
+    global _pool, _processes
+    with _pool_lock:
+        if _processes is None:
+            # La configuración se lee una vez: esto se consulta en cada miniatura
+            _processes = max(0, int(config_manager.get_decode_processes() or 0))
+        if not _processes:
+            return None
+        if _pool is None:
+            # 'spawn': hacer fork de un proceso con hilos de Qt no es seguro
+            _pool = ProcessPoolExecutor(
+                max_workers=_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    """Un proceso murió (p.ej. un RAW corrupto que tumba LibRaw): el siguiente uso crea otro pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def is_enabled() -> bool:
+    return _get_pool() is not None
+
+
+def _run(func, *args):
+    """func(*args) en el pool; en el hilo actual si está desactivado o se rompió."""
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        future = pool.submit(func, *args)
+    except RuntimeError:
+        # Pool cerrado (la App se está cerrando)
+        return func(*args)
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return None
+    except CancelledError:
+        return None
+
+
+def _render_image_in_pool(original_filepath):
+    return _run(thumbnail_generator.render_image_pyramid, original_filepath)
+
+
+def _render_video_in_pool(original_filepath):
+    return _run(thumbnail_generator.render_video_pyramid, original_filepath)
+
+
+def generate_image_thumbnail(original_filepath, stat_result=None, level=thumbnail_generator.THUMBNAIL_SIZE[0]):
+    """Como thumbnail_generator.generate_image_thumbnail, decodificando en el pool si está activo."""
+    render = _render_image_in_pool if is_enabled() else None
+    return thumbnail_generator.generate_image_thumbnail(original_filepath, stat_result, level, render=render)
+
+
+def generate_video_thumbnail(original_filepath, stat_result=None, level=thumbnail_generator.THUMBNAIL_SIZE[0]):
+    """Como thumbnail_generator.generate_video_thumbnail, decodificando en el pool si está activo."""
+    render = _render_video_in_pool if is_enabled() else None
+    return thumbnail_generator.generate_video_thumbnail(original_filepath, stat_result, level, render=render)
+
+
+def generate_video_sprite(original_filepath, stat_result=None):
+    """Como thumbnail_generator.generate_video_sprite, decodificando en el pool si está activo."""
+    render = _render_video_in_pool if is_enabled() else None
+    return thumbnail_generator.generate_video_sprite(original_filepath, stat_result, render=render)
+
+
+def _raw_preview_bytes(filepath, min_size):
+    rgb_array, _ = open_raw_array(filepath, min_size)
+    height, width = rgb_array.shape[:2]
+    return rgb_array.tobytes(), width, height
+
+
+def load_raw_preview(filepath, min_size: int):
+    """
+    Vista previa de un RAW como (bytes RGB888, ancho, alto). En el pool, el
+    revelado (y su pico de memoria) se queda fuera del proceso de la App.
+    """
+    result = _run(_raw_preview_bytes, filepath, min_size)
+    if result is None:
+        raise IOError(f"No se pudo leer el RAW: {filepath}")
+    return result
+
+
+def shutdown():
+    """Al cerrar la App: se descarta lo pendiente sin esperar a los procesos."""
+    global _pool, _processes
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _processes = 0  # Lo que llegue después se decodifica en el hilo que llama
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
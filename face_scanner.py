@@ -0,0 +1,75 @@
+# face_scanner.py
+# Detección de caras de una foto, sin Qt: la usan el FaceScanWorker de la
+# interfaz y el indexador de consola (visagevault_index.py).
+import pickle
+
+import numpy as np
+import face_recognition
+from PIL import Image
+
+from raw_reader import is_raw, open_raw_array
+
+# Ancho máximo con el que se busca caras (las coordenadas se devuelven a tamaño original)
+FACE_SCAN_MAX_WIDTH = 1000
+
+
+def warm_up():
+    """Primera llamada a dlib (carga de modelos) fuera del bucle de escaneo."""
+    try:
+        dummy = np.zeros((50, 50, 3), dtype=np.uint8)
+        face_recognition.face_locations(dummy, model="hog")
+    except Exception:
+        pass
+
+
+def detect_faces(photo_path: str):
+    """
+    Busca las caras de una foto.
+    Devuelve [(encoding_pickle, "(top, right, bottom, left)")] o None si no
+    se pudo leer la imagen.
+    """
+    try:
+        image = None
+        # Factor de la imagen leída al tamaño original (los RAW se leen de su vista previa)
+        source_scale = 1.0
+
+        if is_raw(photo_path):
+            try:
+                image, source_scale = open_raw_array(photo_path, FACE_SCAN_MAX_WIDTH)
+            except Exception:
+                return None
+        else:
+            image = face_recognition.load_image_file(photo_path)
+
+        if image is None: return None
+
+        h, w = image.shape[:2]
+        scale_ratio = 1.0
+
+        if w > FACE_SCAN_MAX_WIDTH:
+            scale_ratio = FACE_SCAN_MAX_WIDTH / float(w)
+            new_h = int(h * scale_ratio)
+            pil_image = Image.fromarray(image)
+            pil_image = pil_image.resize((FACE_SCAN_MAX_WIDTH, new_h), Image.Resampling.LANCZOS)
+            image = np.array(pil_image)
+        scale_ratio /= source_scale
+
+        locations = face_recognition.face_locations(image, model="hog")
+        faces_found = []
+
+        if locations:
+            encodings = face_recognition.face_encodings(image, locations)
+            for loc, enc in zip(locations, encodings):
+                if scale_ratio != 1.0:
+                    top, right, bottom, left = loc
+                    top = int(top / scale_ratio)
+                    right = int(right / scale_ratio)
+                    bottom = int(bottom / scale_ratio)
+                    left = int(left / scale_ratio)
+                    loc = (top, right, bottom, left)
+
+                faces_found.append((pickle.dumps(enc), str(loc)))
+        return faces_found
+
+    except Exception:
+        return None
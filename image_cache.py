@@ -0,0 +1,121 @@
+# image_cache.py
+# Caché en RAM de imágenes ya decodificadas (QImage) compartida por todas las
+# pestañas: miniaturas de fotos y vídeos, de Drive, caras y caja fuerte.
+#
+# - Se mide en bytes, no en número de entradas: 500 miniaturas de 64 px no
+#   ocupan lo que 500 vistas previas de Drive. Presupuesto configurable como
+#   las cachés de disco (ver cache_manager, nombre "decoded_images").
+# - Se guardan QImage, que se pueden crear en cualquier hilo; el QPixmap (solo
+#   en el hilo de la interfaz) se saca al mostrarlas.
+# - Cada entrada puede ir asociada a una ruta: al cambiar o borrar el archivo
+#   se invalidan todas las suyas (ver invalidate_path).
+#
+# Sin Qt: cualquier objeto con sizeInBytes() sirve como imagen.
+
+import threading
+from collections import OrderedDict
+
+MB = 1024 * 1024
+
+DEFAULT_BUDGET_MB = 256
+
+
+class DecodedImageCache:
+    """
+    LRU con presupuesto en bytes, segura entre hilos. Las claves van por
+    espacios de nombres ("thumbs", "faces", "safe"...).
+
+        image = decoded_images.get("faces", face_id)
+        decoded_images.put("faces", face_id, image, path=photo_path)
+        decoded_images.invalidate_path(photo_path)
+    """
+
+    def __init__(self, name="decoded_images", budget_bytes=DEFAULT_BUDGET_MB * MB):
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # (espacio, clave) -> (imagen, bytes, ruta)
+        self._by_path = {}            # ruta -> {(espacio, clave)}
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, namespace, key):
+        """La imagen o None. Cuenta el acierto/fallo."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def put(self, namespace, key, image, path=None):
+        """Guarda la imagen (las nulas no) y desaloja lo más antiguo hasta caber."""
+        if image is None or image.isNull():
+            return
+        size = image.sizeInBytes()
+        with self._lock:
+            # Una sola imagen que no cabe desalojaría todo lo demás para nada
+            if size > self.budget_bytes:
+                return
+            self._remove((namespace, key))
+            self._entries[(namespace, key)] = (image, size, path)
+            self._bytes += size
+            if path is not None:
+                self._by_path.setdefault(path, set()).add((namespace, key))
+            self._shrink(self.budget_bytes)
+
+    def _remove(self, full_key):
+        entry = self._entries.pop(full_key, None)
+        if entry is None:
+            return False
+        _, size, path = entry
+        self._bytes -= size
+        if path is not None:
+            keys = self._by_path.get(path)
+            if keys is not None:
+                keys.discard(full_key)
+                if not keys:
+                    del self._by_path[path]
+        return True
+
+    def _shrink(self, target_bytes) -> int:
+        evicted = 0
+        while self._bytes > target_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            evicted += 1
+        self._counters["evictions"] += evicted
+        return evicted
+
+    def invalidate_path(self, path) -> int:
+        """Olvida todas las imágenes de un archivo (editado, borrado, movido...)."""
+        with self._lock:
+            keys = list(self._by_path.get(path, ()))
+            for full_key in keys:
+                self._remove(full_key)
+        return len(keys)
+
+    def clear(self, namespace=None):
+        """Vacía la caché entera o solo un espacio de nombres."""
+        with self._lock:
+            for full_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._remove(full_key)
+
+    # --- Interfaz de cache_manager (estadísticas y presupuesto) ---
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def enforce_budget(self, checkpoint=None) -> int:
+        # Ya se aplica en cada put; aquí solo cuenta si se ha bajado el presupuesto
+        with self._lock:
+            return self._shrink(self.budget_bytes)
+
+
+decoded_images = DecodedImageCache()
@@ -1,43 +1,530 @@
 # metadata_reader.py
+import os
 import re
-from datetime import datetime
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 
-def get_photo_date(filepath: str) -> tuple[str, str]:
+# Bytes leídos de golpe al abrir un archivo: cubren la cabecera EXIF de casi
+# todas las cámaras. Si un puntero cae más lejos se hace una lectura puntual.
+HEADER_READ_BYTES = 64 * 1024
+# En vídeo solo se leen cabeceras de cajas/elementos sueltos: basta con poco
+VIDEO_HEADER_READ_BYTES = 4 * 1024
+
+# Hilos para leer fechas en lote (E/S pura: el GIL se libera durante read())
+DATE_READER_WORKERS = 8
+
+# Etiquetas TIFF/EXIF con fecha, por orden de preferencia
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_DATETIME_DIGITIZED = 0x9004
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_DATE_TAGS = (_TAG_DATETIME_ORIGINAL, _TAG_DATETIME_DIGITIZED, _TAG_DATETIME)
+
+# UUID de la caja de metadatos de los CR3 de Canon (contiene CMT1/CMT2)
+_CANON_CR3_UUID = bytes.fromhex("85c0b687820f11e08111f4ce462b6a48")
+
+
+# =================================================================
+# EXTRACTOR DE FECHA POR NOMBRE DE ARCHIVO
+# =================================================================
+# Tabla de convenciones, por orden de prioridad. Marcadores:
+#   {Y} año 20xx, {M} mes, {D} día, {S} separador (- . _ o espacio),
+#   {MS} epoch Unix en milisegundos (exportaciones de Signal/Android).
+# Todas las reglas empiezan por un dígito: el patrón combinado lo aprovecha.
+_FILENAME_DATE_RULES = (
+    # IMG-20250304-WA0001 (WhatsApp), IMG_20250304_1234 / PXL_ / Screenshot_20250304-... (Android)
+    ("yyyymmdd", r"{Y}{M}{D}"),
+    # 07-10-2023.jpg, 07.10.2023
+    ("dd-mm-yyyy", r"{D}[-._]{M}[-._]{Y}"),
+    # 2023-11-01_Foto.jpg, PHOTO-2023-01-05-12-34-56 (WhatsApp iOS),
+    # "Screenshot 2023-01-05 at ...", "2019-05-03 12.34.56" (exportación de Fotos iOS/macOS)
+    ("yyyy-mm-dd", r"{Y}{S}{M}{S}{D}"),
+    # IMG-04122021.jpg -> 04/12/2021 (formato europeo compacto)
+    ("ddmmyyyy", r"{D}{M}{Y}"),
+    # signal-1672531200000.jpg, 1672531200000.jpg
+    ("epoch-ms", r"(?<!\d){MS}(?!\d)"),
+)
+
+
+def _compile_filename_date_rules(rules):
+    """
+    Compila la tabla una sola vez:
+    - La primera regla (la convención más común) va sola: un patrón que empieza
+      por literal permite a 're' saltar directamente a los candidatos.
+    - El resto va en UN patrón combinado (alternancia con un grupo por regla).
+    - Cada regla compilada por separado, para respetar la prioridad en el caso
+      raro de que el nombre tenga dos fechas.
+    """
+    bodies = []
+    for index, (_, template) in enumerate(rules):
+        bodies.append(template.format(
+            Y=rf"(?P<y{index}>20\d{{2}})",
+            M=rf"(?P<m{index}>0[1-9]|1[0-2])",
+            D=r"(?:0[1-9]|[12]\d|3[01])",
+            S=r"[-._ ]",
+            MS=rf"(?P<ms{index}>1[3-9]\d{{11}})",
+        ))
+    single = tuple(re.compile(rf"(?P<r{i}>{body})") for i, body in enumerate(bodies))
+    combined = re.compile(
+        r"(?=\d)(?:" + "|".join(rf"(?P<r{i}>{body})" for i, body in enumerate(bodies) if i) + ")"
+    )
+    # Por grupo de regla: (índice, grupo año, grupo mes, grupo epoch o None)
+    groups = {
+        f"r{i}": (i, f"y{i}", f"m{i}", f"ms{i}" if "{MS}" in template else None)
+        for i, (_, template) in enumerate(rules)
+    }
+    return single, combined, groups
+
+
+_FILENAME_DATE_SINGLE, _FILENAME_DATE_COMBINED, _FILENAME_DATE_GROUPS = \
+    _compile_filename_date_rules(_FILENAME_DATE_RULES)
+
+
+def _date_from_match(match):
+    _, year_group, month_group, millis_group = _FILENAME_DATE_GROUPS[match.lastgroup]
+    if millis_group:
+        return _date_from_timestamp(int(match.group(millis_group)) / 1000) or (None, None)
+    return match.group(year_group), match.group(month_group)
+
+
+@lru_cache(maxsize=65536)
+def _parse_basename_date(filename):
+    match = _FILENAME_DATE_SINGLE[0].search(filename)
+    if match:
+        return _date_from_match(match)
+    match = _FILENAME_DATE_COMBINED.search(filename)
+    if not match:
+        return None, None
+    # La búsqueda combinada da la fecha más a la izquierda; una regla más
+    # prioritaria que aparezca más a la derecha sigue mandando.
+    index = _FILENAME_DATE_GROUPS[match.lastgroup][0]
+    for higher in range(1, index):
+        higher_match = _FILENAME_DATE_SINGLE[higher].search(filename)
+        if higher_match:
+            return _date_from_match(higher_match)
+    return _date_from_match(match)
+
+
+def parse_date_from_filename(filepath):
+    """
+    Intenta extraer la fecha (Año, Mes) basándose exclusivamente en el nombre del archivo.
+    Soporta: YYYYMMDD, DD-MM-YYYY, YYYY-MM-DD, DDMMYYYY y las variantes de WhatsApp,
+    Android, iOS y capturas de pantalla (ver _FILENAME_DATE_RULES).
+    Devuelve (None, None) si el nombre no contiene fecha.
+    """
+    return _parse_basename_date(os.path.basename(filepath))
+
+
+def parse_dates(paths) -> list:
+    """Versión en lote de parse_date_from_filename: [(año, mes) o (None, None)] en el mismo orden."""
+    parse = _parse_basename_date
+    basename = os.path.basename
+    return [parse(basename(path)) for path in paths]
+
+
+class _HeaderReader:
+    """Lee rangos de un archivo sirviendo desde la cabecera ya leída siempre que se pueda."""
+
+    def __init__(self, f, head_size=HEADER_READ_BYTES):
+        self.f = f
+        self.head = f.read(head_size)
+
+    def read(self, offset, size):
+        if offset < 0 or size <= 0:
+            return b""
+        if offset + size <= len(self.head):
+            return self.head[offset:offset + size]
+        self.f.seek(offset)
+        return self.f.read(size)
+
+
+def _parse_exif_datetime(raw: bytes):
+    """'YYYY:MM:DD HH:MM:SS' -> (año, mes) o None si está vacía o es '0000:00:00'."""
+    text = raw.split(b"\x00", 1)[0].decode("ascii", errors="ignore").strip()
+    match = re.match(r"(\d{4})[:\-](\d{2})", text)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if year < 1900 or not 1 <= month <= 12:
+        return None
+    return str(year), f"{month:02d}"
+
+
+def _read_tiff_date(reader, base):
+    """
+    Recorre IFD0 y la sub-IFD EXIF de un bloque TIFF que empieza en 'base'.
+    Vale también para los RAW basados en TIFF (NEF, CR2, ARW, DNG, ORF, RW2, PEF...),
+    que solo cambian el número mágico.
+    """
+    header = reader.read(base, 8)
+    if len(header) < 8 or header[:2] not in (b"II", b"MM"):
+        return None
+    endian = "<" if header[:2] == b"II" else ">"
+    found = {}
+
+    def walk(ifd_offset, follow_exif):
+        entries_raw = reader.read(base + ifd_offset, 2)
+        if len(entries_raw) < 2:
+            return
+        (count,) = struct.unpack(endian + "H", entries_raw)
+        table = reader.read(base + ifd_offset + 2, count * 12)
+        for i in range(len(table) // 12):
+            tag, type_, num, value = struct.unpack(endian + "HHI4s", table[i * 12:(i + 1) * 12])
+            if tag in _DATE_TAGS and type_ == 2 and tag not in found:
+                if num <= 4:
+                    raw = value[:num]
+                else:
+                    (pointer,) = struct.unpack(endian + "I", value)
+                    raw = reader.read(base + pointer, min(num, 32))
+                found[tag] = raw
+            elif tag == _TAG_EXIF_IFD and follow_exif:
+                (pointer,) = struct.unpack(endian + "I", value)
+                walk(pointer, False)
+
+    (ifd0,) = struct.unpack(endian + "I", header[4:8])
+    walk(ifd0, True)
+
+    for tag in _DATE_TAGS:
+        if tag in found:
+            date = _parse_exif_datetime(found[tag])
+            if date:
+                return date
+    return None
+
+
+def _read_jpeg_date(reader, start=0):
+    """Busca el segmento APP1 'Exif' sin tocar los datos de imagen (se para en SOS)."""
+    offset = start + 2
+    while True:
+        marker = reader.read(offset, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        kind = marker[1]
+        if kind == 0xDA or kind == 0xD9:  # SOS / EOI: empiezan los píxeles
+            return None
+        (length,) = struct.unpack(">H", marker[2:4])
+        if kind == 0xE1 and reader.read(offset + 4, 6) == b"Exif\x00\x00":
+            return _read_tiff_date(reader, offset + 10)
+        offset += 2 + length
+
+
+def _iter_boxes(reader, start, end):
+    """Itera las cajas ISOBMFF (HEIC, CR3, MP4...) entre dos offsets: (tipo, inicio_datos, fin)."""
+    offset = start
+    while end is None or offset + 8 <= end:
+        header = reader.read(offset, 16)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header[:8])
+        data_start = offset + 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            (size,) = struct.unpack(">Q", header[8:16])
+            data_start = offset + 16
+        elif size == 0:
+            size = (end - offset) if end is not None else 0
+            if size == 0:
+                yield kind, data_start, None
+                return
+        if size < 8:
+            return
+        yield kind, data_start, offset + size
+        offset += size
+
+
+def _read_uint(raw, size):
+    return int.from_bytes(raw[:size], "big") if size else 0
+
+
+def _read_heif_date(reader):
+    """HEIC/HEIF: localiza el item 'Exif' con iinf + iloc y lee solo ese bloque."""
+    for kind, start, end in _iter_boxes(reader, 0, None):
+        if kind != b"meta":
+            continue
+        exif_item_id = None
+        locations = {}
+        for child, c_start, c_end in _iter_boxes(reader, start + 4, end):  # meta es FullBox
+            data = reader.read(c_start, (c_end or c_start) - c_start)
+            if child == b"iinf" and data:
+                version = data[0]
+                pos = 4 + (2 if version == 0 else 4)
+                while pos + 8 <= len(data):
+                    (infe_size,) = struct.unpack(">I", data[pos:pos + 4])
+                    if infe_size < 8:
+                        break
+                    if data[pos + 4:pos + 8] == b"infe" and data[pos + 8] >= 2:
+                        id_size = 2 if data[pos + 8] == 2 else 4
+                        p = pos + 12
+                        item_id = _read_uint(data[p:], id_size)
+                        item_type = data[p + id_size + 2:p + id_size + 6]
+                        if item_type == b"Exif":
+                            exif_item_id = item_id
+                    pos += infe_size
+            elif child == b"iloc" and data:
+                version = data[0]
+                offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+                base_offset_size = data[5] >> 4
+                index_size = (data[5] & 0x0F) if version in (1, 2) else 0
+                id_size = 2 if version < 2 else 4
+                pos = 6
+                item_count = _read_uint(data[pos:], id_size)
+                pos += id_size
+                for _ in range(item_count):
+                    item_id = _read_uint(data[pos:], id_size)
+                    pos += id_size
+                    if version in (1, 2):
+                        pos += 2  # construction_method
+                    pos += 2  # data_reference_index
+                    base_offset = _read_uint(data[pos:], base_offset_size)
+                    pos += base_offset_size
+                    extent_count = _read_uint(data[pos:], 2)
+                    pos += 2
+                    for extent in range(extent_count):
+                        pos += index_size
+                        extent_offset = _read_uint(data[pos:], offset_size)
+                        pos += offset_size + length_size
+                        if extent == 0:
+                            locations[item_id] = base_offset + extent_offset
+        if exif_item_id is None or exif_item_id not in locations:
+            return None
+        item_offset = locations[exif_item_id]
+        (tiff_header_offset,) = struct.unpack(">I", reader.read(item_offset, 4) or b"\x00" * 4)
+        return _read_tiff_date(reader, item_offset + 4 + tiff_header_offset)
+    return None
+
+
+def _read_cr3_date(reader):
+    """Canon CR3: moov/uuid(Canon) contiene CMT2 (IFD EXIF) y CMT1 (IFD0) como bloques TIFF."""
+    for kind, start, end in _iter_boxes(reader, 0, None):
+        if kind != b"moov":
+            continue
+        for child, c_start, c_end in _iter_boxes(reader, start, end):
+            if child != b"uuid" or reader.read(c_start, 16) != _CANON_CR3_UUID:
+                continue
+            blocks = {k: s for k, s, _ in _iter_boxes(reader, c_start + 16, c_end)}
+            for name in (b"CMT2", b"CMT1"):
+                if name in blocks:
+                    date = _read_tiff_date(reader, blocks[name])
+                    if date:
+                        return date
+        return None
+    return None
+
+
+def read_exif_date(filepath: str):
+    """
+    Lee la fecha de captura (DateTimeOriginal) leyendo solo la cabecera del archivo,
+    sin decodificar píxeles. Soporta JPEG, TIFF y RAW basados en TIFF, HEIC/HEIF,
+    CR3 y RAF. Devuelve (año, mes) o None si no hay fecha o el formato no se reconoce.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            reader = _HeaderReader(f)
+            head = reader.head
+            if head[:2] == b"\xff\xd8":
+                return _read_jpeg_date(reader)
+            if head[:2] in (b"II", b"MM"):
+                return _read_tiff_date(reader, 0)
+            if head[:16] == b"FUJIFILMCCD-RAW ":
+                # RAF: a partir del byte 84 está el offset del JPEG embebido con su EXIF
+                (jpeg_offset,) = struct.unpack(">I", head[84:88])
+                return _read_jpeg_date(reader, jpeg_offset)
+            if head[4:8] == b"ftyp":
+                brand = head[8:12]
+                if brand == b"crx ":
+                    return _read_cr3_date(reader)
+                return _read_heif_date(reader)
+    except (OSError, struct.error, IndexError, ValueError):
+        pass
+    return None
+
+
+def get_photo_date(filepath: str, stat_result=None) -> tuple[str, str]:
     """
-    Determina la fecha de una foto de forma RÁPIDA (Sin leer EXIF).
+    Determina la fecha de una foto de forma RÁPIDA (solo cabecera, sin decodificar).
     Prioridad:
-    1. Patrón en el nombre del archivo (ej: IMG-20250402-...).
-    2. Fecha de modificación del archivo (sistema de archivos).
+    1. Patrón en el nombre del archivo (ej: IMG-20250402-..., ver parse_date_from_filename).
+    2. DateTimeOriginal del EXIF, leyendo solo los primeros KB (read_exif_date).
+    3. Fecha de modificación del archivo (sistema de archivos).
+    Si el escáner ya hizo stat() del archivo, se reutiliza con 'stat_result'.
     Devuelve una tupla (año, mes).
     """
-    filename = Path(filepath).name
+    # 1. Buscar patrón en el nombre del archivo (Muy rápido, memoizado)
+    year, month = parse_date_from_filename(filepath)
+    if year:
+        return year, month
 
-    # 1. Buscar patrón en el nombre del archivo (Muy rápido)
-    match = re.search(r'IMG-(\d{8})', filename)
-    if match:
-        date_str = match.group(1)
-        try:
-            # '20250402' -> datetime object
-            dt = datetime.strptime(date_str, '%Y%m%d')
-            return str(dt.year), f"{dt.month:02d}"
-        except ValueError:
-            pass
-
-    # 2. Usar fecha de modificación del archivo (stat)
+    # 2. EXIF de cabecera: sobrevive a copias y restauraciones (el mtime no)
+    exif_date = read_exif_date(filepath)
+    if exif_date:
+        return exif_date
+
+    # 3. Usar fecha de modificación del archivo (stat)
     try:
-        stat = Path(filepath).stat()
+        stat = stat_result or Path(filepath).stat()
         dt_mod = datetime.fromtimestamp(stat.st_mtime)
         return str(dt_mod.year), f"{dt_mod.month:02d}"
     except Exception:
         return "Sin Fecha", "00"
 
-def get_video_date(filepath: str) -> tuple[str, str]:
+
+def get_photo_dates(items, executor=None) -> dict:
     """
-    Determina la fecha de un vídeo usando la fecha de modificación.
+    Versión en lote de get_photo_date para fotos recién descubiertas.
+    items: [(ruta, stat_result o None)]. Devuelve {ruta: (año, mes)}.
+    Con 'executor' se reutiliza un pool existente; si no, se crea uno temporal.
     """
+    items = list(items)
+    if not items:
+        return {}
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=DATE_READER_WORKERS) as pool:
+            return get_photo_dates(items, pool)
+    dates = executor.map(lambda item: get_photo_date(item[0], item[1]), items)
+    return {path: date for (path, _), date in zip(items, dates)}
+
+
+# Segundos entre las épocas QuickTime (1904-01-01) y Unix (1970-01-01)
+_QUICKTIME_EPOCH_OFFSET = 2082844800
+# DateUTC de Matroska: nanosegundos desde 2001-01-01 UTC
+_MATROSKA_EPOCH = datetime(2001, 1, 1, tzinfo=timezone.utc)
+
+# IDs EBML (Matroska/WebM) que hay que atravesar para llegar a DateUTC
+_EBML_HEADER = 0x1A45DFA3
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_DATE_UTC = 0x4461
+_EBML_CLUSTER = 0x1F43B675
+# Elementos de Segment que se miran antes de rendirse (Info suele ir al principio)
+_EBML_MAX_SEGMENT_CHILDREN = 32
+
+
+def _date_from_timestamp(seconds):
+    """Epoch Unix -> (año, mes) en hora local, descartando fechas vacías o absurdas."""
+    if seconds <= 0:
+        return None
+    try:
+        dt = datetime.fromtimestamp(seconds)
+    except (OverflowError, OSError, ValueError):
+        return None
+    if dt.year < 1971:
+        return None
+    return str(dt.year), f"{dt.month:02d}"
+
+
+def _read_mvhd_date(reader):
+    """MP4/MOV/3GP: moov/mvhd.creation_time. Se salta mdat con seek aunque moov vaya al final."""
+    for kind, start, end in _iter_boxes(reader, 0, None):
+        if kind != b"moov":
+            continue
+        for child, c_start, _ in _iter_boxes(reader, start, end):
+            if child != b"mvhd":
+                continue
+            data = reader.read(c_start, 12)
+            if len(data) < 8:
+                return None
+            if data[0] == 1:
+                (creation_time,) = struct.unpack(">Q", data[4:12])
+            else:
+                (creation_time,) = struct.unpack(">I", data[4:8])
+            return _date_from_timestamp(creation_time - _QUICKTIME_EPOCH_OFFSET)
+        return None
+    return None
+
+
+def _read_ebml_vint(reader, offset, keep_marker):
+    """Lee un entero de longitud variable EBML. Devuelve (valor, longitud) o (None, 0)."""
+    first = reader.read(offset, 1)
+    if not first or first[0] == 0:
+        return None, 0
+    length = 8 - first[0].bit_length() + 1
+    raw = reader.read(offset, length)
+    if len(raw) < length:
+        return None, 0
+    value = int.from_bytes(raw, "big")
+    if not keep_marker:
+        value &= (1 << (7 * length)) - 1
+        if value == (1 << (7 * length)) - 1:
+            value = -1  # Tamaño desconocido (streaming)
+    return value, length
+
+
+def _iter_ebml(reader, start, end, limit):
+    """Itera elementos EBML hijos: (id, inicio_datos, tamaño)."""
+    offset = start
+    for _ in range(limit):
+        if end is not None and offset >= end:
+            return
+        element_id, id_len = _read_ebml_vint(reader, offset, keep_marker=True)
+        if element_id is None:
+            return
+        size, size_len = _read_ebml_vint(reader, offset + id_len, keep_marker=False)
+        if size is None:
+            return
+        data_start = offset + id_len + size_len
+        yield element_id, data_start, size
+        if size < 0:
+            return
+        offset = data_start + size
+
+
+def _read_matroska_date(reader):
+    """MKV/WebM: Segment/Info/DateUTC sin recorrer los clusters de vídeo."""
+    for element_id, start, size in _iter_ebml(reader, 0, None, 4):
+        if element_id != _EBML_SEGMENT:
+            continue
+        end = None if size < 0 else start + size
+        for child_id, c_start, c_size in _iter_ebml(reader, start, end, _EBML_MAX_SEGMENT_CHILDREN):
+            if child_id == _EBML_CLUSTER:
+                return None  # Ya empiezan los datos: no hay Info antes
+            if child_id != _EBML_INFO or c_size < 0:
+                continue
+            for info_id, i_start, i_size in _iter_ebml(reader, c_start, c_start + c_size, 64):
+                if info_id == _EBML_DATE_UTC and i_size == 8:
+                    (nanoseconds,) = struct.unpack(">q", reader.read(i_start, 8))
+                    moment = _MATROSKA_EPOCH + timedelta(microseconds=nanoseconds // 1000)
+                    return _date_from_timestamp(moment.timestamp())
+            return None
+        return None
+    return None
+
+
+def read_video_date(filepath: str):
+    """
+    Lee la fecha de creación de un vídeo desde la cabecera del contenedor, con unos
+    pocos KB de E/S y sin cv2 ni ffprobe: mvhd en MP4/MOV/3GP y DateUTC en MKV/WebM.
+    Devuelve (año, mes) o None.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            reader = _HeaderReader(f, VIDEO_HEADER_READ_BYTES)
+            head = reader.head
+            if head[4:8] in (b"ftyp", b"moov", b"wide", b"free", b"mdat", b"skip"):
+                return _read_mvhd_date(reader)
+            if head[:4] == _EBML_HEADER.to_bytes(4, "big"):
+                return _read_matroska_date(reader)
+    except (OSError, struct.error, IndexError, ValueError, OverflowError):
+        pass
+    return None
+
+
+def get_video_date(filepath: str, stat_result=None) -> tuple[str, str]:
+    """
+    Determina la fecha de un vídeo.
+    Prioridad:
+    1. Fecha de creación del contenedor (read_video_date).
+    2. Fecha de modificación del archivo (sistema de archivos).
+    """
+    container_date = read_video_date(filepath)
+    if container_date:
+        return container_date
+
     try:
-        stat = Path(filepath).stat()
+        stat = stat_result or Path(filepath).stat()
         dt_mod = datetime.fromtimestamp(stat.st_mtime)
         return str(dt_mod.year), f"{dt_mod.month:02d}"
     except Exception:
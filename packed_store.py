@@ -0,0 +1,404 @@
+# packed_store.py
+# Almacén empaquetado para las cachés de miniaturas (local_snapshot_cache,
+# drive_snapshot_cache, face_cache). En lugar de un JPEG suelto por elemento
+# (millones de inodos en una biblioteca grande, un open() por miniatura), los
+# datos se añaden a archivos de segmento (seg_000001.pack, ...) y un índice
+# SQLite guarda dónde está cada clave: segmento, offset y longitud.
+#
+# Las lecturas van por mmap: mostrar una pantalla de miniaturas son lecturas de
+# memoria. Los segmentos solo crecen; al reemplazar o borrar una entrada su
+# hueco queda "muerto" y compact() reescribe los segmentos con demasiado
+# espacio muerto (en segundo plano, desde cache_manager).
+#
+# Sin Qt: lo usan la App y el indexador de consola. Varios hilos (y procesos)
+# pueden escribir a la vez: cada escritura se hace dentro de una transacción
+# IMMEDIATE del índice, que hace de cerrojo entre procesos.
+
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Tamaño a partir del cual se abre un segmento nuevo
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# Proporción de espacio muerto a partir de la cual se compacta un segmento
+COMPACT_DEAD_RATIO = 0.5
+# Entradas movidas por bloque durante la compactación (entre bloques se cede el paso)
+COMPACT_BATCH = 256
+
+INDEX_FILENAME = "index.sqlite"
+
+# Cabecera de cada registro: permite recorrer un segmento sin el índice
+_RECORD_MAGIC = b"VVPK"
+_RECORD_HEADER = struct.Struct("<4sHI")  # magic, len(clave), len(datos)
+
+
+class PackedStore:
+    """
+    Almacén clave -> bytes en un directorio. Usar open_store() para obtenerlo:
+    hay una sola instancia por directorio y proceso.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._maps = {}           # segmento -> mmap de solo lectura
+        self._writer = None       # (segmento, archivo abierto en 'ab')
+        # Último acceso por clave, pendiente de pasar al índice (ver flush_access_times):
+        # leer no debe costar una escritura en SQLite
+        self._accessed = {}
+        # Contadores de esta sesión (ver cache_manager)
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        # Transacciones explícitas (ver _transaction)
+        self._conn = sqlite3.connect(str(self.directory / INDEX_FILENAME),
+                                     check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    segment INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    atime INTEGER NOT NULL DEFAULT 0
+                ) WITHOUT ROWID
+            """)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+            if "atime" not in columns:
+                self._conn.execute("ALTER TABLE entries ADD COLUMN atime INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_atime ON entries(atime)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_segment ON entries(segment)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    dead INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE: bloquea a los demás escritores, también de otros procesos."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"seg_{segment:06d}.pack"
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def _map(self, segment: int, end: int):
+        """mmap del segmento que cubra hasta 'end' (el activo crece: se remapea)."""
+        mapped = self._maps.get(segment)
+        if mapped is not None and len(mapped) >= end:
+            return mapped
+        if mapped is not None:
+            mapped.close()
+            del self._maps[segment]
+        with open(self._segment_path(segment), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapped) < end:
+            mapped.close()
+            return None
+        self._maps[segment] = mapped
+        return mapped
+
+    def record_lookup(self, found: bool):
+        """Cuenta un acierto/fallo resuelto fuera del almacén (p.ej. en una caché en RAM)."""
+        self.counters["hits" if found else "misses"] += 1
+
+    def _note_lookup(self, key: str, found: bool, track: bool):
+        if found:
+            self._accessed[key] = int(time.time())
+        if track:
+            self.record_lookup(found)
+
+    def get(self, key: str, track: bool = True):
+        """
+        Bytes guardados con esa clave, o None.
+        track=False: no cuenta como acierto/fallo (p.ej. leer lo que se acaba de generar).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segment, offset, length FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._note_lookup(key, row is not None, track)
+            if row is None:
+                return None
+            segment, offset, length = row
+            try:
+                mapped = self._map(segment, offset + length)
+            except (OSError, ValueError):
+                return None  # Segmento compactado por otro proceso entre medias
+            if mapped is None:
+                return None
+            return mapped[offset:offset + length]
+
+    def contains(self, key: str, track: bool = True) -> bool:
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone() is not None
+            self._note_lookup(key, found, track)
+            return found
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def _active_writer(self, needed: int):
+        """Segmento activo (el último) abierto para añadir; uno nuevo si no cabe."""
+        row = self._conn.execute("SELECT id FROM segments ORDER BY id DESC LIMIT 1").fetchone()
+        segment = row[0] if row else None
+        if self._writer is not None and self._writer[0] != segment:
+            self._writer[1].close()
+            self._writer = None
+
+        if segment is not None:
+            if self._writer is None:
+                self._writer = (segment, open(self._segment_path(segment), "ab"))
+            f = self._writer[1]
+            if f.seek(0, os.SEEK_END) + needed <= SEGMENT_MAX_BYTES or f.tell() == 0:
+                return segment, f
+            f.close()
+            self._writer = None
+
+        segment = self._conn.execute("INSERT INTO segments (size, dead) VALUES (0, 0)").lastrowid
+        self._writer = (segment, open(self._segment_path(segment), "ab"))
+        return self._writer
+
+    def _forget(self, keys):
+        """Marca como espacio muerto lo que ocupaban estas claves y las quita del índice."""
+        for key in keys:
+            row = self._conn.execute(
+                "SELECT segment, length FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                continue
+            segment, length = row
+            record_size = _RECORD_HEADER.size + len(key.encode("utf-8")) + length
+            self._conn.execute("UPDATE segments SET dead = dead + ? WHERE id = ?", (record_size, segment))
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._accessed.pop(key, None)
+
+    def _append(self, items):
+        """Añade [(clave, bytes, atime)] al segmento activo. Llamar dentro de una transacción."""
+        for key, data, atime in items:
+            key_bytes = key.encode("utf-8")
+            record = _RECORD_HEADER.pack(_RECORD_MAGIC, len(key_bytes), len(data)) + key_bytes
+            segment, f = self._active_writer(len(record) + len(data))
+            start = f.seek(0, os.SEEK_END)
+            f.write(record)
+            f.write(data)
+            self._forget([key])
+            self._conn.execute(
+                "INSERT INTO entries (key, segment, offset, length, atime) VALUES (?, ?, ?, ?, ?)",
+                (key, segment, start + len(record), len(data), atime)
+            )
+            self._conn.execute("UPDATE segments SET size = ? WHERE id = ?",
+                               (start + len(record) + len(data), segment))
+        # Los datos han de estar en el archivo antes de que el índice los publique
+        if self._writer is not None:
+            self._writer[1].flush()
+
+    def put(self, key: str, data: bytes):
+        self.put_many([(key, data)])
+
+    def put_many(self, items):
+        """Guarda varias entradas con una sola transacción (p.ej. todos los niveles de una miniatura)."""
+        now = int(time.time())
+        items = [(key, data, now) for key, data in items]
+        if not items:
+            return
+        with self._lock:
+            with self._transaction():
+                self._append(items)
+
+    def delete(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock:
+            with self._transaction():
+                self._forget(keys)
+
+    def clear(self):
+        """Vacía el almacén (borra todos los segmentos)."""
+        with self._lock:
+            self._close_files()
+            with self._transaction():
+                segments = [row[0] for row in self._conn.execute("SELECT id FROM segments")]
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("DELETE FROM segments")
+            for segment in segments:
+                try:
+                    self._segment_path(segment).unlink(missing_ok=True)
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # Compactación
+    # ------------------------------------------------------------------
+    def compact(self, dead_ratio: float = COMPACT_DEAD_RATIO, checkpoint=None) -> int:
+        """
+        Reescribe las entradas vivas de los segmentos cerrados con al menos
+        'dead_ratio' de espacio muerto en el segmento activo y borra los viejos.
+        checkpoint: se llama entre bloques (p.ej. scheduler.checkpoint).
+        Devuelve los bytes liberados.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, size FROM segments WHERE id < (SELECT MAX(id) FROM segments) "
+                "AND dead >= size * ?", (dead_ratio,)
+            ).fetchall()
+
+        freed = 0
+        for segment, size in rows:
+            while True:
+                if checkpoint:
+                    checkpoint()
+                with self._lock:
+                    batch = self._conn.execute(
+                        "SELECT key, offset, length, atime FROM entries WHERE segment = ? LIMIT ?",
+                        (segment, COMPACT_BATCH)
+                    ).fetchall()
+                    if not batch:
+                        break
+                    try:
+                        mapped = self._map(segment, max(offset + length for _, offset, length, _ in batch))
+                    except (OSError, ValueError):
+                        mapped = None
+                    if mapped is None:
+                        break
+                    # Se conserva el último acceso: compactar no cuenta como uso
+                    items = [(key, mapped[offset:offset + length], atime)
+                             for key, offset, length, atime in batch]
+                    with self._transaction():
+                        self._append(items)
+
+            with self._lock:
+                if self._conn.execute("SELECT 1 FROM entries WHERE segment = ? LIMIT 1",
+                                      (segment,)).fetchone():
+                    continue  # No se pudo leer el segmento: se reintentará
+                mapped = self._maps.pop(segment, None)
+                if mapped is not None:
+                    mapped.close()
+                try:
+                    self._segment_path(segment).unlink(missing_ok=True)
+                except OSError:
+                    continue  # Windows: otro proceso lo tiene mapeado
+                self._conn.execute("DELETE FROM segments WHERE id = ?", (segment,))
+                freed += size
+        return freed
+
+    # ------------------------------------------------------------------
+    # Desalojo (LRU)
+    # ------------------------------------------------------------------
+    def flush_access_times(self):
+        """Pasa al índice los últimos accesos acumulados en memoria."""
+        with self._lock:
+            if not self._accessed:
+                return
+            accessed, self._accessed = self._accessed, {}
+            with self._transaction():
+                self._conn.executemany(
+                    "UPDATE entries SET atime = MAX(atime, ?) WHERE key = ?",
+                    [(atime, key) for key, atime in accessed.items()]
+                )
+
+    def live_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(length), 0) FROM entries").fetchone()[0]
+
+    def evict(self, target_bytes: int, checkpoint=None) -> int:
+        """
+        Borra las entradas usadas hace más tiempo hasta que los datos vivos
+        quepan en 'target_bytes'. El espacio se recupera al compactar.
+        Devuelve las entradas desalojadas.
+        """
+        self.flush_access_times()
+        evicted = 0
+        excess = self.live_bytes() - target_bytes
+        while excess > 0:
+            if checkpoint:
+                checkpoint()
+            with self._lock:
+                batch = self._conn.execute(
+                    "SELECT key, length FROM entries ORDER BY atime LIMIT ?", (COMPACT_BATCH,)
+                ).fetchall()
+                if not batch:
+                    break
+                victims = []
+                for key, length in batch:
+                    if excess <= 0:
+                        break
+                    victims.append(key)
+                    excess -= length
+                with self._transaction():
+                    self._forget(victims)
+                evicted += len(victims)
+                self.counters["evictions"] += len(victims)
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, live = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM entries"
+            ).fetchone()
+            segments, size, dead = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(dead), 0) FROM segments"
+            ).fetchone()
+        return {"entries": entries, "segments": segments, "bytes": size,
+                "live_bytes": live, "dead_bytes": dead}
+
+    def _close_files(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        if self._writer is not None:
+            self._writer[1].close()
+            self._writer = None
+
+    def close(self):
+        self.flush_access_times()
+        with self._lock:
+            self._close_files()
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(directory) -> PackedStore:
+    """Almacén de un directorio (una sola instancia por proceso)."""
+    directory = os.path.abspath(str(directory))
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = PackedStore(directory)
+            _stores[directory] = store
+        return store
+
+
+def compact_all(checkpoint=None) -> int:
+    with _stores_lock:
+        stores = list(_stores.values())
+    freed = 0
+    for store in stores:
+        try:
+            freed += store.compact(checkpoint=checkpoint)
+        except Exception as e:
+            print(f"Error compactando {store.directory}: {e}")
+    return freed
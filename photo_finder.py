@@ -1,6 +1,12 @@
 # photo_finder.py
 from pathlib import Path
+import os
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from scan_scheduler import scheduler
 
 # --- CONFIGURACIÓN DE EXTENSIONES A BUSCAR ---
 IMAGE_EXTENSIONS = (
@@ -17,53 +23,524 @@ IMAGE_EXTENSIONS = (
     '.raw'                          # Genérico
 )
 VIDEO_EXTENSIONS = (
-    '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.mpeg', '.mpg'
+    '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.mpeg', '.mpg', '.3gp', '.m4v'
 )
 
-def find_photos(directory_path: str) -> list[str]:
+# Hilos por defecto al recorrer montajes de red (ver benchmarks/bench_walker.py)
+DEFAULT_NETWORK_SCAN_WORKERS = 8
+
+# Margen de seguridad para mtimes de carpetas: una carpeta modificada justo
+# mientras se escaneaba (o en sistemas con mtime de 1-2 s, FAT/SMB) se vuelve
+# a listar la próxima vez aunque su mtime coincida.
+SNAPSHOT_GRACE_NS = 2_000_000_000
+
+# Carpetas listadas entre dos checkpoints del recorrido (una transacción cada vez)
+CHECKPOINT_EVERY_DIRS = 64
+
+# --- REGLAS DE EXCLUSIÓN ---
+# Archivo opcional en la raíz de la biblioteca, con sintaxis de .gitignore
+IGNORE_FILENAME = ".visagevaultignore"
+
+# Siempre activas (el usuario puede anularlas con '!' en su .visagevaultignore)
+DEFAULT_IGNORE_PATTERNS = (
+    ".git/", ".svn/", ".hg/", "node_modules/", "__pycache__/",
+    "*.lrdata/",                    # Previsualizaciones de Lightroom
+    "@eaDir/", "#recycle/",         # Synology
+    ".Trash-*/", ".Trashes/", "$RECYCLE.BIN/", "System Volume Information/",
+    ".thumbnails/", ".cache/",
+    "visagevault_cache/", "visagevault_safe/",  # Nuestros propios datos
+)
+
+def _glob_to_regex(pattern: str) -> str:
+    """Traduce un glob estilo .gitignore ('*', '?', '**', '[...]') a regex."""
+    i, out = 0, []
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("(?:/.*)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+class IgnoreRules:
     """
-    Busca archivos de imagen en un directorio dado (recursivamente).
-    Devuelve las rutas como una lista de strings.
+    Reglas de exclusión estilo .gitignore para el recorrido y el vigilante.
+    Se evalúan en orden y gana la última que coincide ('!' vuelve a incluir).
+    Una carpeta excluida no se llega a listar: su subárbol entero se poda.
     """
-    target_dir = Path(directory_path)
-    if not target_dir.is_dir():
-        return []
+    def __init__(self, root: str, patterns=()):
+        self.root = root
+        self._dir_rules = []   # (regex, negar) aplicables a carpetas
+        self._file_rules = []  # (regex, negar) aplicables a archivos
+        self._patterns = []
+        for pattern in tuple(DEFAULT_IGNORE_PATTERNS) + tuple(patterns):
+            self.add(pattern)
 
-    photo_files = []
-    count = 0
+    @property
+    def signature(self) -> str:
+        """Identifica el conjunto de reglas: si cambia, el snapshot de carpetas no sirve."""
+        return "\n".join(self._patterns)
 
-    for file_path in target_dir.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in IMAGE_EXTENSIONS:
-            photo_files.append(str(file_path))
+    @classmethod
+    def for_root(cls, root: str) -> "IgnoreRules":
+        """Reglas por defecto + las del .visagevaultignore de la raíz (si existe)."""
+        patterns = []
+        try:
+            with open(os.path.join(root, IGNORE_FILENAME), "r", encoding="utf-8") as f:
+                patterns = f.read().splitlines()
+        except OSError:
+            pass
+        return cls(root, patterns)
 
-        count += 1
-        if count % 100 == 0:
-             time.sleep(0.001)
+    def add(self, line: str):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # Con '/' al principio o en medio, la regla va anclada a la raíz
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return
+        self._patterns.append(("!" if negate else "") + ("/" if anchored else "") + line + ("/" if dir_only else ""))
+        prefix = "^" if anchored else "(?:^|.*/)"
+        flags = re.IGNORECASE if os.name == "nt" else 0
+        rule = (re.compile(prefix + _glob_to_regex(line) + "$", flags), negate)
+        self._dir_rules.append(rule)
+        if not dir_only:
+            self._file_rules.append(rule)
 
-    return photo_files
+    @property
+    def has_file_rules(self) -> bool:
+        return bool(self._file_rules)
 
-def find_videos(directory_path: str) -> list[str]:
+    def _relative(self, path: str):
+        rel = os.path.relpath(path, self.root)
+        if rel == "." or rel.startswith(".."):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """¿Está excluida ESTA ruta? (sus carpetas padre ya se comprobaron al recorrer)."""
+        rules = self._dir_rules if is_dir else self._file_rules
+        if not rules:
+            return False
+        rel = self._relative(path)
+        if rel is None:
+            return False
+        ignored = False
+        for regex, negate in rules:
+            if regex.match(rel):
+                ignored = not negate
+        return ignored
+
+    def is_path_ignored(self, path: str, is_dir: bool) -> bool:
+        """Como is_ignored pero comprobando también cada carpeta padre (eventos sueltos del vigilante)."""
+        rel = self._relative(path)
+        if rel is None:
+            return False
+        current = self.root
+        parts = rel.split("/")
+        for part in parts[:-1]:
+            current = os.path.join(current, part)
+            if self.is_ignored(current, True):
+                return True
+        return self.is_ignored(path, is_dir)
+
+def _is_unchanged(previous, dir_stat, known) -> bool:
+    """Decide si una carpeta puede reutilizarse del snapshot sin listarla."""
+    if previous is None or known is None:
+        return False
+    _, mtime_ns, photo_count, video_count, _, scanned_at_ns = previous
+    if dir_stat.st_mtime_ns != mtime_ns:
+        return False
+    if scanned_at_ns is None or mtime_ns >= scanned_at_ns - SNAPSHOT_GRACE_NS:
+        return False
+    # Los contadores deben cuadrar con lo que ya está en la BD
+    known_photos, known_videos = known
+    return len(known_photos) == photo_count and len(known_videos) == video_count
+
+def _visit_directory(current_dir, parent, snapshot, known_media, children, scan_started_ns,
+                     ignore_rules=None):
     """
-    Busca archivos de vídeo en un directorio dado (recursivamente).
-    Devuelve las rutas como una lista de strings.
+    Procesa UNA carpeta: la reutiliza del snapshot o la lista con os.scandir.
+    Devuelve (fotos, vídeos, fila_snapshot, [(subcarpeta, padre)], listada).
+    fila_snapshot es None si la carpeta no se pudo leer.
     """
-    target_dir = Path(directory_path)
-    if not target_dir.is_dir():
-        return []
+    photos = {}
+    videos = {}
+    subdirs = []
+    try:
+        dir_stat = os.stat(current_dir)
+    except OSError:
+        return photos, videos, None, subdirs, False
+
+    previous = snapshot.get(current_dir)
+    known = known_media.get(current_dir, ([], []))
+    if _is_unchanged(previous, dir_stat, known):
+        # Las reglas pueden haber cambiado desde el snapshot: se vuelven a aplicar
+        filter_files = ignore_rules is not None and ignore_rules.has_file_rules
+        count = 0
+        for paths, target in ((known[0], photos), (known[1], videos)):
+            for path in paths:
+                if filter_files and ignore_rules.is_ignored(path, False):
+                    continue
+                count += 1
+                if count % 100 == 0:
+                    scheduler.checkpoint()
+                # Sin listar la carpeta, pero con stat de cada archivo: editar uno
+                # en el sitio (p.ej. escribir la fecha EXIF) no cambia el mtime de
+                # la carpeta y la huella tiene que poder compararse
+                try:
+                    target[path] = os.stat(path)
+                except OSError:
+                    continue  # Borrado: el worker lo da de baja
+        for child in children.get(current_dir, ()):
+            if ignore_rules is None or not ignore_rules.is_ignored(child, True):
+                subdirs.append((child, current_dir))
+        return photos, videos, previous, subdirs, False
 
-    video_files = []
     count = 0
+    try:
+        with os.scandir(current_dir) as it:
+            for entry in it:
+                count += 1
+                if count % 100 == 0:
+                    scheduler.checkpoint()  # Solo espera si la interfaz va cargada
+
+                try:
+                    # Igual que rglob: no seguimos enlaces simbólicos a carpetas
+                    if entry.is_dir(follow_symlinks=False):
+                        # Poda: una carpeta excluida no se llega a abrir
+                        if ignore_rules is None or not ignore_rules.is_ignored(entry.path, True):
+                            subdirs.append((entry.path, current_dir))
+                        continue
+
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext in IMAGE_EXTENSIONS:
+                        target = photos
+                    elif ext in VIDEO_EXTENSIONS:
+                        target = videos
+                    else:
+                        continue
+
+                    if ignore_rules is not None and ignore_rules.has_file_rules \
+                            and ignore_rules.is_ignored(entry.path, False):
+                        continue
+
+                    if entry.is_file():
+                        target[entry.path] = entry.stat()
+                except OSError:
+                    # Archivo borrado durante el recorrido o sin permisos
+                    continue
+    except OSError:
+        # Carpeta ilegible: no la apuntamos para volver a intentarlo
+        return {}, {}, None, [], False
+
+    row = (parent, dir_stat.st_mtime_ns, len(photos), len(videos), len(subdirs), scan_started_ns)
+    return photos, videos, row, subdirs, True
+
+def scan_media(directory_path: str, snapshot: dict = None, known_media: dict = None,
+               workers: int = 1, on_directory=None,
+               ignore_rules: IgnoreRules = None) -> tuple[dict, dict, dict]:
+    """
+    Recorre el directorio UNA sola vez (os.scandir) y clasifica fotos y vídeos.
+
+    Devuelve (fotos, vídeos, snapshot). Fotos y vídeos son diccionarios
+    {ruta: os.stat_result} para que los workers reutilicen el stat sin volver
+    a tocar el disco.
+
+    Modo incremental: si se pasa el 'snapshot' del escaneo anterior
+    ({carpeta: (padre, mtime_ns, n_fotos, n_vídeos, n_subcarpetas, escaneado_ns)})
+    y 'known_media' ({carpeta: ([fotos], [vídeos])} ya indexados en la BD),
+    las carpetas cuyo mtime no ha cambiado NO se listan: se reutilizan sus
+    archivos conocidos (con un os.stat de cada uno, para detectar ediciones
+    en el sitio) y solo se baja a sus subcarpetas.
+
+    Modo concurrente (workers > 1): pensado para NFS/SMB, donde manda la
+    latencia de cada listado. Las subcarpetas se listan en paralelo en un
+    pool acotado y el resultado es el mismo que el del recorrido en serie.
+
+    on_directory(carpeta, fila_snapshot, fotos, vídeos) se llama, siempre desde
+    el hilo que llamó a scan_media, por cada carpeta que se ha listado de verdad
+    (no las reutilizadas). MediaCrawl lo usa para guardar checkpoints.
+
+    ignore_rules: carpetas y archivos excluidos (por defecto, las reglas base
+    más el .visagevaultignore de la raíz). Las carpetas excluidas se podan.
+    """
+    photos = {}
+    videos = {}
+    new_snapshot = {}
+    if not os.path.isdir(directory_path):
+        return photos, videos, new_snapshot
+
+    snapshot = snapshot or {}
+    known_media = known_media or {}
+    if ignore_rules is None:
+        ignore_rules = IgnoreRules.for_root(directory_path)
+
+    children = {}
+    for path, row in snapshot.items():
+        children.setdefault(row[0], []).append(path)
+
+    scan_started_ns = time.time_ns()
 
-    for file_path in target_dir.rglob('*'):
-        # Comprobar si es un archivo y si su extensión es de VÍDEO
-        if file_path.is_file() and file_path.suffix.lower() in VIDEO_EXTENSIONS:
-            video_files.append(str(file_path))
+    def merge(current_dir, result):
+        dir_photos, dir_videos, row, subdirs, listed = result
+        photos.update(dir_photos)
+        videos.update(dir_videos)
+        if row is not None:
+            new_snapshot[current_dir] = row
+            if listed and on_directory is not None:
+                on_directory(current_dir, row, dir_photos, dir_videos)
+        return subdirs
 
-        count += 1
-        if count % 100 == 0:
-             time.sleep(0.001)
+    if workers <= 1:
+        pending_dirs = [(directory_path, None)]
+        while pending_dirs:
+            current_dir, parent = pending_dirs.pop()
+            result = _visit_directory(current_dir, parent, snapshot, known_media,
+                                      children, scan_started_ns, ignore_rules)
+            pending_dirs.extend(merge(current_dir, result))
+        return photos, videos, new_snapshot
 
-    return video_files
+    # Los hilos del pool solo listan carpetas (no escriben en la BD): E/S 'idle'
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan",
+                            initializer=scheduler.enter, initargs=("background_read",)) as executor:
+        running = {}
+
+        def submit(current_dir, parent):
+            future = executor.submit(_visit_directory, current_dir, parent, snapshot,
+                                     known_media, children, scan_started_ns, ignore_rules)
+            running[future] = current_dir
+
+        submit(directory_path, None)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                current_dir = running.pop(future)
+                for subdir, parent in merge(current_dir, future.result()):
+                    submit(subdir, parent)
+
+    return photos, videos, new_snapshot
+
+def is_network_path(path: str) -> bool:
+    """Detecta (solo Linux) si la ruta está en un montaje de red (NFS, SMB, SSHFS...)."""
+    network_fs = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'fuse.sshfs', 'fuse.rclone', 'davfs', '9p')
+    try:
+        real_path = os.path.realpath(path)
+        best_mount, best_type = "", ""
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                if (real_path == mount_point or real_path.startswith(os.path.join(mount_point, ""))) \
+                        and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, parts[2]
+        return best_type in network_fs
+    except OSError:
+        return False
+
+def resolve_scan_workers(directory_path: str, configured: int = 0) -> int:
+    """
+    Número de hilos para recorrer el directorio.
+    0 = automático: en serie para discos locales y en paralelo para montajes de red.
+    """
+    if configured and configured > 0:
+        return configured
+    return DEFAULT_NETWORK_SCAN_WORKERS if is_network_path(directory_path) else 1
+
+def fingerprint(stat_result) -> tuple:
+    """Huella de un archivo para detectar ediciones: (size, mtime_ns, inode)."""
+    return (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+
+def compare_fingerprint(stored, current) -> str:
+    """
+    Compara la huella guardada en la BD con la actual.
+    Devuelve 'same', 'unknown' (la BD aún no tenía huella) o 'changed'.
+    """
+    if not stored or stored[0] is None:
+        return 'unknown'
+    size, mtime_ns, inode = stored
+    # En Windows os.scandir devuelve inode 0: solo se compara si ambos lo conocen
+    same_inode = not inode or not current[2] or inode == current[2]
+    if size == current[0] and mtime_ns == current[1] and same_inode:
+        return 'same'
+    return 'changed'
+
+def group_by_directory(photo_paths, video_paths) -> dict:
+    """Agrupa rutas ya indexadas por carpeta: {carpeta: ([fotos], [vídeos])}."""
+    grouped = {}
+    for path in photo_paths:
+        grouped.setdefault(os.path.dirname(path), ([], []))[0].append(path)
+    for path in video_paths:
+        grouped.setdefault(os.path.dirname(path), ([], []))[1].append(path)
+    return grouped
+
+class _WalkCheckpoint:
+    """
+    Guarda el progreso del recorrido mientras ocurre: cada carpeta listada entra
+    en el snapshot junto con sus archivos nuevos en la cola 'scan_queue', en la
+    misma transacción. Si la App se cierra, el siguiente arranque reutiliza las
+    carpetas ya listadas (solo un stat) y retoma la cola.
+    """
+    def __init__(self, db, indexed_photos, indexed_videos):
+        self.db = db
+        self.indexed_photos = indexed_photos
+        self.indexed_videos = indexed_videos
+        self.directory_rows = []
+        self.queued_files = []
+
+    def __call__(self, current_dir, row, dir_photos, dir_videos):
+        self.directory_rows.append((current_dir,) + row)
+        for is_video, files, indexed in ((0, dir_photos, self.indexed_photos),
+                                         (1, dir_videos, self.indexed_videos)):
+            for path, stat_result in files.items():
+                if path not in indexed:
+                    self.queued_files.append((path, is_video) + fingerprint(stat_result))
+        if len(self.directory_rows) >= CHECKPOINT_EVERY_DIRS:
+            self.flush()
+
+    def flush(self):
+        try:
+            self.db.save_walk_checkpoint(self.directory_rows, self.queued_files)
+        except Exception as e:
+            print(f"Error guardando checkpoint del escaneo: {e}")
+        self.directory_rows = []
+        self.queued_files = []
+
+class MediaCrawl:
+    """
+    Recorrido compartido entre PhotoFinderWorker y VideoFinderWorker.
+    El primer worker que llama a get() paga el recorrido; el otro espera
+    y reutiliza el mismo resultado.
+
+    Con BD (modo incremental) el recorrido se guarda por checkpoints: cada
+    carpeta listada entra en el snapshot a la vez que sus archivos nuevos
+    entran en la cola 'scan_queue', y los consumidores vacían la cola en el
+    mismo commit en que guardan cada lote. Así una carpeta del snapshot
+    siempre tiene todos sus archivos en la BD o en la cola, aunque la App se
+    cierre a mitad. mark_done() solo limpia las carpetas que ya no existen.
+    """
+    def __init__(self, directory_path: str, consumers: int = 1, incremental: bool = True,
+                 workers: int = 0):
+        self.directory_path = directory_path
+        self.incremental = incremental
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._result = None
+        self._previous_snapshot = {}
+        self._new_snapshot = {}
+        self._checkpointed = False
+        self._pending_consumers = consumers
+
+    def get(self, db=None) -> tuple[dict, dict]:
+        with self._lock:
+            if self._result is None:
+                snapshot, known_media, checkpoint = {}, {}, None
+                queued_photos, queued_videos = [], []
+                ignore_rules = IgnoreRules.for_root(self.directory_path)
+                reusable_snapshot = {}
+                if db is not None and self.incremental:
+                    snapshot = db.load_directory_snapshot()
+                    indexed_photos = db.load_all_photo_dates()
+                    indexed_videos = db.load_all_video_dates()
+                    queued_photos, queued_videos = db.load_scan_queue()
+                    # Reglas de exclusión distintas a las del snapshot: puede haber
+                    # carpetas antes podadas que ahora hay que listar. Se re-lista todo.
+                    if db.get_scan_setting("ignore_rules") == ignore_rules.signature:
+                        reusable_snapshot = snapshot
+                    if reusable_snapshot:
+                        # Lo pendiente de un escaneo interrumpido cuenta como conocido
+                        known_media = group_by_directory(
+                            list(indexed_photos) + queued_photos, list(indexed_videos) + queued_videos
+                        )
+                    checkpoint = _WalkCheckpoint(db, indexed_photos, indexed_videos)
+                photos, videos, self._new_snapshot = scan_media(
+                    self.directory_path, reusable_snapshot, known_media,
+                    workers=resolve_scan_workers(self.directory_path, self.workers),
+                    on_directory=checkpoint, ignore_rules=ignore_rules
+                )
+                if checkpoint is not None:
+                    checkpoint.flush()
+                    db.set_scan_setting("ignore_rules", ignore_rules.signature)
+                    self._checkpointed = True
+                    # Pendientes cuya carpeta ya no existe: fuera de la cola
+                    root_prefix = os.path.join(self.directory_path, "")
+                    vanished = [
+                        path for path in queued_photos + queued_videos
+                        if path.startswith(root_prefix) and path not in photos and path not in videos
+                    ]
+                    db.remove_from_scan_queue(vanished)
+                self._previous_snapshot = snapshot
+                self._result = (photos, videos)
+            return self._result
+
+    def mark_done(self, db):
+        """Un consumidor terminó de guardar sus archivos. El último limpia el snapshot."""
+        with self._lock:
+            self._pending_consumers -= 1
+            if self._pending_consumers != 0 or self._result is None:
+                return
+
+            root = self.directory_path
+            root_prefix = os.path.join(root, "")
+            changed_rows = []
+            if not self._checkpointed:
+                changed_rows = [
+                    (path,) + row for path, row in self._new_snapshot.items()
+                    if self._previous_snapshot.get(path) != row
+                ]
+            removed_paths = [
+                path for path in self._previous_snapshot
+                if path not in self._new_snapshot and (path == root or path.startswith(root_prefix))
+            ]
+            try:
+                db.save_directory_snapshot(changed_rows, removed_paths)
+            except Exception as e:
+                print(f"Error guardando snapshot de carpetas: {e}")
+
+def find_photos(directory_path: str) -> list[str]:
+    """
+    Busca archivos de imagen en un directorio dado (recursivamente).
+    Devuelve las rutas como una lista de strings.
+    """
+    photos, _, _ = scan_media(directory_path)
+    return list(photos)
+
+def find_videos(directory_path: str) -> list[str]:
+    """
+    Busca archivos de vídeo en un directorio dado (recursivamente).
+    Devuelve las rutas como una lista de strings.
+    """
+    _, videos, _ = scan_media(directory_path)
+    return list(videos)
 
 if __name__ == "__main__":
     # ... (el main no necesita cambios) ...
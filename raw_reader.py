@@ -0,0 +1,90 @@
+# raw_reader.py
+# Acceso rápido a archivos RAW (NEF, CR2, ARW, DNG...). En lugar del revelado
+# completo (rawpy.postprocess, segundos por foto) se usa la vista previa JPEG
+# que la cámara incrusta en el archivo; si no existe o es pequeña, un revelado
+# a media resolución (half_size, ~4 veces menos trabajo).
+#
+# Las coordenadas (p.ej. las caras guardadas en la BD) siguen refiriéndose a la
+# imagen del revelado COMPLETO: open_raw_image devuelve también el factor de
+# escala para pasar de la imagen devuelta a ese espacio.
+import io
+
+import numpy as np
+import rawpy
+from PIL import Image
+
+RAW_EXTENSIONS = ('.nef', '.cr2', '.cr3', '.crw', '.arw', '.srf', '.orf', '.rw2', '.raf', '.pef', '.dng', '.raw')
+
+# Tolerancia de proporción entre la vista previa y el revelado (las hay recortadas a 16:9)
+PREVIEW_ASPECT_TOLERANCE = 0.02
+
+# Giro que aplica LibRaw (sizes.flip) y su equivalente en PIL
+_FLIP_TRANSPOSE = {
+    3: Image.Transpose.ROTATE_180,
+    5: Image.Transpose.ROTATE_90,
+    6: Image.Transpose.ROTATE_270,
+}
+
+
+def is_raw(filepath) -> bool:
+    return str(filepath).lower().endswith(RAW_EXTENSIONS)
+
+
+def _full_size(raw):
+    """Tamaño (ancho, alto) del revelado completo, ya girado."""
+    sizes = raw.sizes
+    if sizes.flip in (5, 6):
+        return sizes.height, sizes.width
+    return sizes.width, sizes.height
+
+
+def _embedded_preview(raw, min_size=0):
+    """Vista previa incrustada como imagen PIL RGB, sin girar. None si no hay."""
+    try:
+        thumb = raw.extract_thumb()
+    except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+        return None
+    if thumb.format == rawpy.ThumbFormat.JPEG:
+        image = Image.open(io.BytesIO(thumb.data))
+        if min_size:
+            # Las vistas previas a resolución completa se decodifican reducidas (draft de libjpeg)
+            image.draft("RGB", (min_size, min_size))
+        image.load()
+    elif thumb.format == rawpy.ThumbFormat.BITMAP:
+        image = Image.fromarray(thumb.data)
+    else:
+        return None
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def open_raw_image(filepath, min_size: int = 0):
+    """
+    Abre un RAW como imagen PIL RGB lo más barata posible que tenga al menos
+    'min_size' px de lado mayor (0 = cualquier tamaño vale).
+    Devuelve (imagen, escala): escala = px del revelado completo por px de la imagen.
+    """
+    with rawpy.imread(str(filepath)) as raw:
+        full_width, full_height = _full_size(raw)
+
+        preview = _embedded_preview(raw, min_size)
+        if preview is not None:
+            # La cámara guarda la vista previa sin girar: se aplica el mismo giro que el revelado
+            transpose = _FLIP_TRANSPOSE.get(raw.sizes.flip)
+            if transpose is not None:
+                preview = preview.transpose(transpose)
+            width, height = preview.size
+            aspect = full_width / full_height
+            if max(width, height) >= min_size and abs(width / height - aspect) <= aspect * PREVIEW_ASPECT_TOLERANCE:
+                return preview, full_width / width
+
+        # Sin vista previa útil: revelado a media resolución (suficiente salvo para min_size enormes)
+        half_size = max(full_width, full_height) // 2 >= min_size
+        rgb = raw.postprocess(use_camera_wb=True, half_size=half_size)
+    image = Image.fromarray(rgb)
+    return image, full_width / image.size[0]
+
+
+def open_raw_array(filepath, min_size: int = 0):
+    """Igual que open_raw_image pero como array numpy RGB (para face_recognition y QImage)."""
+    image, scale = open_raw_image(filepath, min_size)
+    return np.ascontiguousarray(np.asarray(image)), scale
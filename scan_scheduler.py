@@ -0,0 +1,211 @@
+# scan_scheduler.py
+# Planificador de recursos para los workers en segundo plano (escaneo, fechas,
+# caras, Drive). Sustituye a los time.sleep() fijos: cada worker declara su
+# clase de E/S y CPU y cede el paso SOLO cuando la interfaz está ocupada.
+#
+# No depende de Qt: la ventana principal le manda latidos (heartbeat) desde
+# su hilo y avisa de la actividad del usuario; sin latidos (modo consola)
+# los workers van siempre a toda velocidad.
+
+import ctypes
+import os
+import platform
+import threading
+import time
+
+# --- CLASES DE WORKER ---
+# nice: prioridad de CPU del hilo (0 normal, 19 mínima)
+# io_class: prioridad de disco (ioprio de Linux): 'idle' solo usa el disco libre.
+#   Solo para hilos que NO escriben en SQLite: uno que tiene abierta una
+#   transacción de escritura y se queda sin disco bloquea a la interfaz, que
+#   espera el cerrojo de la BD (inversión de prioridad). Los que escriben
+#   usan 'best-effort-low'.
+# backoff: multiplicador de la espera cuando la interfaz está ocupada
+# pause: en vez de una espera, se detiene hasta que la interfaz quede libre
+WORKER_CLASSES = {
+    "interactive": {"nice": 0, "io_class": "best-effort", "backoff": 0.0},
+    # Escaneos y mantenimiento (escriben en la BD / el almacén)
+    "background_io": {"nice": 10, "io_class": "best-effort-low", "backoff": 1.0},
+    # Pools de solo lectura: listado de carpetas, lectura de fechas EXIF
+    "background_read": {"nice": 10, "io_class": "idle", "backoff": 1.0},
+    "background_cpu": {"nice": 15, "io_class": "best-effort-low", "backoff": 2.0},
+    # Pregeneración de miniaturas: también escribe (índice y almacén)
+    "idle": {"nice": 19, "io_class": "best-effort-low", "backoff": 2.0, "pause": True},
+}
+
+# Latido esperado desde el hilo de la interfaz y retraso a partir del cual se
+# considera que la interfaz va cargada (ms)
+HEARTBEAT_INTERVAL_MS = 100
+UI_LAG_THRESHOLD_MS = 50
+# Tras una acción del usuario (scroll, zoom...) se cede el paso durante este tiempo
+USER_ACTIVITY_WINDOW_S = 0.5
+# Espera adaptativa: empieza pequeña y se duplica mientras la interfaz siga ocupada
+MIN_BACKOFF_S = 0.002
+MAX_BACKOFF_S = 0.2
+
+# --- ioprio (Linux) ---
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_CLASSES = {
+    "best-effort": (2, 4),
+    "best-effort-low": (2, 7),
+    "idle": (3, 0),
+}
+_IOPRIO_SET_SYSCALL = {"x86_64": 251, "aarch64": 30, "i686": 289, "i386": 289, "armv7l": 314}
+
+
+def _set_io_priority(io_class: str, thread_id: int) -> bool:
+    """Aplica la clase de E/S al hilo (ioprio_set). Devuelve False si no se pudo."""
+    syscall_nr = _IOPRIO_SET_SYSCALL.get(platform.machine())
+    if not syscall_nr or io_class not in _IOPRIO_CLASSES:
+        return False
+    klass, data = _IOPRIO_CLASSES[io_class]
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        result = libc.syscall(syscall_nr, _IOPRIO_WHO_PROCESS, thread_id,
+                              (klass << _IOPRIO_CLASS_SHIFT) | data)
+        return result == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _set_cpu_priority(nice: int, thread_id: int) -> bool:
+    """En Linux setpriority() con el id nativo afecta solo a ese hilo."""
+    if nice <= 0 or not hasattr(os, "setpriority"):
+        return False
+    try:
+        current = os.getpriority(os.PRIO_PROCESS, thread_id)
+        # Solo se baja la prioridad (subirla requiere permisos)
+        os.setpriority(os.PRIO_PROCESS, thread_id, max(current, nice))
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+class ResourceScheduler:
+    """
+    Un único planificador por proceso (ver 'scheduler' al final del módulo).
+
+    Workers:
+        scheduler.enter("background_io")   # al empezar run(), en su hilo
+        scheduler.checkpoint()             # en el bucle, donde antes había sleep()
+
+    Interfaz (hilo principal):
+        scheduler.heartbeat()              # cada HEARTBEAT_INTERVAL_MS (QTimer)
+        scheduler.note_user_activity()     # scroll, zoom, cambio de pestaña...
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_heartbeat = None
+        self._ui_lag_s = 0.0
+        self._last_activity = 0.0
+        self._manual_busy = 0
+        self._thread_state = threading.local()
+        self.stats = {"checkpoints": 0, "yields": 0, "yield_time_s": 0.0}
+
+    # ------------------------------------------------------------------
+    # Lado de la interfaz
+    # ------------------------------------------------------------------
+    def heartbeat(self):
+        """Llamado periódicamente desde el hilo de la interfaz."""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_heartbeat is not None:
+                expected = HEARTBEAT_INTERVAL_MS / 1000.0
+                self._ui_lag_s = max(0.0, now - self._last_heartbeat - expected)
+            self._last_heartbeat = now
+
+    def stop_heartbeat(self):
+        """La interfaz se cierra (o nunca la hubo): los workers dejan de ceder."""
+        with self._lock:
+            self._last_heartbeat = None
+            self._ui_lag_s = 0.0
+
+    def note_user_activity(self):
+        self._last_activity = time.monotonic()
+
+    def begin_busy(self):
+        """Marca un periodo en que la interfaz necesita recursos (p.ej. cargar el árbol de Drive)."""
+        with self._lock:
+            self._manual_busy += 1
+
+    def end_busy(self):
+        with self._lock:
+            self._manual_busy = max(0, self._manual_busy - 1)
+
+    def ui_busy(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._manual_busy:
+                return True
+            if self._last_heartbeat is None:
+                return False  # Sin interfaz (consola): nada que proteger
+            threshold = UI_LAG_THRESHOLD_MS / 1000.0
+            # El último latido llegó tarde, o el siguiente ya se está retrasando
+            pending_lag = now - self._last_heartbeat - HEARTBEAT_INTERVAL_MS / 1000.0
+            if self._ui_lag_s > threshold or pending_lag > threshold:
+                return True
+        return now - self._last_activity < USER_ACTIVITY_WINDOW_S
+
+    # ------------------------------------------------------------------
+    # Lado de los workers
+    # ------------------------------------------------------------------
+    def enter(self, worker_class: str = "background_io"):
+        """Asigna la clase al hilo actual (prioridad de CPU y de disco del SO)."""
+        config = WORKER_CLASSES.get(worker_class, WORKER_CLASSES["background_io"])
+        state = self._thread_state
+        if getattr(state, "worker_class", None) == worker_class:
+            return
+        state.worker_class = worker_class
+        state.backoff = 0.0
+        # El hilo principal (la interfaz) nunca se rebaja: en Linux los hilos
+        # que cree después heredarían la prioridad baja
+        if threading.current_thread() is threading.main_thread():
+            return
+        if os.name == "posix" and hasattr(threading, "get_native_id"):
+            thread_id = threading.get_native_id()
+            _set_cpu_priority(config["nice"], thread_id)
+            _set_io_priority(config["io_class"], thread_id)
+
+    def _record_yield(self, seconds):
+        with self._lock:
+            self.stats["yields"] += 1
+            self.stats["yield_time_s"] += seconds
+
+    def checkpoint(self, should_stop=None):
+        """
+        Punto de cesión. Si la interfaz está libre vuelve al momento; si está
+        ocupada espera, y la espera crece mientras siga ocupada.
+        should_stop: en la clase 'idle' (pausa completa) se consulta durante la
+        pausa para que el worker pueda salir aunque la interfaz siga ocupada.
+        """
+        state = self._thread_state
+        worker_class = getattr(state, "worker_class", "background_io")
+        config = WORKER_CLASSES.get(worker_class, WORKER_CLASSES["background_io"])
+        weight = config["backoff"]
+        with self._lock:
+            self.stats["checkpoints"] += 1
+        if not weight or not self.ui_busy():
+            state.backoff = 0.0
+            return
+
+        if config.get("pause"):
+            # Clase 'idle': parada completa mientras el usuario use la interfaz
+            start = time.monotonic()
+            while self.ui_busy():
+                if should_stop is not None and should_stop():
+                    break
+                time.sleep(MAX_BACKOFF_S)
+            self._record_yield(time.monotonic() - start)
+            return
+
+        backoff = getattr(state, "backoff", 0.0)
+        backoff = min(MAX_BACKOFF_S, max(MIN_BACKOFF_S, backoff * 2)) * weight
+        backoff = min(backoff, MAX_BACKOFF_S)
+        state.backoff = backoff
+        self._record_yield(backoff)
+        time.sleep(backoff)
+
+
+scheduler = ResourceScheduler()
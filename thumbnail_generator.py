@@ -1,17 +1,51 @@
 # thumbnail_generator.py
 from PIL import Image, UnidentifiedImageError
 from pathlib import Path
+import io
 import os
+import stat
+import struct
 import hashlib
+import threading
 import cv2
-import rawpy
+import numpy as np
+
+from raw_reader import is_raw, open_raw_image
+from packed_store import open_store
+from image_cache import decoded_images
 
 THUMBNAIL_SIZE = (128, 128)
 
+# Pirámide de miniaturas: un nivel por cada punto del rango de zoom de la
+# galería (64-256 px). Se generan todos con una sola decodificación del
+# original y la galería usa el más cercano al zoom actual.
+THUMBNAIL_LEVELS = (64, 128, 256)
+
+# Vídeos: la miniatura es el fotograma hacia el 10% de la duración (el primero
+# suele ser negro) y, con el mismo archivo abierto, se saca una tira de
+# VIDEO_SPRITE_FRAMES fotogramas repartidos por el vídeo para previsualizarlo
+# al pasar el ratón por la galería. La tira se guarda junto a la pirámide.
+VIDEO_THUMB_POSITION = 0.10
+VIDEO_SPRITE_FRAMES = 10
+VIDEO_SPRITE_FRAME_SIZE = 160
+VIDEO_SPRITE_LEVEL = "sprite"
+
+_cache_dir = None
+
+# Miniaturas generadas (o encontradas en disco) desde el último drain: la App
+# y el indexador de consola las pasan a la tabla 'thumbnails' de la BD.
+_generated_lock = threading.Lock()
+_generated_rows = []
+
 def get_cache_dir():
     """
     Determina la ruta de caché correcta según el sistema.
+    Se calcula una sola vez: cada miniatura no debe costar un mkdir.
     """
+    global _cache_dir
+    if _cache_dir is not None:
+        return _cache_dir
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
     # 1. MODO PORTABLE / DEV (Si podemos escribir junto al script)
@@ -23,35 +57,281 @@ def get_cache_dir():
         path = user_home / ".cache" / "visagevault" / "local_snapshot_cache"
 
     path.mkdir(parents=True, exist_ok=True)
+    _cache_dir = path
     return path
 
-def get_thumbnail_path(original_filepath: str) -> Path:
-    """Genera la ruta donde se guardará la miniatura."""
-    thumb_dir = get_cache_dir()
+def get_thumbnail_store():
+    """Almacén empaquetado (packed_store) donde viven las miniaturas."""
+    return open_store(get_cache_dir())
+
+def thumbnail_key(original_filepath: str, size: int, mtime_ns: int) -> str:
+    """Clave de la miniatura: ruta + tamaño + mtime. Si el archivo se edita, la clave cambia."""
+    raw = f"{original_filepath}|{size}|{mtime_ns}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def pick_thumbnail_level(display_size: int) -> int:
+    """Nivel más pequeño que cubre display_size (nunca se amplía una miniatura)."""
+    for level in THUMBNAIL_LEVELS:
+        if level >= display_size:
+            return level
+    return THUMBNAIL_LEVELS[-1]
+
+def thumbnail_entry(thumb_key: str, level: int = THUMBNAIL_SIZE[0]) -> str:
+    """Clave de un nivel de la miniatura dentro del almacén (ver read_thumbnail)."""
+    return f"{thumb_key}_{level}"
+
+def sprite_entry(thumb_key: str) -> str:
+    """Clave de la tira de fotogramas de un vídeo dentro del almacén."""
+    return thumbnail_entry(thumb_key, VIDEO_SPRITE_LEVEL)
+
+def read_thumbnail(entry: str):
+    """JPEG de la miniatura (bytes) o None si no está en el almacén."""
+    return get_thumbnail_store().get(entry)
+
+def _loose_thumbnail_path(thumb_key: str, level: int) -> Path:
+    """Versión anterior: un JPEG suelto por nivel (el base sin sufijo). Se migran al almacén."""
+    if level == THUMBNAIL_SIZE[0]:
+        return get_cache_dir() / f"{thumb_key}.jpg"
+    return get_cache_dir() / f"{thumb_key}_{level}.jpg"
+
+def _legacy_thumbnail_path(original_filepath: str) -> Path:
+    """Esquema antiguo (solo la ruta): se mantiene para migrar y limpiar."""
     file_hash = hashlib.sha256(original_filepath.encode('utf-8')).hexdigest()
-    return thumb_dir / f"{file_hash}.jpg"
+    return get_cache_dir() / f"{file_hash}.jpg"
 
-def generate_image_thumbnail(original_filepath: str) -> str | None:
-    original_filepath = Path(original_filepath)
-    if not original_filepath.is_file(): return None
+def get_thumbnail_entry(original_filepath: str, stat_result=None, level: int = THUMBNAIL_SIZE[0]):
+    """Clave en el almacén de la miniatura (según la huella actual del archivo), o None."""
+    original_filepath = str(original_filepath)
+    if stat_result is None:
+        try:
+            stat_result = os.stat(original_filepath)
+        except OSError:
+            return None
+    return thumbnail_entry(
+        thumbnail_key(original_filepath, stat_result.st_size, stat_result.st_mtime_ns), level
+    )
+
+def _record_generated(original_filepath: str, thumb_key: str, stat_result):
+    with _generated_lock:
+        _generated_rows.append((original_filepath, thumb_key, stat_result.st_size, stat_result.st_mtime_ns))
+
+def drain_generated_thumbnails() -> list:
+    """Devuelve (y vacía) las filas pendientes para VisageVaultDB.save_thumbnails."""
+    global _generated_rows
+    with _generated_lock:
+        rows, _generated_rows = _generated_rows, []
+    return rows
+
+def invalidate_thumbnail(original_filepath: str, thumb_key: str = None):
+    """
+    Borra la miniatura cacheada de un archivo que ha cambiado en disco.
+    thumb_key: la clave anterior (de VisageVaultDB.pop_thumbnail_keys); con la
+    huella nueva la clave ya es otra, así que esto solo libera espacio.
+    """
+    original_filepath = str(original_filepath)
+    keys = {thumb_key} if thumb_key else set()
+    try:
+        # La de la huella actual también (p.ej. generada pero aún no guardada en la BD)
+        st = os.stat(original_filepath)
+        keys.add(thumbnail_key(original_filepath, st.st_size, st.st_mtime_ns))
+    except OSError:
+        pass
+    get_thumbnail_store().delete(
+        thumbnail_entry(key, level) for key in keys for level in THUMBNAIL_LEVELS + (VIDEO_SPRITE_LEVEL,)
+    )
+    # Y la ya decodificada en RAM (ver image_cache)
+    decoded_images.invalidate_path(original_filepath)
+    stale = [_legacy_thumbnail_path(original_filepath)]
+    for key in keys:
+        stale.extend(_loose_thumbnail_path(key, level) for level in THUMBNAIL_LEVELS)
+    for path in stale:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+def _adopt_loose_thumbnails(original_filepath: str, thumb_key: str, stat_result):
+    """
+    Mete en el almacén (y borra) los JPEG sueltos de versiones anteriores: los
+    niveles con nombre por clave y, para el nivel base, la miniatura del
+    esquema por ruta si es más nueva que el archivo.
+    """
+    loose = {level: _loose_thumbnail_path(thumb_key, level) for level in THUMBNAIL_LEVELS}
+    legacy_path = _legacy_thumbnail_path(original_filepath)
+    try:
+        if legacy_path.stat().st_mtime_ns >= stat_result.st_mtime_ns and not loose[THUMBNAIL_SIZE[0]].exists():
+            loose[THUMBNAIL_SIZE[0]] = legacy_path
+        else:
+            legacy_path.unlink()
+    except OSError:
+        pass
+
+    items = []
+    for level, path in loose.items():
+        try:
+            items.append((thumbnail_entry(thumb_key, level), path.read_bytes()))
+        except OSError:
+            continue
+    if not items:
+        return
+    get_thumbnail_store().put_many(items)
+    for path in loose.values():
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
 
-    # Usamos la nueva función dinámica
-    thumbnail_path = get_thumbnail_path(str(original_filepath))
+def _find_existing_thumbnail(original_filepath: str, stat_result, level: int):
+    """
+    Clave y entrada del almacén del nivel pedido para la huella actual.
+    Si aún no está, se adoptan las miniaturas sueltas de versiones anteriores
+    en lugar de regenerarlas.
+    Devuelve (clave, entrada, existe).
+    """
+    thumb_key = thumbnail_key(original_filepath, stat_result.st_size, stat_result.st_mtime_ns)
+    entry = thumbnail_entry(thumb_key, level)
+    store = get_thumbnail_store()
+    if store.contains(entry):
+        return thumb_key, entry, True
+
+    _adopt_loose_thumbnails(original_filepath, thumb_key, stat_result)
+    return thumb_key, entry, store.contains(entry)
 
-    if thumbnail_path.exists():
-        return str(thumbnail_path)
+# Tolerancia de proporción entre la miniatura EXIF y la foto (las hay con bandas negras)
+EXIF_THUMB_ASPECT_TOLERANCE = 0.02
+
+# Etiquetas de IFD1 (miniatura EXIF): offset y longitud del JPEG embebido
+_TAG_JPEG_IF_OFFSET = 0x0201
+_TAG_JPEG_IF_LENGTH = 0x0202
+
+def _exif_thumbnail_bytes(exif: bytes):
+    """JPEG embebido en IFD1 del bloque EXIF (el APP1 que Pillow deja en info['exif'])."""
+    if not exif or not exif.startswith(b"Exif\x00\x00"):
+        return None
+    tiff = exif[6:]
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return None
+    endian = "<" if tiff[:2] == b"II" else ">"
+    try:
+        (ifd0,) = struct.unpack_from(endian + "I", tiff, 4)
+        (count,) = struct.unpack_from(endian + "H", tiff, ifd0)
+        (ifd1,) = struct.unpack_from(endian + "I", tiff, ifd0 + 2 + count * 12)
+        if not ifd1:
+            return None
+        (count,) = struct.unpack_from(endian + "H", tiff, ifd1)
+        offset = length = None
+        for i in range(count):
+            tag, _, _, value = struct.unpack_from(endian + "HHII", tiff, ifd1 + 2 + i * 12)
+            if tag == _TAG_JPEG_IF_OFFSET:
+                offset = value
+            elif tag == _TAG_JPEG_IF_LENGTH:
+                length = value
+    except struct.error:
+        return None
+    if not offset or not length or offset + length > len(tiff):
+        return None
+    return tiff[offset:offset + length]
 
+def _embedded_exif_thumbnail(img, target: int):
+    """
+    Miniatura EXIF de un JPEG si sirve para 'target' px: lo bastante grande y
+    con la misma proporción que la foto. Si no, None.
+    """
+    data = _exif_thumbnail_bytes(img.info.get("exif"))
+    if not data:
+        return None
+    try:
+        thumb = Image.open(io.BytesIO(data))
+        width, height = thumb.size
+        if max(width, height) < target:
+            return None
+        aspect = img.size[0] / img.size[1]
+        if abs(width / height - aspect) > aspect * EXIF_THUMB_ASPECT_TOLERANCE:
+            return None
+        thumb.load()
+        return thumb
+    except Exception:
+        return None
+
+def open_image_reduced(original_filepath, target: int):
+    """
+    Abre una imagen a la resolución mínima que cubre 'target' px, en este orden:
+    1. la miniatura EXIF embebida, si es lo bastante grande;
+    2. el escalado DCT de libjpeg (draft): el JPEG se decodifica ya a 1/2, 1/4
+       o 1/8, sin pasar por la resolución completa;
+    3. el resto de formatos, decodificación completa como antes.
+    """
+    img = Image.open(original_filepath)
+    if img.format == "JPEG":
+        embedded = _embedded_exif_thumbnail(img, target)
+        if embedded is not None:
+            img.close()
+            return embedded
+        img.draft("RGB", (target, target))
+    img.load()
+    return img
+
+def _encode_image_pyramid(image) -> list:
+    """
+    [(nivel, JPEG)] de todos los niveles a partir de UNA imagen ya decodificada.
+    Se va del nivel mayor al menor reduciendo cada vez la anterior (más barato
+    que reducir siempre desde el original).
+    """
+    levels = []
+    for level in sorted(THUMBNAIL_LEVELS, reverse=True):
+        image.thumbnail((level, level))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=80)
+        levels.append((level, buffer.getvalue()))
+    return levels
+
+def _store_pyramid(thumb_key: str, levels):
+    # Todos los niveles en una sola escritura del almacén
+    get_thumbnail_store().put_many((thumbnail_entry(thumb_key, level), data) for level, data in levels)
+
+def _save_image_pyramid(image, thumb_key: str):
+    """Genera y guarda en el almacén todos los niveles de una imagen ya decodificada."""
+    _store_pyramid(thumb_key, _encode_image_pyramid(image))
+
+def _encode_frame_pyramid(frame):
+    """Igual que _encode_image_pyramid, para un fotograma de OpenCV. None si no se pudo codificar."""
+    levels = []
+    for level in sorted(THUMBNAIL_LEVELS, reverse=True):
+        h, w = frame.shape[:2]
+        if max(h, w) > level:
+            if h > w:
+                new_h = level
+                new_w = max(1, int(w * (new_h / h)))
+            else:
+                new_w = level
+                new_h = max(1, int(h * (new_w / w)))
+            frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", frame)
+        if not ok:
+            return None
+        levels.append((level, encoded.tobytes()))
+    return levels
+
+def render_image_pyramid(original_filepath):
+    """
+    Decodifica el original una vez y devuelve [(nivel, JPEG)] de toda la
+    pirámide, o None si no se pudo leer. No toca el almacén: se puede llamar
+    en otro proceso (ver decode_pool).
+    """
+    original_filepath = Path(original_filepath)
     try:
         img_to_process = None
+        # Solo hace falta cubrir el nivel mayor de la pirámide
+        target = max(THUMBNAIL_LEVELS)
         try:
-            img_pil = Image.open(original_filepath)
-            img_pil.load()
-            img_to_process = img_pil
+            if is_raw(original_filepath):
+                # Vista previa incrustada en el RAW (sin revelar)
+                img_to_process, _ = open_raw_image(original_filepath, target)
+            else:
+                img_to_process = open_image_reduced(original_filepath, target)
         except (UnidentifiedImageError, IOError):
             try:
-                with rawpy.imread(str(original_filepath)) as raw:
-                    rgb = raw.postprocess(use_camera_wb=True)
-                    img_to_process = Image.fromarray(rgb)
+                img_to_process, _ = open_raw_image(original_filepath, target)
             except Exception:
                 return None
 
@@ -67,45 +347,148 @@ def generate_image_thumbnail(original_filepath: str) -> str | None:
             img_to_process = img_to_process.convert('RGB')
 
         # Redimensionar antes de guardar para ahorrar espacio
-        img_to_process.thumbnail(THUMBNAIL_SIZE)
-        img_to_process.save(thumbnail_path, "JPEG", quality=80)
+        levels = _encode_image_pyramid(img_to_process)
         img_to_process.close()
-
-        return str(thumbnail_path)
+        return levels
 
     except Exception as e:
         print(f"Error thumbnail imagen: {e}")
         return None
 
-def generate_video_thumbnail(original_filepath: str) -> str | None:
-    original_filepath = Path(original_filepath)
-    if not original_filepath.is_file(): return None
-
-    thumbnail_path = get_thumbnail_path(str(original_filepath))
+def _grab_frame(cap, msec=None):
+    """
+    Fotograma (BGR) hacia 'msec' del capture ya abierto (o el siguiente si es
+    None), o None. OpenCV no permite saltar solo a fotogramas clave: con
+    CAP_PROP_POS_MSEC el backend de FFmpeg salta al clave anterior y descodifica
+    hasta la marca de tiempo, así que el coste crece con la distancia entre
+    claves. grab() no convierte a BGR; retrieve solo el fotograma pedido.
+    """
+    if msec is not None and not cap.set(cv2.CAP_PROP_POS_MSEC, msec):
+        return None
+    if not cap.grab():
+        return None
+    ok, frame = cap.retrieve()
+    return frame if ok else None
 
-    if thumbnail_path.exists():
-        return str(thumbnail_path)
+def _encode_sprite(frames):
+    """Tira horizontal JPEG con los fotogramas reducidos a VIDEO_SPRITE_FRAME_SIZE (todos del mismo tamaño)."""
+    h, w = frames[0].shape[:2]
+    scale = VIDEO_SPRITE_FRAME_SIZE / max(h, w)
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    strip = np.hstack([cv2.resize(frame, size, interpolation=cv2.INTER_AREA) for frame in frames])
+    ok, encoded = cv2.imencode(".jpg", strip, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return encoded.tobytes() if ok else None
 
+def render_video_pyramid(original_filepath):
+    """
+    Como render_image_pyramid, para un vídeo: pirámide del fotograma hacia
+    VIDEO_THUMB_POSITION y, si se conoce la duración, la tira de fotogramas
+    (nivel VIDEO_SPRITE_LEVEL). Todo con una sola apertura del archivo.
+    """
     try:
         cap = cv2.VideoCapture(str(original_filepath))
-        success, frame = cap.read()
-        cap.release()
+        try:
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0
+            frame = sprite = None
+            if total > VIDEO_SPRITE_FRAMES and fps > 0:
+                duration_ms = total / fps * 1000
+                # La miniatura va entre los fotogramas de la tira y todo se pide
+                # en orden creciente: cada salto parte de donde quedó el anterior
+                positions = sorted(
+                    [(VIDEO_THUMB_POSITION, "thumb")]
+                    + [((i + 0.5) / VIDEO_SPRITE_FRAMES, i) for i in range(VIDEO_SPRITE_FRAMES)]
+                )
+                frames = []
+                for position, role in positions:
+                    grabbed = _grab_frame(cap, duration_ms * position)
+                    if role == "thumb":
+                        frame = grabbed
+                    else:
+                        frames.append(grabbed)
+                if all(f is not None for f in frames):
+                    sprite = _encode_sprite(frames)
+            if frame is None:
+                # Duración desconocida o sin saltos: el primer fotograma, como antes
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                frame = _grab_frame(cap)
+        finally:
+            cap.release()
 
-        if not success: return None
+        if frame is None: return None
 
-        h, w = frame.shape[:2]
-        if h > w:
-            new_h = THUMBNAIL_SIZE[1]
-            new_w = int(w * (new_h / h))
-        else:
-            new_w = THUMBNAIL_SIZE[0]
-            new_h = int(h * (new_w / w))
+        levels = _encode_frame_pyramid(frame)
+        if levels and sprite:
+            levels.append((VIDEO_SPRITE_LEVEL, sprite))
+        return levels
 
-        resized_frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
-        cv2.imwrite(str(thumbnail_path), resized_frame)
+    except Exception as e:
+        print(f"Error thumbnail vídeo: {e}")
+        return None
+
+def _generate_thumbnail(original_filepath, stat_result, level, render):
+    original_filepath = Path(original_filepath)
+    try:
+        stat_result = stat_result or original_filepath.stat()
+    except OSError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode): return None
 
-        return str(thumbnail_path)
+    thumb_key, entry, exists = _find_existing_thumbnail(str(original_filepath), stat_result, level)
+    if exists:
+        _record_generated(str(original_filepath), thumb_key, stat_result)
+        return entry
 
+    levels = render(str(original_filepath))
+    if not levels: return None
+
+    try:
+        _store_pyramid(thumb_key, levels)
     except Exception as e:
-        print(f"Error thumbnail vídeo: {e}")
+        print(f"Error guardando miniatura: {e}")
+        return None
+    _record_generated(str(original_filepath), thumb_key, stat_result)
+    return entry
+
+def generate_image_thumbnail(original_filepath: str, stat_result=None,
+                             level: int = THUMBNAIL_SIZE[0], render=None) -> str | None:
+    """
+    Devuelve la entrada en el almacén de la miniatura del nivel pedido (ver
+    THUMBNAIL_LEVELS y read_thumbnail). Si falta, se decodifica el original
+    una vez y se generan todos los niveles.
+    'render' sustituye a render_image_pyramid (p.ej. para decodificar en otro proceso).
+    """
+    return _generate_thumbnail(original_filepath, stat_result, level, render or render_image_pyramid)
+
+def generate_video_thumbnail(original_filepath: str, stat_result=None,
+                             level: int = THUMBNAIL_SIZE[0], render=None) -> str | None:
+    return _generate_thumbnail(original_filepath, stat_result, level, render or render_video_pyramid)
+
+def generate_video_sprite(original_filepath: str, stat_result=None, render=None) -> str | None:
+    """
+    Entrada de la tira de fotogramas de un vídeo, o None si no se pudo sacar.
+    Normalmente se generó con la miniatura; las de versiones anteriores no la
+    tienen y se rehace la pirámide completa (de paso, con el fotograma al 10%).
+    'render' sustituye a render_video_pyramid (p.ej. para decodificar en otro proceso).
+    """
+    original_filepath = str(original_filepath)
+    try:
+        stat_result = stat_result or os.stat(original_filepath)
+    except OSError:
+        return None
+    thumb_key = thumbnail_key(original_filepath, stat_result.st_size, stat_result.st_mtime_ns)
+    entry = sprite_entry(thumb_key)
+    store = get_thumbnail_store()
+    if store.contains(entry):
+        return entry
+
+    levels = (render or render_video_pyramid)(original_filepath)
+    if not levels or not any(level == VIDEO_SPRITE_LEVEL for level, _ in levels):
+        return None
+    try:
+        _store_pyramid(thumb_key, levels)
+    except Exception as e:
+        print(f"Error guardando tira de vídeo: {e}")
         return None
+    _record_generated(original_filepath, thumb_key, stat_result)
+    return entry
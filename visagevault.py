@@ -26,6 +26,7 @@
 
 import sys
 import os
+import io
 from pathlib import Path
 import datetime
 import locale
@@ -34,6 +35,7 @@ import sqlite3
 import time
 
 import threading # Necesario para evitar que la UI se congele
+import multiprocessing
 from drive_auth import DriveAuthenticator
 import requests # Para bajar thumbnails
 from drive_manager import DriveManager
@@ -67,7 +69,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import (
     Qt, QSize, QObject, Signal, QThread, Slot, QTimer,
     QRunnable, QThreadPool, QPropertyAnimation, QEasingCurve, QRect, QPoint, QRectF,
-    QPointF, QBuffer, QIODevice, QUrl, QEventLoop, QEvent
+    QPointF, QUrl, QEventLoop, QEvent
 )
 from PySide6.QtGui import (
     QPixmap, QIcon, QCursor, QTransform, QPainter, QPaintEvent,
@@ -75,17 +77,30 @@ from PySide6.QtGui import (
 )
 
 # --- MODIFICADO: Importar las funciones de foto Y vídeo ---
-from photo_finder import find_photos, find_videos
+from photo_finder import (
+    MediaCrawl, IgnoreRules, IGNORE_FILENAME, IMAGE_EXTENSIONS, VIDEO_EXTENSIONS,
+    fingerprint, compare_fingerprint
+)
 import config_manager
-from metadata_reader import get_photo_date, get_video_date
+from metadata_reader import (
+    get_photo_date, get_photo_dates, get_video_date, parse_date_from_filename, DATE_READER_WORKERS
+)
 from thumbnail_generator import (
-    generate_image_thumbnail, generate_video_thumbnail, THUMBNAIL_SIZE
+    generate_image_thumbnail, generate_video_thumbnail, invalidate_thumbnail, THUMBNAIL_SIZE,
+    thumbnail_entry, get_thumbnail_store, read_thumbnail, pick_thumbnail_level,
+    drain_generated_thumbnails, VIDEO_SPRITE_FRAMES
 )
+from packed_store import open_store
+from cache_manager import cache_manager
+from image_cache import decoded_images
+from scan_scheduler import scheduler, HEARTBEAT_INTERVAL_MS
+from face_scanner import detect_faces, warm_up as warm_up_face_scanner, FACE_SCAN_MAX_WIDTH
+from raw_reader import is_raw, open_raw_image
+import decode_pool
 # --- FIN DE MODIFICACIÓN ---
 
 import metadata_reader
 import piexif.helper
-import re
 import db_manager
 from db_manager import VisageVaultDB
 import face_recognition
@@ -95,49 +110,41 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import pickle
 import shutil
 import hashlib
-from functools import lru_cache
 
-# =================================================================
-# EXTRACTOR DE FECHA POR NOMBRE DE ARCHIVO
-# =================================================================
-def parse_date_from_filename(filepath):
+def load_packed_image(store, key: str, track: bool = True) -> QImage:
     """
-    Intenta extraer la fecha (Año, Mes) basándose exclusivamente en el nombre del archivo.
-    Soporta: YYYYMMDD, DD-MM-YYYY, YYYY-MM-DD, DDMMYYYY.
+    QImage de una entrada de un almacén empaquetado (packed_store); nula si no está.
+    track=False cuando el acierto/fallo ya se contó (ver cache_manager).
     """
-    filename = os.path.basename(filepath)
-
-    # 1. Patrón YYYYMMDD (Ej: IMG-20250304-..., VID-20240411..., 20231005.jpg)
-    # Busca 20xx seguido de mes (01-12) y día (01-31)
-    match = re.search(r'(20\d{2})(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])', filename)
-    if match:
-        return match.group(1), match.group(2) # Retorna (Año, Mes)
-
-    # 2. Patrón DD-MM-YYYY o DD.MM.YYYY o DD_MM_YYYY (Ej: 07-10-2023.jpg)
-    match = re.search(r'(0[1-9]|[12]\d|3[01])[-._](0[1-9]|1[0-2])[-._](20\d{2})', filename)
-    if match:
-        return match.group(3), match.group(2) # Retorna (Año, Mes)
-
-    # 3. Patrón YYYY-MM-DD (Ej: 2023-11-01_Foto.jpg)
-    match = re.search(r'(20\d{2})[-._](0[1-9]|1[0-2])[-._](0[1-9]|[12]\d|3[01])', filename)
-    if match:
-        return match.group(1), match.group(2)
-
-    # 4. Patrón DDMMYYYY Compacto (Ej: IMG-04122021.jpg -> 04/12/2021)
-    # Asume formato europeo DDMMYYYY si no hay separadores
-    match = re.search(r'(0[1-9]|[12]\d|3[01])(0[1-9]|1[0-2])(20\d{2})', filename)
-    if match:
-        return match.group(3), match.group(2)
-
-    return None, None
-
-# --- FUNCIÓN GLOBAL DE CACHÉ EN RAM ---
-# Guarda las últimas 500 imágenes en memoria para que el scroll sea instantáneo
-@lru_cache(maxsize=500)
-def get_cached_pixmap(filepath: str) -> QPixmap:
-    if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-        return QPixmap(filepath)
-    return QPixmap()
+    image = QImage()
+    data = store.get(key, track)
+    if data:
+        image.loadFromData(data)
+    return image
+
+# --- CACHÉ EN RAM DE IMÁGENES DECODIFICADAS ---
+# Para que el scroll sea instantáneo (ver image_cache). Se puede llamar desde
+# los workers: guarda QImage y el QPixmap se saca en el hilo de la interfaz.
+def get_cached_image(store, key: str, path: str = None, track: bool = True) -> QImage:
+    """'path': archivo al que pertenece la entrada, para invalidarla si cambia."""
+    namespace = str(store.directory)
+    image = decoded_images.get(namespace, key)
+    if image is None:
+        image = load_packed_image(store, key, track)
+        decoded_images.put(namespace, key, image, path)
+    return image
+
+# Lado mínimo de la imagen de un RAW en las vistas previas a pantalla completa:
+# la vista previa incrustada suele llegar; si no, se revela a media resolución
+RAW_PREVIEW_MIN_SIZE = 1920
+
+def load_raw_pixmap(filepath: str) -> QPixmap:
+    """QPixmap de un archivo RAW para mostrarlo (sin revelado completo)."""
+    # En el pool de decodificación si está activo (ver decode_pool)
+    rgb, width, height = decode_pool.load_raw_preview(filepath, RAW_PREVIEW_MIN_SIZE)
+    bytes_per_line = 3 * width
+    q_image = QImage(rgb, width, height, bytes_per_line, QImage.Format.Format_RGB888).copy()
+    return QPixmap.fromImage(q_image)
 
 def resource_path(relative_path):
     """Obtiene la ruta absoluta al recurso tanto en PyInstaller como en desarrollo."""
@@ -157,34 +164,76 @@ except locale.Error:
 # Constante para el margen de precarga (en píxeles)
 PRELOAD_MARGIN_PX = 500
 
+# Escaneo progresivo: el worker envía a la galería lotes de este tamaño...
+SCAN_BATCH_SIZE = 500
+# ...o lo que lleve acumulado cada X segundos si la lectura de fechas va lenta
+SCAN_BATCH_INTERVAL_S = 1.0
+# La galería agrupa los lotes y redibuja como mucho una vez cada X ms
+SCAN_BATCH_REDRAW_MS = 1500
+# Fotos nuevas cuya fecha EXIF se lee de una vez en el pool de lectura
+DATE_READ_CHUNK = 64
+# Pregeneración de miniaturas: cada X se informa del progreso y se guarda en la BD
+PREGEN_PROGRESS_EVERY = 50
+
 # =================================================================
 # DEFINICIÓN ÚNICA DE SEÑALES PARA EL THUMBNAILLOADER
 # =================================================================
 class ThumbnailLoaderSignals(QObject):
     """Contenedor de señales para la clase QRunnable."""
-    thumbnail_loaded = Signal(str, QPixmap) # original_path, pixmap
+    thumbnail_loaded = Signal(str, QImage) # original_path, imagen (a QPixmap en la interfaz)
     load_failed = Signal(str)
 
+def _emit_indexed_thumbnail(thumbnail_entry, original_filepath, signals) -> bool:
+    """
+    Camino rápido: la miniatura viene de la tabla 'thumbnails' y se lee del
+    almacén sin stat del original. Si ya no está, devuelve False y el loader
+    la genera como siempre.
+    """
+    if not thumbnail_entry:
+        return False
+    store = get_thumbnail_store()
+    try:
+        image = get_cached_image(store, thumbnail_entry, original_filepath, False)
+    except Exception:
+        return False
+    if image.isNull():
+        return False  # El fallo lo cuenta el generador
+    # Acierto también cuando lo sirve la caché en RAM: no hubo que generarla
+    store.record_lookup(True)
+    signals.thumbnail_loaded.emit(original_filepath, image)
+    return True
+
 # =================================================================
 # CLASE PARA CARGAR MINIATURAS DE IMAGEN (QRunnable)
 # =================================================================
 class ThumbnailLoader(QRunnable):
-    def __init__(self, original_filepath: str, signals: ThumbnailLoaderSignals):
+    def __init__(self, original_filepath: str, signals: ThumbnailLoaderSignals,
+                 thumbnail_entry: str = None, level: int = THUMBNAIL_SIZE[0]):
         super().__init__()
         self.original_filepath = original_filepath
         self.signals = signals
+        # Miniatura ya resuelta por la tabla 'thumbnails' (sin tocar el original)
+        self.thumbnail_entry = thumbnail_entry
+        # Nivel de la pirámide que corresponde al zoom actual
+        self.level = level
 
     @Slot()
     def run(self):
-        # 1. Generar si no existe (esto escribe en disco)
-        thumbnail_path = generate_image_thumbnail(self.original_filepath)
+        if _emit_indexed_thumbnail(self.thumbnail_entry, self.original_filepath, self.signals):
+            return
+
+        # 1. Generar si no existe (esto escribe en el almacén; se decodifica en
+        #    el pool de procesos si está activo)
+        thumbnail_entry = decode_pool.generate_image_thumbnail(self.original_filepath, level=self.level)
 
-        if thumbnail_path:
+        if thumbnail_entry:
             try:
                 # 2. Cargar usando CACHÉ DE RAM (¡Mucho más rápido!)
-                pixmap = get_cached_pixmap(thumbnail_path)
-                if not pixmap.isNull():
-                    self.signals.thumbnail_loaded.emit(self.original_filepath, pixmap)
+                store = get_thumbnail_store()
+                # (el generador ya contó el acierto o el fallo de la caché)
+                image = get_cached_image(store, thumbnail_entry, self.original_filepath, False)
+                if not image.isNull():
+                    self.signals.thumbnail_loaded.emit(self.original_filepath, image)
                 else:
                     self.signals.load_failed.emit(self.original_filepath)
             except Exception:
@@ -196,20 +245,27 @@ class ThumbnailLoader(QRunnable):
 # CLASE PARA CARGAR MINIATURAS DE VÍDEO (QRunnable) - ¡NUEVA!
 # =================================================================
 class VideoThumbnailLoader(QRunnable):
-    def __init__(self, original_filepath: str, signals: ThumbnailLoaderSignals):
+    def __init__(self, original_filepath: str, signals: ThumbnailLoaderSignals,
+                 thumbnail_entry: str = None, level: int = THUMBNAIL_SIZE[0]):
         super().__init__()
         self.original_filepath = original_filepath
         self.signals = signals
+        self.thumbnail_entry = thumbnail_entry
+        self.level = level
 
     @Slot()
     def run(self):
-        thumbnail_path = generate_video_thumbnail(self.original_filepath)
-        if thumbnail_path:
+        if _emit_indexed_thumbnail(self.thumbnail_entry, self.original_filepath, self.signals):
+            return
+
+        thumbnail_entry = decode_pool.generate_video_thumbnail(self.original_filepath, level=self.level)
+        if thumbnail_entry:
             try:
                 # Usar Caché RAM
-                pixmap = get_cached_pixmap(thumbnail_path)
-                if not pixmap.isNull():
-                    self.signals.thumbnail_loaded.emit(self.original_filepath, pixmap)
+                store = get_thumbnail_store()
+                image = get_cached_image(store, thumbnail_entry, self.original_filepath, False)
+                if not image.isNull():
+                    self.signals.thumbnail_loaded.emit(self.original_filepath, image)
                 else:
                     self.signals.load_failed.emit(self.original_filepath)
             except Exception:
@@ -217,6 +273,122 @@ class VideoThumbnailLoader(QRunnable):
         else:
             self.signals.load_failed.emit(self.original_filepath)
 
+# =================================================================
+# COLA DE MINIATURAS DE LA GALERÍA (PRIORIDAD POR DISTANCIA AL VIEWPORT)
+# =================================================================
+class ThumbnailJobQueue:
+    """
+    Cola de miniaturas de una galería (fotos o vídeos), en el hilo de la
+    interfaz. Al threadpool solo pasan tantos trabajos como hilos tiene; el
+    resto espera aquí ordenado por distancia al viewport, que se recalcula en
+    cada scroll. Lo que se queda fuera del margen de precarga se descarta y su
+    item vuelve a 'not_loaded', para pedirlo otra vez si se vuelve a ver.
+    """
+
+    def __init__(self, threadpool: QThreadPool, scroll_area: QScrollArea):
+        self.threadpool = threadpool
+        self.scroll_area = scroll_area
+        self._pending = {}    # ruta -> (item, fábrica del QRunnable)
+        self._order = []      # rutas pendientes, de la más cercana a la más lejana
+        self._in_flight = {}  # ruta -> item, ya en el threadpool
+
+    def submit(self, path, item, make_loader):
+        """Encola la miniatura del item (hay que llamar a reprioritize después)."""
+        if path in self._pending or path in self._in_flight:
+            return
+        item.setData(Qt.UserRole + 1, "loading") # Marcar como "cargando"
+        item.setText("Cargando...")
+        self._pending[path] = (item, make_loader)
+
+    def _distance(self, item):
+        """Píxeles en vertical del item al viewport (0 = visible); None si el item ya no existe."""
+        try:
+            list_widget = item.listWidget()
+            if list_widget is None:
+                return None
+            viewport = self.scroll_area.viewport()
+            rect = list_widget.visualItemRect(item)
+            top = list_widget.mapTo(viewport, rect.topLeft()).y()
+        except RuntimeError:
+            return None # Galería reconstruida: el item se borró
+        bottom = top + rect.height()
+        if bottom < 0:
+            return -bottom
+        return max(0, top - viewport.height())
+
+    def reprioritize(self):
+        """Reordena lo pendiente según el viewport actual, descarta lo lejano y lanza lo siguiente."""
+        distances = {}
+        for path, (item, _) in list(self._pending.items()):
+            distance = self._distance(item)
+            if distance is None:
+                del self._pending[path]
+            elif distance > PRELOAD_MARGIN_PX:
+                # Ya no se ve: fuera de la cola, y se reintentará al volver
+                del self._pending[path]
+                item.setData(Qt.UserRole + 1, "not_loaded")
+            else:
+                distances[path] = distance
+        self._order = sorted(distances, key=distances.get)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._order and len(self._in_flight) < self.threadpool.maxThreadCount():
+            path = self._order.pop(0)
+            entry = self._pending.pop(path, None)
+            if entry is None:
+                continue
+            self._in_flight[path] = entry[0]
+            self.threadpool.start(entry[1]())
+
+    def job_done(self, path):
+        """La miniatura llegó (o falló): deja sitio al siguiente trabajo."""
+        if self._in_flight.pop(path, None) is not None:
+            self._dispatch()
+
+    def cancel(self):
+        """
+        Antes de vaciar el threadpool (cambio de pestaña...): todo lo encolado
+        vuelve a 'not_loaded'. Lo que ya se estaba ejecutando termina y
+        actualiza su item igualmente.
+        """
+        items = [item for item, _ in self._pending.values()] + list(self._in_flight.values())
+        for item in items:
+            try:
+                item.setData(Qt.UserRole + 1, "not_loaded")
+            except RuntimeError:
+                pass
+        self.discard()
+
+    def discard(self):
+        """La galería se reconstruye: sus items ya no existen."""
+        self._pending.clear()
+        self._order = []
+        self._in_flight.clear()
+
+class VideoSpriteSignals(QObject):
+    sprite_loaded = Signal(str, bytes) # original_path, JPEG de la tira (vacío si no hay)
+
+class VideoSpriteLoader(QRunnable):
+    """Tira de fotogramas de un vídeo para previsualizarlo al pasar el ratón."""
+    def __init__(self, original_filepath: str, signals: VideoSpriteSignals):
+        super().__init__()
+        self.original_filepath = original_filepath
+        self.signals = signals
+
+    @Slot()
+    def run(self):
+        data = b""
+        try:
+            # Normalmente ya está en el almacén (se genera con la miniatura)
+            entry = decode_pool.generate_video_sprite(self.original_filepath)
+            if entry:
+                data = get_thumbnail_store().get(entry, False) or b""
+        except Exception:
+            pass
+        # Los bytes se convierten en QPixmap en el hilo de la interfaz
+        self.signals.sprite_loaded.emit(self.original_filepath, data)
+
 # =================================================================
 # CLASE: NetworkThumbnailLoader (CON CACHÉ EN DISCO)
 # =================================================================
@@ -227,21 +399,17 @@ class NetworkThumbnailLoader(QRunnable):
         self.file_id = file_id
         self.signals = signals
 
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.cache_dir = os.path.join(base_dir, "visagevault_cache", "drive_snapshot_cache")
-        if not os.path.exists(self.cache_dir):
-            try: os.makedirs(self.cache_dir)
-            except: pass
+        self.cache_dir = os.path.join(config_manager.get_cache_root(), "drive_snapshot_cache")
 
     @Slot()
     def run(self):
-        cache_path = os.path.join(self.cache_dir, f"{self.file_id}.jpg")
+        store = open_store(self.cache_dir)
 
         # 1. INTENTO CACHÉ DISCO + RAM
-        if os.path.exists(cache_path) and os.path.getsize(cache_path) > 0:
-            pixmap = get_cached_pixmap(cache_path) # <--- RAM CACHE
-            if not pixmap.isNull():
-                self.signals.thumbnail_loaded.emit(self.file_id, pixmap)
+        if store.contains(self.file_id):
+            image = get_cached_image(store, self.file_id, self.file_id, False) # <--- RAM CACHE
+            if not image.isNull():
+                self.signals.thumbnail_loaded.emit(self.file_id, image)
                 return
 
         # 2. DESCARGA
@@ -250,13 +418,12 @@ class NetworkThumbnailLoader(QRunnable):
         try:
             response = requests.get(self.url, timeout=10)
             if response.status_code == 200:
-                with open(cache_path, 'wb') as f:
-                    f.write(response.content)
+                store.put(self.file_id, response.content)
 
                 # Cargar en memoria y cachear
-                pixmap = get_cached_pixmap(cache_path) # <--- Se guarda en LRU Cache al leer
-                if not pixmap.isNull():
-                    self.signals.thumbnail_loaded.emit(self.file_id, pixmap)
+                image = get_cached_image(store, self.file_id, self.file_id, False) # <--- Se guarda en la caché al leer
+                if not image.isNull():
+                    self.signals.thumbnail_loaded.emit(self.file_id, image)
         except Exception:
             pass
 
@@ -414,7 +581,7 @@ class DriveFolderDialog(QDialog):
 # SEÑALES Y WORKER PARA CARGAR Y RECORTAR CARAS (Sin cambios)
 # =================================================================
 class FaceLoaderSignals(QObject):
-    face_loaded = Signal(int, QPixmap, str)
+    face_loaded = Signal(int, QImage, str) # face_id, imagen (a QPixmap en la interfaz), foto
     face_load_failed = Signal(int)
 
 # =================================================================
@@ -481,19 +648,10 @@ class DriveScanWorker(QObject):
         self.folder_id = folder_id
         self.db_path = db_path
         self.is_running = True
-        self.slow_mode = False # <--- NUEVA VARIABLE DE CONTROL
-
-    @Slot(bool)
-    def set_slow_mode(self, active):
-        """Slot para activar/desactivar el modo de baja prioridad."""
-        self.slow_mode = active
-        if active:
-            print("🐢 Worker Drive: Entrando en modo lento (Prioridad a carpetas)")
-        else:
-            print("🐇 Worker Drive: Volviendo a velocidad normal")
 
     @Slot()
     def run(self):
+        scheduler.enter("background_io")
         local_db = VisageVaultDB(os.path.basename(self.db_path), is_worker=True)
         local_db.db_path = self.db_path
         local_db.conn = sqlite3.connect(self.db_path, check_same_thread=False)
@@ -514,12 +672,9 @@ class DriveScanWorker(QObject):
 
                 buffer.extend(batch_of_images)
 
-                # --- AQUÍ ESTÁ LA MAGIA DE LA PRIORIDAD ---
-                if self.slow_mode:
-                    # Si estamos en modo lento, dormimos 1.5 segundos.
-                    # Esto deja la red y la CPU libres para que el Árbol de Carpetas cargue rápido.
-                    time.sleep(1.5)
-                # ------------------------------------------
+                # Cede el paso mientras la interfaz está ocupada (p.ej. cargando
+                # el árbol de carpetas); con la interfaz libre no espera nada.
+                scheduler.checkpoint()
 
                 if len(buffer) >= BATCH_SIZE:
                     self._save_to_db(local_db, buffer)
@@ -530,8 +685,6 @@ class DriveScanWorker(QObject):
                         self.progress.emit(f"Indexando nube... {count} fotos guardadas.")
                         last_update_time = time.time()
 
-                    time.sleep(0.05) # Pausa normal
-
             if buffer:
                 self._save_to_db(local_db, buffer)
                 count += len(buffer)
@@ -699,22 +852,41 @@ class FaceLoader(QRunnable):
             self.cache_dir = os.path.join(user_home, ".cache", "visagevault", "face_cache")
         # --------------------------
 
-        if not os.path.exists(self.cache_dir):
-            try: os.makedirs(self.cache_dir, exist_ok=True)
-            except: pass
-
-        self.cache_path = os.path.join(self.cache_dir, f"face_{self.face_id}.jpg")
+        # Clave en el almacén empaquetado; cache_path es el JPEG suelto de versiones anteriores
+        self.cache_key = f"face_{self.face_id}"
+        self.cache_path = os.path.join(self.cache_dir, f"{self.cache_key}.jpg")
 
     @Slot()
     def run(self):
         try:
-            pixmap = QPixmap()
+            # 0. Caché en RAM de imágenes decodificadas
+            image = decoded_images.get("faces", self.face_id)
+            if image is not None:
+                try:
+                    self.signals.face_loaded.emit(self.face_id, image, self.photo_path)
+                except RuntimeError:
+                    pass
+                return
 
-            # 1. INTENTO DE CARGA RÁPIDA (CACHÉ)
+            image = QImage()
+            store = open_store(self.cache_dir)
+
+            # Migrar la cara cacheada como archivo suelto al almacén
             if os.path.exists(self.cache_path):
-                if pixmap.load(self.cache_path):
+                try:
+                    with open(self.cache_path, 'rb') as f:
+                        store.put(self.cache_key, f.read())
+                    os.remove(self.cache_path)
+                except OSError:
+                    pass
+
+            # 1. INTENTO DE CARGA RÁPIDA (CACHÉ)
+            data = store.get(self.cache_key)
+            if data:
+                if image.loadFromData(data):
+                    decoded_images.put("faces", self.face_id, image, self.photo_path)
                     try:
-                        self.signals.face_loaded.emit(self.face_id, pixmap, self.photo_path)
+                        self.signals.face_loaded.emit(self.face_id, image, self.photo_path)
                     except RuntimeError:
                         pass # Ignorar si la app se cerró mientras cargábamos
                     return
@@ -723,19 +895,12 @@ class FaceLoader(QRunnable):
             location = ast.literal_eval(self.location_str)
             (top, right, bottom, left) = location
 
-            RAW_EXTENSIONS = ('.nef', '.cr2', '.cr3', '.crw', '.arw', '.srf', '.orf', '.rw2', '.raf', '.pef', '.dng', '.raw')
-            file_suffix = Path(self.photo_path).suffix.lower()
-
             img = None
 
-            if file_suffix in RAW_EXTENSIONS:
-                try:
-                    with rawpy.imread(self.photo_path) as raw:
-                        rgb_array = raw.postprocess()
-                        img = Image.fromarray(rgb_array)
-                except Exception as e:
-                    # print(f"Error rawpy en FaceLoader: {e}")
-                    raise e
+            if is_raw(self.photo_path):
+                # Vista previa del RAW: las coordenadas guardadas son del revelado completo
+                img, raw_scale = open_raw_image(self.photo_path, FACE_SCAN_MAX_WIDTH)
+                top, right, bottom, left = (int(v / raw_scale) for v in (top, right, bottom, left))
             else:
                 img = Image.open(self.photo_path)
 
@@ -745,27 +910,26 @@ class FaceLoader(QRunnable):
             # Recortar la cara
             face_image_pil = img.crop((left, top, right, bottom))
 
-            # 3. GUARDAR EN CACHÉ
+            # 3. GUARDAR EN CACHÉ (el mismo JPEG se decodifica para mostrarlo)
+            if face_image_pil.mode != "RGB":
+                face_image_pil = face_image_pil.convert("RGB")
+            jpeg_buffer = io.BytesIO()
+            face_image_pil.save(jpeg_buffer, "JPEG", quality=90)
             try:
-                if face_image_pil.mode != "RGB":
-                    face_image_pil = face_image_pil.convert("RGB")
-                face_image_pil.save(self.cache_path, "JPEG", quality=90)
+                store.put(self.cache_key, jpeg_buffer.getvalue())
             except Exception as e:
                 print(f"No se pudo guardar caché para cara {self.face_id}: {e}")
 
-            # 4. Convertir a QPixmap
-            buffer = QBuffer()
-            buffer.open(QIODevice.OpenModeFlag.ReadWrite)
-            face_image_pil.save(buffer, "PNG")
-            pixmap.loadFromData(buffer.data())
-            buffer.close()
+            # 4. Convertir a QImage (el QPixmap se crea en el hilo de la interfaz)
+            image.loadFromData(jpeg_buffer.getvalue())
 
-            if pixmap.isNull():
-                raise Exception("QPixmap nulo después de la conversión.")
+            if image.isNull():
+                raise Exception("QImage nula después de la conversión.")
+            decoded_images.put("faces", self.face_id, image, self.photo_path)
 
             # --- PROTECCIÓN CONTRA CIERRE ---
             try:
-                self.signals.face_loaded.emit(self.face_id, pixmap, self.photo_path)
+                self.signals.face_loaded.emit(self.face_id, image, self.photo_path)
             except RuntimeError:
                 pass # App cerrada, no hacer nada
 
@@ -1230,6 +1394,74 @@ class PreviewListWidget(QListWidget):
             if self.height() != new_height and new_height > 0:
                 self.setFixedHeight(new_height)
 
+class VideoPreviewListWidget(PreviewListWidget):
+    """
+    Lista de vídeos con previsualización al pasar el ratón: la posición
+    horizontal del cursor sobre la miniatura elige un fotograma de la tira del
+    vídeo (ver VIDEO_SPRITE_FRAMES). Al salir se recupera la miniatura.
+    """
+    spriteRequested = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self._sprites = {} # ruta -> QPixmap (None mientras se carga)
+        self._scrub_item = None
+        self._scrub_icon = None
+        self._scrub_frame = None
+
+    def set_sprite(self, path, pixmap):
+        self._sprites[path] = pixmap
+
+    def stop_scrub(self, item=None):
+        """Vuelve a poner la miniatura del vídeo que se estaba previsualizando (solo si es 'item', si se indica)."""
+        if item is not None and item is not self._scrub_item:
+            return
+        if self._scrub_item is not None and self._scrub_icon is not None:
+            self._scrub_item.setIcon(self._scrub_icon)
+        self._scrub_item = None
+        self._scrub_icon = None
+        self._scrub_frame = None
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        if event.buttons() != Qt.NoButton:
+            return # Arrastrando para seleccionar
+        pos = event.position().toPoint()
+        item = self.itemAt(pos)
+        if item is not self._scrub_item:
+            self.stop_scrub()
+        if item is None or item.data(Qt.UserRole + 1) != "loaded":
+            return
+
+        path = item.data(Qt.UserRole)
+        if path not in self._sprites:
+            self._sprites[path] = None
+            self.spriteRequested.emit(path)
+            return
+        sprite = self._sprites[path]
+        if sprite is None or sprite.isNull():
+            return
+
+        rect = self.visualItemRect(item)
+        fraction = (pos.x() - rect.left()) / max(1, rect.width())
+        frame = min(VIDEO_SPRITE_FRAMES - 1, max(0, int(fraction * VIDEO_SPRITE_FRAMES)))
+        if item is self._scrub_item and frame == self._scrub_frame:
+            return
+
+        if self._scrub_item is None:
+            self._scrub_item = item
+            self._scrub_icon = item.icon()
+        self._scrub_frame = frame
+        frame_width = sprite.width() // VIDEO_SPRITE_FRAMES
+        frame_pixmap = sprite.copy(frame * frame_width, 0, frame_width, sprite.height())
+        size = item.sizeHint()
+        item.setIcon(QIcon(frame_pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)))
+
+    def leaveEvent(self, event):
+        self.stop_scrub()
+        super().leaveEvent(event)
+
 # =================================================================
 # CLASE PARA VISTA PREVIA CON ZOOM (ImagePreviewDialog)
 # =================================================================
@@ -1409,18 +1641,10 @@ class PhotoDetailDialog(QDialog):
         # ... (MANTENER EL CÓDIGO DE CARGA DE IMAGEN/RAW IGUAL QUE ANTES) ...
         # (No copies esto, solo deja el método _load_photo tal cual lo tenías)
         try:
-            # Definir extensiones RAW
-            RAW_EXTENSIONS = ('.nef', '.cr2', '.cr3', '.crw', '.arw', '.srf', '.orf', '.rw2', '.raf', '.pef', '.dng', '.raw')
-            file_suffix = Path(self.original_path).suffix.lower()
             pixmap = QPixmap()
 
-            if file_suffix in RAW_EXTENSIONS:
-                with rawpy.imread(self.original_path) as raw:
-                    rgb_array = raw.postprocess()
-                height, width, channel = rgb_array.shape
-                bytes_per_line = 3 * width
-                q_image = QImage(rgb_array.data, width, height, bytes_per_line, QImage.Format.Format_RGB888).copy()
-                pixmap = QPixmap.fromImage(q_image)
+            if is_raw(self.original_path):
+                pixmap = load_raw_pixmap(self.original_path)
             else:
                 pixmap = QPixmap(self.original_path)
 
@@ -1576,8 +1800,9 @@ class FaceClusterDialog(QDialog):
                 self.accept()
         except Exception as e:
             print(f"Error al guardar el cluster: {e}")
-    @Slot(int, QPixmap, str)
-    def _on_dialog_face_loaded(self, face_id: int, pixmap: QPixmap, photo_path: str):
+    @Slot(int, QImage, str)
+    def _on_dialog_face_loaded(self, face_id: int, image: QImage, photo_path: str):
+        pixmap = QPixmap.fromImage(image)
         for i in range(self.face_grid_layout.count()):
             widget = self.face_grid_layout.itemAt(i).widget()
             if widget and hasattr(widget, 'property') and widget.property("face_id") == face_id:
@@ -1598,21 +1823,12 @@ class FaceClusterDialog(QDialog):
             return
 
         # --- SOPORTE RAW PARA VISTA PREVIA ---
-        RAW_EXTENSIONS = ('.nef', '.cr2', '.cr3', '.crw', '.arw', '.srf', '.orf', '.rw2', '.raf', '.pef', '.dng', '.raw')
-        file_suffix = Path(photo_path).suffix.lower()
-
         full_pixmap = QPixmap()
 
         try:
-            if file_suffix in RAW_EXTENSIONS:
-                # Procesar con rawpy
-                with rawpy.imread(photo_path) as raw:
-                    rgb_array = raw.postprocess()
-
-                height, width, channel = rgb_array.shape
-                bytes_per_line = 3 * width
-                q_image = QImage(rgb_array.data, width, height, bytes_per_line, QImage.Format.Format_RGB888).copy()
-                full_pixmap = QPixmap.fromImage(q_image)
+            if is_raw(photo_path):
+                # Vista previa incrustada en el RAW
+                full_pixmap = load_raw_pixmap(photo_path)
             else:
                 # Procesar estándar
                 full_pixmap = QPixmap(photo_path)
@@ -1710,16 +1926,21 @@ class DateChangeDialog(QDialog):
 class PhotoFinderWorker(QObject):
     finished = Signal(dict)
     progress = Signal(str)
+    batch_ready = Signal(dict) # {ruta: (año, mes)} parcial, mientras el escaneo sigue
+    artifacts_invalidated = Signal(list) # Rutas editadas en disco (miniatura/caras recalculadas)
 
     # Recibimos db_path (texto) en lugar de db_manager (objeto)
-    def __init__(self, directory_path: str, db_path: str):
+    def __init__(self, directory_path: str, db_path: str, crawl: MediaCrawl = None):
         super().__init__()
         self.directory_path = directory_path
         self.db_path = db_path
+        # Recorrido compartido con VideoFinderWorker (un solo paseo por el disco)
+        self.crawl = crawl or MediaCrawl(directory_path)
         self.is_running = True
 
     @Slot()
     def run(self):
+        scheduler.enter("background_io")
         # Abrimos nuestra propia conexión segura
         local_db = VisageVaultDB(os.path.basename(self.db_path), is_worker=True)
         # Forzamos que use la ruta correcta si no coincide con el default
@@ -1728,31 +1949,74 @@ class PhotoFinderWorker(QObject):
         local_db.conn.row_factory = sqlite3.Row
 
         photos_by_year_month = {}
+        # Pool de lectura de fechas: E/S pura, no compite con la GUI por el GIL
+        date_pool = ThreadPoolExecutor(max_workers=DATE_READER_WORKERS,
+                                       initializer=scheduler.enter, initargs=("background_read",))
         try:
             self.progress.emit("Cargando fechas de fotos conocidas desde la BD...")
             db_dates = local_db.load_all_photo_dates()
+            db_fingerprints = local_db.load_photo_fingerprints()
 
             self.progress.emit("Escaneando archivos de FOTOS en el directorio...")
-            photo_paths_on_disk = find_photos(self.directory_path)
-            photo_paths_on_disk_set = set(photo_paths_on_disk)
+            photo_stats_on_disk, _ = self.crawl.get(local_db)
+            photo_paths_on_disk = list(photo_stats_on_disk)
+            photo_paths_on_disk_set = set(photo_stats_on_disk)
+
+            # Lo más reciente primero (mtime del scandir): los últimos meses
+            # aparecen en la galería antes que los años antiguos.
+            photo_paths_on_disk.sort(
+                key=lambda p: photo_stats_on_disk[p].st_mtime_ns if photo_stats_on_disk[p] else 0,
+                reverse=True
+            )
 
             photos_to_upsert_in_db = []
+            fingerprints_to_adopt = []   # Fotos antiguas sin huella: solo se apunta
+            photos_changed_on_disk = []  # Editadas en disco: hay que invalidar lo derivado
 
-            for path in photo_paths_on_disk:
+            pending_batch = {}
+            last_batch_time = time.monotonic()
+            prefetched_dates = {}
+            vanished_from_queue = []
+
+            for index, path in enumerate(photo_paths_on_disk):
                 if not self.is_running:
                     break
+                stat_result = photo_stats_on_disk[path]
                 if path in db_dates:
                     year, month = db_dates[path]
+                    if stat_result is not None:
+                        current = fingerprint(stat_result)
+                        state = compare_fingerprint(db_fingerprints.get(path), current)
+                        if state == 'unknown':
+                            fingerprints_to_adopt.append(current + (path,))
+                        elif state == 'changed':
+                            photos_changed_on_disk.append(current + (path,))
                 else:
+                    if stat_result is None:
+                        # Por si acaso: el recorrido siempre trae el stat
+                        try:
+                            stat_result = os.stat(path)
+                        except OSError:
+                            vanished_from_queue.append(path)
+                            continue
                     self.progress.emit(f"Procesando nueva foto: {Path(path).name}")
                     year, month = parse_date_from_filename(path)
 
                     # Si no se encontró fecha en el nombre, usamos metadatos internos (EXIF)
                     if not year:
-                        year, month = get_photo_date(path)
+                        if path not in prefetched_dates:
+                            scheduler.checkpoint()
+                            # Cabeceras EXIF de las próximas fotos nuevas, en paralelo
+                            window = [
+                                (p, photo_stats_on_disk[p])
+                                for p in photo_paths_on_disk[index:index + DATE_READ_CHUNK]
+                                if p not in db_dates and not parse_date_from_filename(p)[0]
+                            ]
+                            prefetched_dates = get_photo_dates(window, date_pool)
+                        year, month = prefetched_dates[path]
                     # ---------------------------------------------------
 
-                    photos_to_upsert_in_db.append((path, year, month))
+                    photos_to_upsert_in_db.append((path, year, month) + fingerprint(stat_result))
 
                 if year not in photos_by_year_month:
                     photos_by_year_month[year] = {}
@@ -1760,9 +2024,26 @@ class PhotoFinderWorker(QObject):
                     photos_by_year_month[year][month] = []
                 photos_by_year_month[year][month].append(path)
 
+                # --- Envío progresivo a la galería ---
+                pending_batch[path] = (year, month)
+                now = time.monotonic()
+                if len(pending_batch) >= SCAN_BATCH_SIZE or now - last_batch_time >= SCAN_BATCH_INTERVAL_S:
+                    # Guardamos ya lo procesado: si se cierra la App no se pierde el trabajo
+                    local_db.bulk_upsert_photos(photos_to_upsert_in_db)
+                    photos_to_upsert_in_db = []
+                    self.batch_ready.emit(pending_batch)
+                    pending_batch = {}
+                    last_batch_time = now
+
+            if pending_batch and self.is_running:
+                self.batch_ready.emit(pending_batch)
+
             self.progress.emit("Buscando fotos eliminadas...")
             db_paths_set = set(db_dates.keys())
             paths_to_delete = list(db_paths_set - photo_paths_on_disk_set)
+            if not os.path.isdir(self.directory_path):
+                # Unidad desmontada o NAS caído: el recorrido sale vacío, no es un borrado
+                paths_to_delete = []
 
             if paths_to_delete:
                 self.progress.emit(f"Eliminando {len(paths_to_delete)} fotos de la BD...")
@@ -1772,6 +2053,27 @@ class PhotoFinderWorker(QObject):
                 self.progress.emit(f"Guardando {len(photos_to_upsert_in_db)} fotos nuevas en la BD...")
                 local_db.bulk_upsert_photos(photos_to_upsert_in_db)
 
+            local_db.update_photo_fingerprints(fingerprints_to_adopt)
+            local_db.remove_from_scan_queue(vanished_from_queue)
+
+            if photos_changed_on_disk:
+                self.progress.emit(f"{len(photos_changed_on_disk)} fotos editadas en disco. Recalculando...")
+                local_db.update_photo_fingerprints(photos_changed_on_disk, invalidate=True)
+
+            if self.is_running:
+                self.crawl.mark_done(local_db)
+
+            # Miniaturas de las fotos editadas: se regeneran aquí, en segundo plano.
+            # Las caras se recalculan con el escaneo de caras que sigue a este worker.
+            changed_paths = [row[3] for row in photos_changed_on_disk]
+            stale_keys = local_db.pop_thumbnail_keys(changed_paths)
+            for path in changed_paths:
+                if not self.is_running: break
+                invalidate_thumbnail(path, stale_keys.get(path))
+                generate_image_thumbnail(path)
+            if changed_paths:
+                self.artifacts_invalidated.emit(changed_paths)
+
             self.progress.emit(f"Escaneo de fotos finalizado. Encontradas {len(photo_paths_on_disk)} fotos.")
 
         except Exception as e:
@@ -1779,6 +2081,7 @@ class PhotoFinderWorker(QObject):
             self.progress.emit(f"Error en escaneo de fotos: {e}")
         finally:
             # Cerramos conexión
+            date_pool.shutdown(wait=False)
             local_db.conn.close()
             self.finished.emit(photos_by_year_month)
 
@@ -1788,11 +2091,13 @@ class PhotoFinderWorker(QObject):
 class VideoFinderWorker(QObject):
     finished = Signal(dict)
     progress = Signal(str)
+    artifacts_invalidated = Signal(list)
 
-    def __init__(self, directory_path: str, db_path: str):
+    def __init__(self, directory_path: str, db_path: str, crawl: MediaCrawl = None):
         super().__init__()
         self.directory_path = directory_path
         self.db_path = db_path
+        self.crawl = crawl or MediaCrawl(directory_path)
         self.is_running = True
 
     @Slot()
@@ -1802,29 +2107,57 @@ class VideoFinderWorker(QObject):
         local_db.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         local_db.conn.row_factory = sqlite3.Row
 
+        scheduler.enter("background_io")
         videos_by_year_month = {}
         try:
             self.progress.emit("Cargando fechas de vídeos conocidas desde la BD...")
             db_dates = local_db.load_all_video_dates()
+            db_fingerprints = local_db.load_video_fingerprints()
 
             self.progress.emit("Escaneando archivos de VÍDEOS en el directorio...")
-            video_paths_on_disk = find_videos(self.directory_path)
-            video_paths_on_disk_set = set(video_paths_on_disk)
+            _, video_stats_on_disk = self.crawl.get(local_db)
+            video_paths_on_disk = list(video_stats_on_disk)
+            video_paths_on_disk_set = set(video_stats_on_disk)
 
             videos_to_upsert_in_db = []
+            fingerprints_to_update = []
+            videos_changed_on_disk = []
+            vanished_from_queue = []
 
             for path in video_paths_on_disk:
                 if not self.is_running:
                     break
+                scheduler.checkpoint()
+                stat_result = video_stats_on_disk[path]
                 if path in db_dates:
                     year, month = db_dates[path]
+                    if stat_result is not None:
+                        current = fingerprint(stat_result)
+                        state = compare_fingerprint(db_fingerprints.get(path), current)
+                        if state != 'same':
+                            fingerprints_to_update.append(current + (path,))
+                        if state == 'changed':
+                            videos_changed_on_disk.append(path)
                 else:
+                    if stat_result is None:
+                        # Por si acaso: el recorrido siempre trae el stat
+                        try:
+                            stat_result = os.stat(path)
+                        except OSError:
+                            vanished_from_queue.append(path)
+                            continue
                     self.progress.emit(f"Procesando nuevo vídeo: {Path(path).name}")
                     year, month = parse_date_from_filename(path)
 
                     # Si no hay fecha en nombre, buscar metadatos internos
                     if not year:
-                        year, month = get_video_date(path)
+                        year, month = get_video_date(path, stat_result)
+
+                    videos_to_upsert_in_db.append((path, year, month) + fingerprint(stat_result))
+                    # Guardado por lotes: una biblioteca grande no se pierde si se cierra la App
+                    if len(videos_to_upsert_in_db) >= SCAN_BATCH_SIZE:
+                        local_db.bulk_upsert_videos(videos_to_upsert_in_db)
+                        videos_to_upsert_in_db = []
 
                 if year not in videos_by_year_month:
                     videos_by_year_month[year] = {}
@@ -1835,6 +2168,9 @@ class VideoFinderWorker(QObject):
             self.progress.emit("Buscando vídeos eliminados...")
             db_paths_set = set(db_dates.keys())
             paths_to_delete = list(db_paths_set - video_paths_on_disk_set)
+            if not os.path.isdir(self.directory_path):
+                # Unidad desmontada o NAS caído: el recorrido sale vacío, no es un borrado
+                paths_to_delete = []
 
             if paths_to_delete:
                 self.progress.emit(f"Eliminando {len(paths_to_delete)} vídeos de la BD...")
@@ -1844,6 +2180,20 @@ class VideoFinderWorker(QObject):
                 self.progress.emit(f"Guardando {len(videos_to_upsert_in_db)} vídeos nuevos en la BD...")
                 local_db.bulk_upsert_videos(videos_to_upsert_in_db)
 
+            local_db.update_video_fingerprints(fingerprints_to_update)
+            local_db.remove_from_scan_queue(vanished_from_queue)
+
+            if self.is_running:
+                self.crawl.mark_done(local_db)
+
+            stale_keys = local_db.pop_thumbnail_keys(videos_changed_on_disk)
+            for path in videos_changed_on_disk:
+                if not self.is_running: break
+                invalidate_thumbnail(path, stale_keys.get(path))
+                generate_video_thumbnail(path)
+            if videos_changed_on_disk:
+                self.artifacts_invalidated.emit(videos_changed_on_disk)
+
             self.progress.emit(f"Escaneo de vídeos finalizado. Encontrados {len(video_paths_on_disk)} vídeos.")
 
         except Exception as e:
@@ -1886,6 +2236,7 @@ class FaceScanWorker(QObject):
         local_db.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         local_db.conn.row_factory = sqlite3.Row
         local_db.conn.execute("PRAGMA journal_mode=WAL;")
+        scheduler.enter("background_cpu")
 
         try:
             self.signals.scan_progress.emit("Buscando fotos sin escanear...")
@@ -1901,17 +2252,14 @@ class FaceScanWorker(QObject):
             self.signals.scan_progress.emit(f"Escaneando {total} fotos...")
 
             # WARMUP
-            try:
-                import face_recognition
-                dummy = np.zeros((50, 50, 3), dtype=np.uint8)
-                face_recognition.face_locations(dummy, model="hog")
-            except Exception: pass
+            warm_up_face_scanner()
 
             max_workers = 1 # max_workers = min(4, os.cpu_count() or 2)
             processed_count = 0
 
             # Guardamos el executor en self para poder matarlo en stop()
-            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, initializer=scheduler.enter,
+                                               initargs=("background_cpu",))
 
             with self.executor:
                 future_to_photo = {}
@@ -1927,18 +2275,18 @@ class FaceScanWorker(QObject):
                     if not self.is_running:
                         # Si nos mandan parar, rompemos el bucle
                         break
+                    scheduler.checkpoint()
 
                     photo_id, photo_path = future_to_photo[future]
                     try:
                         # Timeout pequeño para no bloquear eternamente si se cierra la app
                         result_data = future.result(timeout=0.1)
 
-                        if result_data:
-                            for (encoding_blob, location_str) in result_data:
-                                face_db_id = local_db.add_face(photo_id, encoding_blob, location_str)
-                                self.signals.face_found.emit(face_db_id, photo_path, location_str)
-
-                        local_db.mark_photo_as_scanned(photo_id)
+                        # Caras + marca de escaneada en un solo commit (reanudable)
+                        faces = result_data or []
+                        face_ids = local_db.save_face_scan_result(photo_id, faces)
+                        for face_db_id, (_, location_str) in zip(face_ids, faces):
+                            self.signals.face_found.emit(face_db_id, photo_path, location_str)
 
                     except TimeoutError:
                         # Si tarda mucho y estamos cerrando, ignorar
@@ -1966,56 +2314,8 @@ class FaceScanWorker(QObject):
             except: pass
 
     def _process_single_image(self, photo_id, photo_path):
-        # ... (Mantén este método IGUAL que en la versión PIL anterior) ...
-        # (Copia el método _process_single_image de mi respuesta anterior)
-        # Extensiones RAW
-        RAW_EXTENSIONS = ('.nef', '.cr2', '.cr3', '.crw', '.arw', '.srf', '.orf', '.rw2', '.raf', '.pef', '.dng', '.raw')
-
-        try:
-            image = None
-            file_suffix = Path(photo_path).suffix.lower()
-
-            if file_suffix in RAW_EXTENSIONS:
-                try:
-                    with rawpy.imread(photo_path) as raw:
-                        image = raw.postprocess()
-                except Exception:
-                    return None
-            else:
-                image = face_recognition.load_image_file(photo_path)
-
-            if image is None: return None
-
-            h, w = image.shape[:2]
-            max_width = 1000
-            scale_ratio = 1.0
-
-            if w > max_width:
-                scale_ratio = max_width / float(w)
-                new_h = int(h * scale_ratio)
-                pil_image = Image.fromarray(image)
-                pil_image = pil_image.resize((max_width, new_h), Image.Resampling.LANCZOS)
-                image = np.array(pil_image)
-
-            locations = face_recognition.face_locations(image, model="hog")
-            faces_found = []
-
-            if locations:
-                encodings = face_recognition.face_encodings(image, locations)
-                for loc, enc in zip(locations, encodings):
-                    if scale_ratio != 1.0:
-                        top, right, bottom, left = loc
-                        top = int(top / scale_ratio)
-                        right = int(right / scale_ratio)
-                        bottom = int(bottom / scale_ratio)
-                        left = int(left / scale_ratio)
-                        loc = (top, right, bottom, left)
-
-                    faces_found.append((pickle.dumps(enc), str(loc)))
-            return faces_found
-
-        except Exception:
-            return None
+        # Misma detección que el indexador de consola (face_scanner.py)
+        return detect_faces(photo_path)
 
 # =================================================================
 # CLASE: DIÁLOGO DE AYUDA Y ACERCA DE
@@ -2095,23 +2395,139 @@ class HelpDialog(QDialog):
         btn_box.rejected.connect(self.accept)
         layout.addWidget(btn_box)
 
+# =================================================================
+# CLASE: ESTADÍSTICAS DE LAS CACHÉS (ver cache_manager.py)
+# =================================================================
+class CacheStatsDialog(QDialog):
+    """Tamaño, presupuesto, tasa de acierto y desalojos de cada caché."""
+    COLUMNS = ["Caché", "Tamaño", "Presupuesto", "Aciertos", "Fallos", "Tasa de acierto", "Desalojos"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Estadísticas de caché")
+        self.resize(760, 260)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Aciertos, fallos y desalojos desde que se abrió VisageVault."))
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        btn_box = QDialogButtonBox(QDialogButtonBox.Close)
+        btn_refresh = btn_box.addButton("Actualizar", QDialogButtonBox.ActionRole)
+        btn_refresh.clicked.connect(self._load_stats)
+        btn_box.rejected.connect(self.accept)
+        layout.addWidget(btn_box)
+
+        self._load_stats()
+
+    @staticmethod
+    def _format_mb(num_bytes):
+        return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+    @Slot()
+    def _load_stats(self):
+        rows = cache_manager.stats()
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            hit_rate = row["hit_rate"]
+            values = [
+                row["name"],
+                self._format_mb(row["bytes"]),
+                self._format_mb(row["budget_bytes"]),
+                str(row["hits"]),
+                str(row["misses"]),
+                f"{hit_rate:.0%}" if hit_rate is not None else "-",
+                str(row["evictions"]),
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row_index, column, item)
+
 # =================================================================
 # CLASE: VIGILANTE DEL SISTEMA DE ARCHIVOS (AUTO-REFRESH)
 # =================================================================
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+class FsEventJournal:
+    """
+    Diario de eventos de watchdog (thread-safe).
+    Acumula las rutas creadas/borradas/movidas/modificadas durante el periodo
+    de calma para aplicarlas como deltas en lugar de re-escanear todo.
+    Si llegan demasiados eventos o cambian carpetas enteras, pide re-escaneo.
+    """
+    MAX_PENDING_PATHS = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changes = {}  # ruta -> 'upsert' | 'delete' (gana el último evento)
+        self._needs_rescan = False
+
+    @staticmethod
+    def _is_media(path):
+        name = os.path.basename(path)
+        if not name or name.startswith('.'):
+            return False
+        return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+
+    def record(self, event_type, src_path, dest_path=None):
+        """Apunta un evento de archivo. Devuelve True si afecta a fotos/vídeos."""
+        updates = []
+        if event_type in ('created', 'modified') and self._is_media(src_path):
+            updates.append((src_path, 'upsert'))
+        elif event_type == 'deleted' and self._is_media(src_path):
+            updates.append((src_path, 'delete'))
+        elif event_type == 'moved':
+            if self._is_media(src_path):
+                updates.append((src_path, 'delete'))
+            if dest_path and self._is_media(dest_path):
+                updates.append((dest_path, 'upsert'))
+
+        if not updates:
+            return False
+
+        with self._lock:
+            for path, action in updates:
+                self._changes[path] = action
+            if len(self._changes) > self.MAX_PENDING_PATHS:
+                self._needs_rescan = True
+        return True
+
+    def request_rescan(self):
+        with self._lock:
+            self._needs_rescan = True
+
+    def drain(self):
+        """Devuelve ({ruta: acción}, necesita_reescaneo) y vacía el diario."""
+        with self._lock:
+            changes, needs_rescan = self._changes, self._needs_rescan
+            self._changes = {}
+            self._needs_rescan = False
+        return changes, needs_rescan
+
 class PhotoDirWatcher(QObject):
     """
     Vigila cambios en el directorio de fotos y emite señales para refrescar la UI.
+    Los eventos quedan apuntados en 'journal' para aplicarlos como deltas.
     """
     directory_changed = Signal()
 
     def __init__(self, path_to_watch):
         super().__init__()
         self.path_to_watch = path_to_watch
+        self.journal = FsEventJournal()
         self.observer = Observer()
-        self.handler = self.ChangeHandler(self.directory_changed)
+        # Mismas reglas que el recorrido: lo excluido no llega al temporizador
+        self.ignore_rules = IgnoreRules.for_root(path_to_watch)
+        self.handler = self.ChangeHandler(self.directory_changed, self.journal, self)
 
     def start(self):
         if os.path.isdir(self.path_to_watch):
@@ -2124,31 +2540,213 @@ class PhotoDirWatcher(QObject):
             self.observer.stop()
             self.observer.join()
 
+    def reload_ignore_rules(self):
+        self.ignore_rules = IgnoreRules.for_root(self.path_to_watch)
+
     class ChangeHandler(FileSystemEventHandler):
-        def __init__(self, signal):
+        def __init__(self, signal, journal, watcher):
             self.signal = signal
-            self.last_emit_time = 0
+            self.journal = journal
+            self.watcher = watcher
 
         def on_any_event(self, event):
-            # Ignorar directorios y archivos temporales o de caché
-            if event.is_directory:
+            if event.event_type not in ('created', 'deleted', 'modified', 'moved'):
                 return
+            if "face_cache" in event.src_path:
+                return
+
+            dest_path = getattr(event, 'dest_path', None)
 
-            filename = os.path.basename(event.src_path)
-            if filename.startswith('.') or "face_cache" in event.src_path:
+            # Cambió el propio .visagevaultignore: nuevas reglas y re-escaneo
+            if not event.is_directory and IGNORE_FILENAME in (
+                    os.path.basename(event.src_path), os.path.basename(dest_path or "")):
+                self.watcher.reload_ignore_rules()
+                self.journal.request_rescan()
+                self.signal.emit()
                 return
 
-            # Comprobar extensiones relevantes (Fotos y Vídeos)
-            valid_exts = (
-                '.jpg', '.jpeg', '.png', '.tiff', '.webp', '.heic', '.nef', '.cr2', '.dng', '.raw', # Fotos
-                '.mp4', '.avi', '.mkv', '.mov' # Vídeos
-            )
-            if not filename.lower().endswith(valid_exts):
+            rules = self.watcher.ignore_rules
+            if dest_path and rules.is_path_ignored(dest_path, event.is_directory):
+                dest_path = None  # Movido a una carpeta excluida: para nosotros es un borrado
+            if not dest_path and rules.is_path_ignored(event.src_path, event.is_directory):
+                return
+
+            if event.is_directory:
+                # 'modified' de carpeta es ruido (cambia su mtime al añadir archivos)
+                if event.event_type == 'modified':
+                    return
+                # Carpetas creadas/borradas/movidas: no sabemos su contenido,
+                # que lo resuelva el re-escaneo incremental.
+                self.journal.request_rescan()
+                self.signal.emit()
                 return
 
-            # Debounce: Evitar emitir 100 señales si copias 100 fotos de golpe
-            # Emitimos la señal y dejamos que la App gestione el refresco con un Timer
-            self.signal.emit()
+            if self.journal.record(event.event_type, event.src_path, dest_path):
+                # Debounce: la App agrupa los eventos con un Timer
+                self.signal.emit()
+
+# =================================================================
+# WORKER QUE APLICA LOS CAMBIOS DEL VIGILANTE (DELTAS)
+# =================================================================
+class FsDeltaWorker(QObject):
+    """
+    Aplica los eventos del diario directamente en la BD (bulk_upsert/bulk_delete)
+    sin recorrer el disco. Copiar 20 fotos cuesta 20 filas, no dos escaneos.
+    Si un archivo conocido cambia de huella (editado en disco), se invalidan
+    su miniatura y sus caras y se devuelve en 'changed'.
+    """
+    finished = Signal(dict)
+    progress = Signal(str)
+
+    def __init__(self, changes: dict, db_path: str):
+        super().__init__()
+        self.changes = changes
+        self.db_path = db_path
+
+    @Slot()
+    def run(self):
+        local_db = VisageVaultDB(os.path.basename(self.db_path), is_worker=True)
+        local_db.db_path = self.db_path
+        local_db.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        local_db.conn.row_factory = sqlite3.Row
+
+        delta = {
+            'photos': {'added': {}, 'removed': [], 'changed': []},
+            'videos': {'added': {}, 'removed': [], 'changed': []},
+        }
+        scheduler.enter("background_io")
+        try:
+            self.progress.emit(f"Aplicando {len(self.changes)} cambios del disco...")
+            photos_to_upsert, videos_to_upsert = [], []
+            photo_fingerprint_rows, video_fingerprint_rows = [], []
+            photos_changed, videos_changed = [], []
+            db_fingerprints = {
+                'photos': local_db.load_photo_fingerprints(),
+                'videos': local_db.load_video_fingerprints(),
+            }
+
+            for path, action in self.changes.items():
+                is_video = os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+                bucket = delta['videos'] if is_video else delta['photos']
+
+                stat_result = None
+                if action == 'upsert':
+                    try:
+                        stat_result = os.stat(path)
+                    except OSError:
+                        action = 'delete'  # Ya no existe (archivo temporal, movido...)
+
+                if action == 'delete':
+                    bucket['removed'].append(path)
+                    continue
+
+                if is_video:
+                    year, month = local_db.get_video_date(path)
+                else:
+                    year, month = local_db.get_photo_date(path)
+
+                # Solo los archivos nuevos van a 'added': uno conocido conserva su
+                # fecha de la BD y ya está en la galería (editarlo no lo mueve)
+                current = fingerprint(stat_result)
+                if not year:
+                    year, month = parse_date_from_filename(path)
+                    if not year:
+                        if is_video:
+                            year, month = get_video_date(path, stat_result)
+                        else:
+                            year, month = get_photo_date(path, stat_result)
+                    if is_video:
+                        videos_to_upsert.append((path, year, month) + current)
+                    else:
+                        photos_to_upsert.append((path, year, month) + current)
+                else:
+                    known = db_fingerprints['videos' if is_video else 'photos'].get(path)
+                    state = compare_fingerprint(known, current)
+                    if state == 'unknown':
+                        rows = video_fingerprint_rows if is_video else photo_fingerprint_rows
+                        rows.append(current + (path,))
+                    elif state == 'changed':
+                        rows = videos_changed if is_video else photos_changed
+                        rows.append(current + (path,))
+                        bucket['changed'].append(path)
+                    continue
+
+                bucket['added'][path] = (year, month)
+
+            if delta['photos']['removed']:
+                local_db.bulk_delete_photos(delta['photos']['removed'])
+            if delta['videos']['removed']:
+                local_db.bulk_delete_videos(delta['videos']['removed'])
+            if photos_to_upsert:
+                local_db.bulk_upsert_photos(photos_to_upsert)
+            if videos_to_upsert:
+                local_db.bulk_upsert_videos(videos_to_upsert)
+
+            local_db.update_photo_fingerprints(photo_fingerprint_rows)
+            local_db.update_photo_fingerprints(photos_changed, invalidate=True)
+            local_db.update_video_fingerprints(video_fingerprint_rows + videos_changed)
+
+            stale_keys = local_db.pop_thumbnail_keys(delta['photos']['changed'] + delta['videos']['changed'])
+            for path in delta['photos']['changed']:
+                invalidate_thumbnail(path, stale_keys.get(path))
+                generate_image_thumbnail(path)
+            for path in delta['videos']['changed']:
+                invalidate_thumbnail(path, stale_keys.get(path))
+                generate_video_thumbnail(path)
+
+        except Exception as e:
+            print(f"Error aplicando cambios del vigilante: {e}")
+            self.progress.emit(f"Error aplicando cambios: {e}")
+        finally:
+            local_db.conn.close()
+            self.finished.emit(delta)
+
+class ThumbnailPregenWorker(QObject):
+    """
+    Tras cada escaneo genera las miniaturas que faltan, de las fotos y vídeos
+    más recientes a los más antiguos, para que la galería ya esté lista
+    cuando se recorra. Clase 'idle' del planificador: se para mientras el
+    usuario hace scroll o la interfaz va cargada.
+    """
+    finished = Signal(int) # miniaturas generadas
+    progress = Signal(str)
+
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+        self.is_running = True
+
+    @Slot()
+    def run(self):
+        local_db = VisageVaultDB(os.path.basename(self.db_path), is_worker=True)
+        local_db.db_path = self.db_path
+        local_db.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        local_db.conn.row_factory = sqlite3.Row
+
+        generated = 0
+        scheduler.enter("idle")
+        try:
+            pending = local_db.get_media_missing_thumbnails()
+            total = len(pending)
+            for done, (path, is_video) in enumerate(pending, 1):
+                if not self.is_running: break
+                # La pausa de la clase 'idle' no impide parar (cambio de carpeta, cierre)
+                scheduler.checkpoint(lambda: not self.is_running)
+                if not self.is_running: break
+
+                generator = generate_video_thumbnail if is_video else generate_image_thumbnail
+                if generator(path):
+                    generated += 1
+
+                if done % PREGEN_PROGRESS_EVERY == 0 or done == total:
+                    # Al índice por tandas: si se cierra la App no se pierde lo hecho
+                    local_db.save_thumbnails(drain_generated_thumbnails())
+                    self.progress.emit(f"Preparando miniaturas ({done}/{total})...")
+        except Exception as e:
+            print(f"Error pregenerando miniaturas: {e}")
+        finally:
+            local_db.conn.close()
+            self.finished.emit(generated)
 
 # =================================================================
 # GESTOR DE ENCRIPTACIÓN Y CAJA FUERTE (ACTUALIZADO)
@@ -2369,23 +2967,30 @@ class DuplicateFinderWorker(QObject):
         local_db.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         local_db.conn.row_factory = sqlite3.Row
 
+        scheduler.enter("background_cpu")
         try:
             self.progress.emit("Cargando lista de fotos...")
-            cursor = local_db.conn.execute("SELECT filepath FROM photos WHERE is_hidden = 0")
-            all_photos = [row['filepath'] for row in cursor.fetchall()]
+            # dhash guardado en la BD: solo se calcula para fotos nuevas o editadas
+            # (el escaneo lo pone a NULL cuando cambia la huella del archivo)
+            stored_hashes = local_db.load_photo_dhashes()
 
-            total = len(all_photos)
+            total = len(stored_hashes)
             self.progress.emit(f"Analizando {total} fotos visualmente...")
 
             hashes = {}
+            new_hashes = []
             processed = 0
 
-            for path in all_photos:
+            for path, dhash in stored_hashes.items():
                 if not self.is_running: break
+                scheduler.checkpoint()
                 if not os.path.exists(path): continue
 
                 # Calculamos el hash visual
-                dhash = self._calculate_dhash(path)
+                if not dhash:
+                    dhash = self._calculate_dhash(path)
+                    if dhash:
+                        new_hashes.append((dhash, path))
 
                 if dhash:
                     if dhash not in hashes:
@@ -2396,6 +3001,8 @@ class DuplicateFinderWorker(QObject):
                 if processed % 20 == 0:
                     self.progress.emit(f"Analizando... ({processed}/{total})")
 
+            local_db.save_photo_dhashes(new_hashes)
+
             # Filtrar solo los que tienen más de 1 archivo (duplicados)
             duplicates = {h: paths for h, paths in hashes.items() if len(paths) > 1}
 
@@ -2595,7 +3202,6 @@ class MoveToSafeWorker(QObject):
 
         safe_dir = Path("visagevault_safe")
         safe_dir.mkdir(exist_ok=True)
-        cache_dir = Path("visagevault_cache") / "local_snapshot_cache"
 
         total = len(self.items_data)
 
@@ -2614,10 +3220,14 @@ class MoveToSafeWorker(QObject):
 
                 # 2. Generar THUMBNAIL ENCRIPTADO (Solo Vídeos)
                 if is_video:
-                    # Generar miniatura temporal
-                    thumb_temp_path = generate_video_thumbnail(original_path)
-
-                    if thumb_temp_path and os.path.exists(thumb_temp_path):
+                    # Generar miniatura temporal (del almacén a un archivo para encriptarla)
+                    thumb_entry = generate_video_thumbnail(original_path)
+                    thumb_data = read_thumbnail(thumb_entry) if thumb_entry else None
+
+                    if thumb_data:
+                        thumb_temp_path = str(encrypted_path) + ".thumb.tmp"
+                        with open(thumb_temp_path, 'wb') as f:
+                            f.write(thumb_data)
                         encrypted_thumb_path = str(encrypted_path) + ".thumb"
                         # Encriptar miniatura
                         CryptoManager.process_file(thumb_temp_path, encrypted_thumb_path, self.password)
@@ -2664,9 +3274,8 @@ class MoveToSafeWorker(QObject):
 
                 # Borrar miniatura de caché pública si existe
                 try:
-                    thumb_hash = hashlib.sha256(str(original_path).encode('utf-8')).hexdigest()
-                    thumb_file = cache_dir / f"{thumb_hash}.jpg"
-                    if thumb_file.exists(): os.remove(thumb_file)
+                    stale_keys = local_db.pop_thumbnail_keys([str(original_path)])
+                    invalidate_thumbnail(str(original_path), stale_keys.get(str(original_path)))
                 except: pass
 
                 # Borrar archivo original del disco
@@ -2685,9 +3294,6 @@ class MoveToSafeWorker(QObject):
 # VENTANA PRINCIPAL DE LA APLICACIÓN (VisageVaultApp)
 # =================================================================
 class VisageVaultApp(QMainWindow):
-    # Señales para controlar la velocidad del descargador de fotos
-    set_drive_priority_low = Signal(bool)  # True = Modo Lento, False = Normal
-
     def __init__(self):
         super().__init__()
         self.setWindowTitle("VisageVault")
@@ -2728,9 +3334,17 @@ class VisageVaultApp(QMainWindow):
         os.makedirs(os.path.join(self.root_cache, "drive_cache"), exist_ok=True)
         os.makedirs(os.path.join(self.root_cache, "drive_snapshot_cache"), exist_ok=True)
 
+        # Presupuestos y desalojo LRU de las cachés (ver cache_manager.py)
+        cache_manager.register_store("local_snapshot_cache", get_thumbnail_store())
+        cache_manager.register_store("drive_snapshot_cache",
+                                     open_store(os.path.join(self.root_cache, "drive_snapshot_cache")))
+        cache_manager.register_store("face_cache", open_store(os.path.join(self.root_cache, "face_cache")))
+        cache_manager.register_directory("drive_cache", os.path.join(self.root_cache, "drive_cache"))
+        cache_manager.register_memory(decoded_images)
+
         # --- IMPORTANTE: INICIALIZAR DB EN LA RUTA CORRECTA ---
         # Si no especificamos ruta, intentará crearla en /usr/share y fallará también
-        db_path = os.path.join(self.data_dir, "visagevault.db")
+        db_path = config_manager.get_db_path()
         self.db = VisageVaultDB(db_path) # Asegúrate que tu clase DB acepte rutas absolutas
 
         self.refresh_timer = QTimer()
@@ -2739,6 +3353,32 @@ class VisageVaultApp(QMainWindow):
         self.refresh_timer.timeout.connect(self._perform_auto_refresh)
 
         self.file_watcher = None
+        self.fs_delta_thread = None
+        self.fs_delta_worker = None
+        self.thumb_pregen_thread = None
+        self.thumb_pregen_worker = None
+        # Llegó otro escaneo mientras se pregeneraba: se repite al terminar
+        self.thumb_pregen_pending = False
+
+        # Lotes del escaneo progresivo: se agrupan y se redibuja como mucho cada X ms
+        self.scan_batch_timer = QTimer()
+        self.scan_batch_timer.setSingleShot(True)
+        self.scan_batch_timer.setInterval(SCAN_BATCH_REDRAW_MS)
+        self.scan_batch_timer.timeout.connect(self._flush_scan_batches)
+        # {ruta: (año, mes)} recibidas y aún sin dibujar
+        self.pending_scan_paths = {}
+
+        # Latido de la interfaz: si llega tarde, el hilo principal va cargado y
+        # los workers en segundo plano ceden el paso (ver scan_scheduler.py)
+        self.ui_heartbeat_timer = QTimer(self)
+        self.ui_heartbeat_timer.setInterval(HEARTBEAT_INTERVAL_MS)
+        self.ui_heartbeat_timer.timeout.connect(scheduler.heartbeat)
+        self.ui_heartbeat_timer.start()
+
+        # {ruta original: clave de miniatura} válidas según la BD (ver _refresh_thumbnail_index)
+        self.thumbnail_index = {}
+        # Desalojo por presupuesto y compactación de las cachés en segundo plano
+        cache_manager.start_background_maintenance()
 
         self.setMinimumSize(QSize(900, 600))
         self.current_directory = None
@@ -2755,6 +3395,9 @@ class VisageVaultApp(QMainWindow):
         self.photo_worker = None
         # REFACTOR: Diccionario para mapear path -> QListWidgetItem
         self.photo_list_widget_items = {}
+        # Grupos ya dibujados, para añadir sin reconstruir (ver _add_to_gallery)
+        self.photo_month_lists = {} # (año, mes) -> (QTreeWidgetItem, QListWidget)
+        self.photo_year_items = {}  # año -> QTreeWidgetItem
 
 
         # --- Variables de Vídeos ---
@@ -2763,6 +3406,10 @@ class VisageVaultApp(QMainWindow):
         self.video_worker = None
         # REFACTOR: Diccionario para mapear path -> QListWidgetItem
         self.video_list_widget_items = {}
+        self.video_month_lists = {}
+        self.video_year_items = {}
+        # Índices {ruta: (año, mes)} de los dos diccionarios (ver _date_index)
+        self.date_indexes = {}
 
 
         # --- Variables de Caras ---
@@ -2796,6 +3443,10 @@ class VisageVaultApp(QMainWindow):
         self.thumb_signals.thumbnail_loaded.connect(self._update_thumbnail)
         self.thumb_signals.load_failed.connect(self._handle_thumbnail_failed)
 
+        # Tiras de fotogramas para previsualizar vídeos al pasar el ratón
+        self.video_sprite_signals = VideoSpriteSignals()
+        self.video_sprite_signals.sprite_loaded.connect(self._handle_video_sprite_loaded)
+
         self.face_loader_signals = FaceLoaderSignals()
         self.face_loader_signals.face_loaded.connect(self._handle_face_loaded)
         self.face_loader_signals.face_load_failed.connect(self._handle_face_load_failed)
@@ -2877,6 +3528,7 @@ class VisageVaultApp(QMainWindow):
         self.scroll_area.verticalScrollBar().valueChanged.connect(self._debounced_thumbnail_load)
         self.scroll_area.verticalScrollBar().valueChanged.connect(self._on_photo_scroll_changed)
         self.main_splitter.addWidget(self.scroll_area)
+        self.photo_thumb_jobs = ThumbnailJobQueue(self.threadpool, self.scroll_area)
 
         # Panel Derecho (Navegación de Fotos)
         photo_right_panel_widget = QWidget()
@@ -2961,6 +3613,7 @@ class VisageVaultApp(QMainWindow):
         self.video_scroll_area.verticalScrollBar().valueChanged.connect(self._load_visible_video_thumbnails)
         self.video_scroll_area.verticalScrollBar().valueChanged.connect(self._on_video_scroll_changed)
         self.video_splitter.addWidget(self.video_scroll_area)
+        self.video_thumb_jobs = ThumbnailJobQueue(self.threadpool, self.video_scroll_area)
 
         # Panel Derecho (Navegación de Vídeos)
         video_right_panel_widget = QWidget()
@@ -3097,6 +3750,11 @@ class VisageVaultApp(QMainWindow):
         btn_open_help.clicked.connect(self._open_help_dialog) # Conectamos a la función
 
         help_layout.addWidget(btn_open_help)
+
+        btn_cache_stats = QPushButton("Estadísticas de caché")
+        btn_cache_stats.setCursor(Qt.PointingHandCursor)
+        btn_cache_stats.clicked.connect(self._open_cache_stats_dialog)
+        help_layout.addWidget(btn_cache_stats, 0, Qt.AlignCenter)
         help_layout.addStretch(1)
 
         # ==========================================================
@@ -3275,9 +3933,16 @@ class VisageVaultApp(QMainWindow):
             else:
                 self.video_folder_tree.clear()
 
-            # Limpiar y escanear
+            # Limpiar y escanear (los lotes del escaneo progresivo parten de cero)
+            self.photos_by_year_month = {}
+            self.pending_scan_paths = {}
             self.date_tree_widget.clear()
             self.video_date_tree_widget.clear()
+            # Sus items ya no existen: el primer lote redibuja la galería entera
+            self.photo_month_lists = {}
+            self.photo_year_items = {}
+            self.video_month_lists = {}
+            self.video_year_items = {}
             self._start_media_scan(directory)
 
         elif force_select:
@@ -3299,8 +3964,18 @@ class VisageVaultApp(QMainWindow):
         self.file_watcher.directory_changed.connect(self._on_directory_changed)
         self.file_watcher.start()
 
-        self._start_photo_search(directory)
-        self._start_video_search(directory)
+        # Miniaturas ya generadas según la BD: la galería no hace un stat por archivo
+        self._refresh_thumbnail_index()
+
+        # La pregeneración en curso era de la carpeta anterior: se relanza tras los escaneos
+        if self.thumb_pregen_worker:
+            self.thumb_pregen_worker.is_running = False
+
+        # Un único recorrido del disco alimenta a ambos workers
+        crawl = MediaCrawl(directory, consumers=2,
+                           workers=config_manager.get_scan_workers())
+        self._start_photo_search(directory, crawl)
+        self._start_video_search(directory, crawl)
 
     @Slot()
     def _on_directory_changed(self):
@@ -3311,31 +3986,89 @@ class VisageVaultApp(QMainWindow):
 
     @Slot()
     def _perform_auto_refresh(self):
-        """Ejecuta el re-escaneo real tras el periodo de calma."""
-        # print("Detectados cambios en el disco. Actualizando galería...")
+        """Aplica los cambios acumulados tras el periodo de calma."""
+        if not self.current_directory or not self.file_watcher:
+            return
+
+        # Si hay un escaneo en marcha, esperamos otra ronda (el diario conserva los eventos)
+        busy_threads = (self.photo_thread, self.video_thread, self.fs_delta_thread)
+        if any(t and t.isRunning() for t in busy_threads):
+            self.refresh_timer.start()
+            return
+
+        changes, needs_rescan = self.file_watcher.journal.drain()
+        if not changes and not needs_rescan:
+            return
+
         self._set_status("Detectados cambios externos. Actualizando...")
 
-        if self.current_directory:
-            # Relanzamos los escaneos.
-            # Nota: Tus workers actuales son inteligentes (usan fechas de la BD),
-            # pero para detectar archivos NUEVOS o BORRADOS necesitan recorrer el disco.
-            self._start_photo_search(self.current_directory)
-            self._start_video_search(self.current_directory)
-            # El escaneo de caras se lanzará solo al terminar el de fotos
+        if not needs_rescan:
+            # Caso habitual: aplicar solo las rutas afectadas
+            self._start_fs_delta(changes)
+            return
 
-    def _start_photo_search(self, directory):
+        # Carpetas enteras movidas/borradas o avalancha de eventos: re-escaneo.
+        # Incremental: solo se listan las carpetas cuyo mtime ha cambiado
+        crawl = MediaCrawl(self.current_directory, consumers=2,
+                           workers=config_manager.get_scan_workers())
+        self._start_photo_search(self.current_directory, crawl)
+        self._start_video_search(self.current_directory, crawl)
+        # El escaneo de caras se lanzará solo al terminar el de fotos
+
+    def _start_fs_delta(self, changes):
+        """Lanza el worker que aplica los eventos del vigilante como deltas."""
+        self.fs_delta_thread = QThread()
+        self.fs_delta_worker = FsDeltaWorker(changes, self.db.db_path)
+        self.fs_delta_worker.moveToThread(self.fs_delta_thread)
+
+        self.fs_delta_thread.started.connect(self.fs_delta_worker.run)
+        self.fs_delta_worker.finished.connect(self._handle_fs_delta_finished)
+        self.fs_delta_worker.progress.connect(self._set_status)
+
+        self.fs_delta_worker.finished.connect(self.fs_delta_thread.quit)
+        self.fs_delta_worker.finished.connect(self.fs_delta_worker.deleteLater)
+        self.fs_delta_thread.finished.connect(self._on_fs_delta_thread_finished)
+
+        self.fs_delta_thread.start()
+
+    def _start_thumbnail_pregen(self):
+        """Pregenera las miniaturas que faltan cuando ya no queda ningún escaneo en marcha."""
+        if self.photo_thread or self.video_thread or self.fs_delta_thread:
+            return  # Se lanzará al terminar el último
+        if self.thumb_pregen_thread:
+            self.thumb_pregen_pending = True
+            return
+        self.thumb_pregen_pending = False
+
+        self.thumb_pregen_thread = QThread()
+        self.thumb_pregen_worker = ThumbnailPregenWorker(self.db.db_path)
+        self.thumb_pregen_worker.moveToThread(self.thumb_pregen_thread)
+
+        self.thumb_pregen_thread.started.connect(self.thumb_pregen_worker.run)
+        self.thumb_pregen_worker.progress.connect(self._set_status)
+        self.thumb_pregen_worker.finished.connect(self._handle_thumbnail_pregen_finished)
+
+        self.thumb_pregen_worker.finished.connect(self.thumb_pregen_thread.quit)
+        self.thumb_pregen_worker.finished.connect(self.thumb_pregen_worker.deleteLater)
+        self.thumb_pregen_thread.finished.connect(self._on_thumb_pregen_thread_finished)
+
+        self.thumb_pregen_thread.start()
+
+    def _start_photo_search(self, directory, crawl=None):
         """Configura y lanza el trabajador de escaneo de FOTOS."""
         if self.photo_thread and self.photo_thread.isRunning():
             self._set_status("El escaneo de fotos anterior sigue en curso.")
             return
 
         self.photo_thread = QThread()
-        self.photo_worker = PhotoFinderWorker(directory, self.db.db_path)
+        self.photo_worker = PhotoFinderWorker(directory, self.db.db_path, crawl)
         self.photo_worker.moveToThread(self.photo_thread)
 
         self.photo_thread.started.connect(self.photo_worker.run)
         self.photo_worker.finished.connect(self._handle_search_finished)
+        self.photo_worker.batch_ready.connect(self._handle_search_batch)
         self.photo_worker.progress.connect(self._set_status)
+        self.photo_worker.artifacts_invalidated.connect(self._handle_artifacts_invalidated)
 
         self.photo_worker.finished.connect(self.photo_thread.quit)
         self.photo_worker.finished.connect(self.photo_worker.deleteLater)
@@ -3345,19 +4078,20 @@ class VisageVaultApp(QMainWindow):
         self.photo_thread.start()
 
     # --- NUEVA FUNCIÓN ---
-    def _start_video_search(self, directory):
+    def _start_video_search(self, directory, crawl=None):
         """Configura y lanza el trabajador de escaneo de VÍDEOS."""
         if self.video_thread and self.video_thread.isRunning():
             self._set_status("El escaneo de vídeos anterior sigue en curso.")
             return
 
         self.video_thread = QThread()
-        self.video_worker = VideoFinderWorker(directory, self.db.db_path)
+        self.video_worker = VideoFinderWorker(directory, self.db.db_path, crawl)
         self.video_worker.moveToThread(self.video_thread)
 
         self.video_thread.started.connect(self.video_worker.run)
         self.video_worker.finished.connect(self._handle_video_search_finished)
         self.video_worker.progress.connect(self._set_status) # Ambos workers reportan al mismo status_label
+        self.video_worker.artifacts_invalidated.connect(self._handle_artifacts_invalidated)
 
         self.video_worker.finished.connect(self.video_thread.quit)
         self.video_worker.finished.connect(self.video_worker.deleteLater)
@@ -3401,7 +4135,10 @@ class VisageVaultApp(QMainWindow):
 
         self.date_tree_widget.clear()
         self.photo_list_widget_items.clear()
+        self.photo_thumb_jobs.discard()
         self.photo_group_widgets = {}
+        self.photo_month_lists = {}
+        self.photo_year_items = {}
 
         # 1. Preparar lista de ocultos
         hidden_paths = set(self.db.get_hidden_photos())
@@ -3414,9 +4151,9 @@ class VisageVaultApp(QMainWindow):
         for year in sorted_years:
             if year == "Sin Fecha": continue
             year_item = QTreeWidgetItem(self.date_tree_widget, [str(year)])
+            self.photo_year_items[year] = year_item
 
-            year_label = QLabel(f"Año {year}")
-            year_label.setStyleSheet("font-size: 16pt; font-weight: bold; margin-top: 20px; margin-bottom: 5px;")
+            year_label = self._new_year_label(year)
             widgets_added_for_year = [year_label]
 
             month_added_count = 0
@@ -3437,97 +4174,331 @@ class VisageVaultApp(QMainWindow):
                 if not visible_photos: continue
                 month_added_count += 1
 
-                try: month_name = datetime.datetime.strptime(month, "%m").strftime("%B").capitalize()
-                except: month_name = "Mes Desconocido"
-
+                month_name = self._month_display_name(month)
                 month_item = QTreeWidgetItem(year_item, [f"{month_name} ({len(visible_photos)})"])
                 month_item.setData(0, Qt.UserRole, (year, month))
 
-                month_label = QLabel(month_name)
-                month_label.setStyleSheet("font-size: 14pt; font-weight: bold; margin-top: 10px;")
+                month_label = self._new_month_label(month_name)
                 widgets_added_for_year.append(month_label)
                 self.photo_group_widgets[f"{year}-{month}"] = month_label
 
-                # --- CONFIGURACIÓN LISTWIDGET EXACTA A VÍDEO ---
-                list_widget = PreviewListWidget()
-                list_widget.setMovement(QListWidget.Static)
-                list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
+                list_widget = self._new_month_list(is_video=False)
+                for photo_path in visible_photos:
+                    self._add_gallery_item(list_widget, photo_path, is_video=False)
+                self._fit_month_list_height(list_widget, is_video=False)
+                self.photo_month_lists[(year, month)] = (month_item, list_widget)
+                widgets_added_for_year.append(list_widget)
 
-                # ¡CRUCIAL! Desactivar uniformidad para que la selección se ajuste al tamaño real
-                list_widget.setUniformItemSizes(False)
+            if month_added_count > 0:
+                self.photo_container_layout.addWidget(year_label)
+                self.photo_group_widgets[year] = year_label
+                for i, w in enumerate(widgets_added_for_year):
+                    if i == 0: continue
+                    self.photo_container_layout.addWidget(w)
+                year_item.setExpanded(True)
+            else:
+                year_item.setHidden(True)
 
-                # Configuración de vista
-                list_widget.setViewMode(QListWidget.IconMode)
-                list_widget.setResizeMode(QListWidget.Adjust)
-                list_widget.setSpacing(10) # Espacio entre fotos (ajustado para que no haya huecos grandes)
+        self.photo_container_layout.addStretch(1)
+        QTimer.singleShot(100, self._load_main_visible_thumbnails)
 
-                list_widget.itemPressed.connect(self._handle_global_selection)
+    def _new_year_label(self, year):
+        year_label = QLabel(f"Año {year}")
+        year_label.setStyleSheet("font-size: 16pt; font-weight: bold; margin-top: 20px; margin-bottom: 5px;")
+        return year_label
 
-                # ¡CRUCIAL! Desactivar uniformidad
-                list_widget.setUniformItemSizes(False)
+    def _new_month_label(self, month_name):
+        month_label = QLabel(month_name)
+        month_label.setStyleSheet("font-size: 14pt; font-weight: bold; margin-top: 10px;")
+        return month_label
 
-                list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-                list_widget.customContextMenuRequested.connect(
-                    lambda pos, lw=list_widget: self._on_context_menu(pos, lw, is_video=False)
-                )
-                list_widget.previewRequested.connect(self._open_preview_dialog)
-                list_widget.itemDoubleClicked.connect(self._on_photo_item_double_clicked)
+    def _month_display_name(self, month):
+        try:
+            return datetime.datetime.strptime(month, "%m").strftime("%B").capitalize()
+        except ValueError:
+            return "Mes Desconocido"
 
-                list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-                list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-                list_widget.setFrameShape(QFrame.NoFrame)
+    def _new_month_list(self, is_video):
+        """QListWidget vacío de un mes de la galería de fotos o de vídeos."""
+        if is_video:
+            list_widget = VideoPreviewListWidget()
+            list_widget.setMovement(QListWidget.Static)
+            list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
+            list_widget.setSpacing(20)
 
-                # Tamaño de iconos
-                thumb_size = self.current_thumbnail_size
-                list_widget.setIconSize(QSize(thumb_size, thumb_size))
+            list_widget.itemPressed.connect(self._handle_global_selection)
+            list_widget.spriteRequested.connect(self._request_video_sprite)
 
-                # Definimos el tamaño exacto que ocupará cada item (Icono + un pequeño borde)
-                item_w = thumb_size + 10
-                item_h = thumb_size + 10
+            list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
+            list_widget.customContextMenuRequested.connect(
+                lambda pos, lw=list_widget: self._on_context_menu(pos, lw, is_video=True)
+            )
 
-                for photo_path in visible_photos:
-                    item = QListWidgetItem("Cargando...")
-                    item.setToolTip(Path(photo_path).name)
-                    # ¡CRUCIAL! Forzar el tamaño de la celda para que la selección sea correcta
-                    item.setSizeHint(QSize(item_w, item_h))
-                    item.setData(Qt.UserRole, photo_path)
-                    item.setData(Qt.UserRole + 1, "not_loaded")
-                    list_widget.addItem(item)
-                    self.photo_list_widget_items[photo_path] = item
+            list_widget.setViewMode(QListWidget.IconMode)
+            list_widget.setResizeMode(QListWidget.Adjust)
+            list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            list_widget.setFrameShape(QFrame.NoFrame)
+            list_widget.setToolTip("Ctrl + (+/-): Zoom\n\nHaz clic para seleccionar.")
 
-                # --- CÁLCULO DE ALTURA PARA ELIMINAR EL "GAP" ---
-                # Usamos el ancho disponible menos un margen de seguridad
-                viewport_width = self.scroll_area.viewport().width() - 30
-                if viewport_width < 100: viewport_width = 800
+            list_widget.itemDoubleClicked.connect(self._on_video_item_double_clicked)
 
-                # Ancho real de cada celda incluyendo el spacing del widget
-                effective_item_width = item_w + list_widget.spacing()
+            list_widget.setIconSize(QSize(self.current_thumbnail_size, self.current_thumbnail_size))
+            return list_widget
 
-                # Calcular columnas
-                num_cols = max(1, viewport_width // effective_item_width)
+        # --- CONFIGURACIÓN LISTWIDGET EXACTA A VÍDEO ---
+        list_widget = PreviewListWidget()
+        list_widget.setMovement(QListWidget.Static)
+        list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
-                # Calcular filas
-                rows = (len(visible_photos) + num_cols - 1) // num_cols
+        # ¡CRUCIAL! Desactivar uniformidad para que la selección se ajuste al tamaño real
+        list_widget.setUniformItemSizes(False)
 
-                # Altura total = (Filas * AlturaItem) + (Filas * Espacio) + Margen extra pequeño
-                total_height = (rows * item_h) + ((rows + 1) * list_widget.spacing())
+        # Configuración de vista
+        list_widget.setViewMode(QListWidget.IconMode)
+        list_widget.setResizeMode(QListWidget.Adjust)
+        list_widget.setSpacing(10) # Espacio entre fotos (ajustado para que no haya huecos grandes)
 
-                list_widget.setFixedHeight(total_height)
-                widgets_added_for_year.append(list_widget)
+        list_widget.itemPressed.connect(self._handle_global_selection)
 
-            if month_added_count > 0:
-                self.photo_container_layout.addWidget(year_label)
-                self.photo_group_widgets[year] = year_label
-                for i, w in enumerate(widgets_added_for_year):
-                    if i == 0: continue
-                    self.photo_container_layout.addWidget(w)
-                year_item.setExpanded(True)
+        list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
+        list_widget.customContextMenuRequested.connect(
+            lambda pos, lw=list_widget: self._on_context_menu(pos, lw, is_video=False)
+        )
+        list_widget.previewRequested.connect(self._open_preview_dialog)
+        list_widget.itemDoubleClicked.connect(self._on_photo_item_double_clicked)
+
+        list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        list_widget.setFrameShape(QFrame.NoFrame)
+
+        # Tamaño de iconos
+        thumb_size = self.current_thumbnail_size
+        list_widget.setIconSize(QSize(thumb_size, thumb_size))
+        return list_widget
+
+    def _gallery_item_size(self, is_video):
+        # Icono + un pequeño borde: tamaño exacto de la celda
+        margin = 8 if is_video else 10
+        return self.current_thumbnail_size + margin, self.current_thumbnail_size + margin
+
+    def _add_gallery_item(self, list_widget, path, is_video):
+        """Añade al final de la lista el item (aún sin miniatura) de una foto o vídeo."""
+        item_w, item_h = self._gallery_item_size(is_video)
+        item = QListWidgetItem("Cargando...")
+        item.setToolTip(Path(path).name)
+        # ¡CRUCIAL! Forzar el tamaño de la celda para que la selección sea correcta
+        item.setSizeHint(QSize(item_w, item_h))
+        item.setData(Qt.UserRole, path)
+        item.setData(Qt.UserRole + 1, "not_loaded")
+        list_widget.addItem(item)
+        if is_video:
+            self.video_list_widget_items[path] = item
+        else:
+            self.photo_list_widget_items[path] = item
+        return item
+
+    def _fit_month_list_height(self, list_widget, is_video):
+        """Altura fija de la lista de un mes para que quepan todos sus items sin scroll propio."""
+        item_w, item_h = self._gallery_item_size(is_video)
+        rows_count = list_widget.count()
+        if is_video:
+            viewport_width = self.video_scroll_area.viewport().width() - 30
+            num_cols = max(1, viewport_width // (item_w + list_widget.spacing()))
+            rows = (rows_count + num_cols - 1) // num_cols
+            list_widget.setFixedHeight((rows * item_h) + (rows * list_widget.spacing()))
+            return
+
+        # --- CÁLCULO DE ALTURA PARA ELIMINAR EL "GAP" ---
+        # Usamos el ancho disponible menos un margen de seguridad
+        viewport_width = self.scroll_area.viewport().width() - 30
+        if viewport_width < 100: viewport_width = 800
+
+        # Ancho real de cada celda incluyendo el spacing del widget
+        effective_item_width = item_w + list_widget.spacing()
+
+        # Calcular columnas
+        num_cols = max(1, viewport_width // effective_item_width)
+
+        # Calcular filas
+        rows = (rows_count + num_cols - 1) // num_cols
+
+        # Altura total = (Filas * AlturaItem) + (Filas * Espacio) + Margen extra pequeño
+        total_height = (rows * item_h) + ((rows + 1) * list_widget.spacing())
+        list_widget.setFixedHeight(total_height)
+
+    def _gallery_parts(self, is_video):
+        """Piezas de la galería de fotos o de vídeos, para el código común a las dos."""
+        if is_video:
+            return {
+                "layout": self.video_container_layout,
+                "tree": self.video_date_tree_widget,
+                "items": self.video_list_widget_items,
+                "groups": self.video_group_widgets,
+                "month_lists": self.video_month_lists,
+                "year_items": self.video_year_items,
+                "filter": self.current_video_filter_path,
+                "hidden": self.db.get_hidden_videos,
+                "load_visible": self._load_visible_video_thumbnails,
+            }
+        return {
+            "layout": self.photo_container_layout,
+            "tree": self.date_tree_widget,
+            "items": self.photo_list_widget_items,
+            "groups": self.photo_group_widgets,
+            "month_lists": self.photo_month_lists,
+            "year_items": self.photo_year_items,
+            "filter": self.current_photo_filter_path,
+            "hidden": self.db.get_hidden_photos,
+            "load_visible": self._load_main_visible_thumbnails,
+        }
+
+    def _insert_gallery_widget(self, layout, widget, before=None):
+        """Inserta en el layout de la galería delante de 'before' (o al final, antes del stretch)."""
+        index = layout.indexOf(before) if before is not None else -1
+        if index < 0:
+            index = layout.count()
+            if index and layout.itemAt(index - 1).spacerItem() is not None:
+                index -= 1
+        layout.insertWidget(index, widget)
+
+    def _create_month_group(self, parts, year, month, is_video):
+        """
+        Crea en su sitio (años de más reciente a más antiguo, meses en orden)
+        el grupo de un mes que aún no está en la galería, y su año si falta.
+        """
+        tree, layout, groups = parts["tree"], parts["layout"], parts["groups"]
+        older_years = [y for y in parts["year_items"] if y < year]
+        next_year = max(older_years) if older_years else None
+
+        year_item = parts["year_items"].get(year)
+        if year_item is None:
+            year_item = QTreeWidgetItem([str(year)])
+            if next_year is not None:
+                tree.insertTopLevelItem(tree.indexOfTopLevelItem(parts["year_items"][next_year]), year_item)
             else:
-                year_item.setHidden(True)
+                tree.addTopLevelItem(year_item)
+            parts["year_items"][year] = year_item
+        if year not in groups:
+            # Año sin meses visibles hasta ahora: su etiqueta va delante del siguiente año dibujado
+            shown_older = [y for y in older_years if y in groups]
+            year_label = self._new_year_label(year)
+            self._insert_gallery_widget(layout, year_label, groups[max(shown_older)] if shown_older else None)
+            groups[year] = year_label
+            year_item.setHidden(False)
+            year_item.setExpanded(True)
 
-        self.photo_container_layout.addStretch(1)
-        QTimer.singleShot(100, self._load_main_visible_thumbnails)
+        later_months = [m for (y, m) in parts["month_lists"] if y == year and m > month]
+        if later_months:
+            next_month = min(later_months)
+            before = groups[f"{year}-{next_month}"]
+            tree_index = year_item.indexOfChild(parts["month_lists"][(year, next_month)][0])
+        else:
+            shown_older = [y for y in older_years if y in groups]
+            before = groups[max(shown_older)] if shown_older else None
+            tree_index = year_item.childCount()
+
+        month_name = self._month_display_name(month)
+        month_item = QTreeWidgetItem([month_name])
+        month_item.setData(0, Qt.UserRole, (year, month))
+        year_item.insertChild(tree_index, month_item)
+
+        month_label = self._new_month_label(month_name)
+        list_widget = self._new_month_list(is_video)
+        self._insert_gallery_widget(layout, month_label, before)
+        self._insert_gallery_widget(layout, list_widget, before)
+        groups[f"{year}-{month}"] = month_label
+        parts["month_lists"][(year, month)] = (month_item, list_widget)
+        return month_item, list_widget
+
+    def _refresh_month_group(self, parts, year, month, is_video):
+        """Recuento del árbol y altura de la lista de un mes tras añadir o quitar items."""
+        month_item, list_widget = parts["month_lists"][(year, month)]
+        month_item.setText(0, f"{self._month_display_name(month)} ({list_widget.count()})")
+        self._fit_month_list_height(list_widget, is_video)
+
+    def _add_to_gallery(self, added, is_video=False):
+        """
+        Añade a la galería ya dibujada {ruta: (año, mes)} sin reconstruirla:
+        cada item va al final de la lista de su mes y los meses o años que
+        falten se crean en su sitio. Devuelve False si no hay galería dibujada
+        a la que añadir (vacía o en la vista de ocultos): entonces hay que
+        llamar a _display_photos/_display_videos.
+        """
+        parts = self._gallery_parts(is_video)
+        if not parts["month_lists"]:
+            return False
 
+        hidden_paths = set(parts["hidden"]())
+        filter_path = parts["filter"]
+        touched = set()
+        for path, (year, month) in added.items():
+            if year == "Sin Fecha" or month == "00": continue
+            if path in hidden_paths or path in parts["items"]: continue
+            if filter_path and not path.startswith(filter_path): continue
+            group = parts["month_lists"].get((year, month))
+            if group is None:
+                group = self._create_month_group(parts, year, month, is_video)
+            self._add_gallery_item(group[1], path, is_video)
+            touched.add((year, month))
+
+        for year, month in touched:
+            self._refresh_month_group(parts, year, month, is_video)
+        if touched:
+            QTimer.singleShot(100, parts["load_visible"])
+        return True
+
+    def _remove_month_group(self, parts, year, month):
+        """Quita de la galería el grupo de un mes vacío; el año sin meses queda oculto, como al dibujar."""
+        month_item, list_widget = parts["month_lists"].pop((year, month))
+        for widget in (parts["groups"].pop(f"{year}-{month}", None), list_widget):
+            if widget is not None:
+                parts["layout"].removeWidget(widget)
+                widget.deleteLater()
+        year_item = month_item.parent()
+        year_item.removeChild(month_item)
+        if year_item.childCount() == 0:
+            year_item.setHidden(True)
+            year_label = parts["groups"].pop(year, None)
+            if year_label is not None:
+                parts["layout"].removeWidget(year_label)
+                year_label.deleteLater()
+
+    def _remove_from_gallery(self, paths, is_video=False):
+        """Quita de la galería ya dibujada los items de esas rutas, y los meses que se queden vacíos."""
+        parts = self._gallery_parts(is_video)
+        month_of_list = {id(list_widget): key for key, (_, list_widget) in parts["month_lists"].items()}
+        touched = set()
+        for path in paths:
+            item = parts["items"].pop(path, None)
+            if item is None: continue
+            list_widget = item.listWidget()
+            if list_widget is None: continue
+            list_widget.takeItem(list_widget.row(item))
+            key = month_of_list.get(id(list_widget))
+            if key is not None:
+                touched.add(key)
+
+        for year, month in touched:
+            if parts["month_lists"][(year, month)][1].count():
+                self._refresh_month_group(parts, year, month, is_video)
+            else:
+                self._remove_month_group(parts, year, month)
+
+    def _patch_gallery(self, removed, added, is_video=False):
+        """
+        Quita y añade items en la galería ya dibujada manteniendo el scroll.
+        Si no hay galería a la que añadir, se dibuja entera.
+        """
+        scroll_area = self.video_scroll_area if is_video else self.scroll_area
+        scroll_area.setUpdatesEnabled(False)
+        current_scroll = scroll_area.verticalScrollBar().value()
+        self._remove_from_gallery(removed, is_video)
+        if not self._add_to_gallery(added, is_video):
+            if is_video: self._display_videos()
+            else: self._display_photos()
+        scroll_area.verticalScrollBar().setValue(current_scroll)
+        scroll_area.setUpdatesEnabled(True)
 
     def _display_videos(self):
         """Muestra los VÍDEOS agrupados por fecha (FILTRANDO LOS OCULTOS)."""
@@ -3537,7 +4508,10 @@ class VisageVaultApp(QMainWindow):
         self.video_date_tree_widget.clear()
 
         self.video_list_widget_items.clear()
+        self.video_thumb_jobs.discard()
         self.video_group_widgets = {}
+        self.video_month_lists = {}
+        self.video_year_items = {}
 
         # --- PASO 1: OBTENER LISTA NEGRA DE VÍDEOS ---
         hidden_paths = set(self.db.get_hidden_videos())
@@ -3552,9 +4526,9 @@ class VisageVaultApp(QMainWindow):
         for year in sorted_years:
             if year == "Sin Fecha": continue
             year_item = QTreeWidgetItem(self.video_date_tree_widget, [str(year)])
+            self.video_year_items[year] = year_item
 
-            year_label = QLabel(f"Año {year}")
-            year_label.setStyleSheet("font-size: 16pt; font-weight: bold; margin-top: 20px; margin-bottom: 5px;")
+            year_label = self._new_year_label(year)
 
             widgets_added_for_year = [year_label]
             month_added_count = 0
@@ -3584,63 +4558,21 @@ class VisageVaultApp(QMainWindow):
 
                 month_added_count += 1
 
-                try:
-                    month_name = datetime.datetime.strptime(month, "%m").strftime("%B").capitalize()
-                except ValueError:
-                    month_name = "Mes Desconocido"
-
+                month_name = self._month_display_name(month)
                 month_item = QTreeWidgetItem(year_item, [f"{month_name} ({len(visible_videos)})"])
                 month_item.setData(0, Qt.UserRole, (year, month))
 
-                month_label = QLabel(month_name)
-                month_label.setStyleSheet("font-size: 14pt; font-weight: bold; margin-top: 10px;")
+                month_label = self._new_month_label(month_name)
                 widgets_added_for_year.append(month_label)
 
                 self.video_group_widgets[f"{year}-{month}"] = month_label
 
-                list_widget = PreviewListWidget()
-                list_widget.setMovement(QListWidget.Static)
-                list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
-                list_widget.setSpacing(20)
-
-                list_widget.itemPressed.connect(self._handle_global_selection)
-
-                list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-                list_widget.customContextMenuRequested.connect(
-                    lambda pos, lw=list_widget: self._on_context_menu(pos, lw, is_video=True)
-                )
-
-                list_widget.setViewMode(QListWidget.IconMode)
-                list_widget.setResizeMode(QListWidget.Adjust)
-                list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-                list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-                list_widget.setFrameShape(QFrame.NoFrame)
-                list_widget.setToolTip("Ctrl + (+/-): Zoom\n\nHaz clic para seleccionar.")
-
-                list_widget.itemDoubleClicked.connect(self._on_video_item_double_clicked)
-
-                list_widget.setIconSize(QSize(self.current_thumbnail_size, self.current_thumbnail_size))
-
-                item_w = self.current_thumbnail_size + 8
-                item_h = self.current_thumbnail_size + 8
-
+                list_widget = self._new_month_list(is_video=True)
                 # --- USAR LISTA FILTRADA ---
                 for video_path in visible_videos:
-                    item = QListWidgetItem("Cargando...")
-                    item.setToolTip(Path(video_path).name)
-                    item.setSizeHint(QSize(item_w, item_h))
-                    item.setData(Qt.UserRole, video_path)
-                    item.setData(Qt.UserRole + 1, "not_loaded")
-                    list_widget.addItem(item)
-                    self.video_list_widget_items[video_path] = item
-
-                viewport_width = self.video_scroll_area.viewport().width() - 30
-                thumb_width = item_w + list_widget.spacing()
-                num_cols = max(1, viewport_width // thumb_width)
-
-                rows = (len(visible_videos) + num_cols - 1) // num_cols
-                total_height = (rows * item_h) + (rows * list_widget.spacing())
-                list_widget.setFixedHeight(total_height)
+                    self._add_gallery_item(list_widget, video_path, is_video=True)
+                self._fit_month_list_height(list_widget, is_video=True)
+                self.video_month_lists[(year, month)] = (month_item, list_widget)
 
                 widgets_added_for_year.append(list_widget)
 
@@ -3961,11 +4893,7 @@ class VisageVaultApp(QMainWindow):
 
                 # Volver a añadir a la estructura de memoria (Diccionario)
                 if year and month and target_dict is not None:
-                    if year not in target_dict: target_dict[year] = {}
-                    if month not in target_dict[year]: target_dict[year][month] = []
-
-                    if path not in target_dict[year][month]:
-                        target_dict[year][month].append(path)
+                    if self._add_to_memory_struct(path, year, month, target_dict):
                         restored_count += 1
 
             except Exception as e:
@@ -4045,6 +4973,11 @@ class VisageVaultApp(QMainWindow):
             # lea esta fecha si falla la lectura de metadatos internos.
             os.utime(filepath, (timestamp, timestamp))
 
+            # 4. Edición propia: aceptar la huella nueva para que el próximo
+            # escaneo no lo tome por un archivo modificado y borre sus caras.
+            is_video = ext in VIDEO_EXTENSIONS
+            self.db.refresh_fingerprint(filepath, is_video)
+
         except Exception as e:
             print(f"Error general actualizando fichero físico {filepath}: {e}")
 
@@ -4076,23 +5009,13 @@ class VisageVaultApp(QMainWindow):
                         self.db.update_video_date(path, new_year, new_month)
 
                         # Mover en memoria (Vídeos)
-                        self._remove_from_memory_struct(path, self.videos_by_year_month)
-                        if new_year not in self.videos_by_year_month:
-                            self.videos_by_year_month[new_year] = {}
-                        if new_month not in self.videos_by_year_month[new_year]:
-                            self.videos_by_year_month[new_year][new_month] = []
-                        self.videos_by_year_month[new_year][new_month].append(path)
+                        self._add_to_memory_struct(path, new_year, new_month, self.videos_by_year_month)
 
                     else:
                         self.db.update_photo_date(path, new_year, new_month)
 
                         # Mover en memoria (Fotos)
-                        self._remove_from_memory_struct(path, self.photos_by_year_month)
-                        if new_year not in self.photos_by_year_month:
-                            self.photos_by_year_month[new_year] = {}
-                        if new_month not in self.photos_by_year_month[new_year]:
-                            self.photos_by_year_month[new_year][new_month] = []
-                        self.photos_by_year_month[new_year][new_month].append(path)
+                        self._add_to_memory_struct(path, new_year, new_month, self.photos_by_year_month)
 
                     count += 1
 
@@ -4163,18 +5086,76 @@ class VisageVaultApp(QMainWindow):
             if is_video: self._display_videos()
             else: self._display_photos()
 
+    def _patch_date_buckets(self, struct, added, removed):
+        """
+        Aplica un delta sobre el diccionario year/month en memoria; con el
+        índice de rutas solo se tocan los meses afectados.
+        added: {ruta: (año, mes)}, removed: [rutas].
+        Devuelve (rutas que salen de su mes, {ruta: (año, mes)} que entran en
+        uno), lo que hay que quitar y poner en la galería.
+        """
+        index = self._date_index(struct)
+        moved_out = [path for path in removed if path in index]
+        for path in moved_out:
+            self._remove_from_memory_struct(path, struct)
+
+        moved_in = {}
+        for path, (year, month) in added.items():
+            current = self._date_index(struct).get(path)
+            if current == (year, month):
+                continue
+            if current is not None:
+                moved_out.append(path)
+            self._add_to_memory_struct(path, year, month, struct)
+            moved_in[path] = (year, month)
+        return moved_out, moved_in
+
+    def _date_index(self, struct, rebuild=False):
+        """
+        Índice {ruta: (año, mes)} del diccionario year/month de fotos o de
+        vídeos. Lo mantienen _add_to_memory_struct y _remove_from_memory_struct;
+        solo se rehace entero cuando se sustituye el diccionario.
+        """
+        kind = "videos" if struct is self.videos_by_year_month else "photos"
+        indexed, index = self.date_indexes.get(kind, (None, None))
+        if rebuild or indexed is not struct:
+            index = {
+                path: (year, month)
+                for year, months in struct.items() for month, files in months.items() for path in files
+            }
+            self.date_indexes[kind] = (struct, index)
+        return index
+
+    def _add_to_memory_struct(self, path, year, month, struct):
+        """Pone un path en su año/mes del diccionario (moviéndolo si estaba en otro). True si cambió algo."""
+        index = self._date_index(struct)
+        if index.get(path) == (year, month):
+            return False
+        self._remove_from_memory_struct(path, struct)
+        index = self._date_index(struct)
+        struct.setdefault(year, {}).setdefault(month, []).append(path)
+        index[path] = (year, month)
+        return True
+
     def _remove_from_memory_struct(self, path, struct):
         """Ayuda a eliminar un path del diccionario year/month."""
-        for year, months in struct.items():
-            for month, files in months.items():
-                if path in files:
-                    files.remove(path)
-                    # Limpieza si quedan vacíos
-                    if not files:
-                        del struct[year][month]
-                    if not struct[year]:
-                        del struct[year]
-                    return
+        index = self._date_index(struct)
+        key = index.get(path)
+        if key is not None and path not in struct.get(key[0], {}).get(key[1], ()):
+            # El diccionario se tocó sin pasar por aquí: se rehace el índice
+            index = self._date_index(struct, rebuild=True)
+            key = index.get(path)
+        if key is None:
+            return
+        year, month = key
+        files = struct[year][month]
+        files.remove(path)
+        del index[path]
+        # Limpieza si quedan vacíos
+        if not files:
+            del struct[year][month]
+        if not struct[year]:
+            del struct[year]
 
     # ------------------------------------------------------------------
     # NUEVA LÓGICA DE SINCRONIZACIÓN SCROLL -> ÁRBOL
@@ -4182,6 +5163,9 @@ class VisageVaultApp(QMainWindow):
 
     def _on_photo_scroll_changed(self):
         """Sincroniza el árbol de fechas de fotos al hacer scroll."""
+        scheduler.note_user_activity()
+        # La carga nueva espera a que pare el scroll; lo ya encolado se reordena ya
+        self.photo_thumb_jobs.reprioritize()
         self._sync_tree_from_scroll(
             self.scroll_area,
             self.photo_group_widgets,
@@ -4190,6 +5174,7 @@ class VisageVaultApp(QMainWindow):
 
     def _on_video_scroll_changed(self):
         """Sincroniza el árbol de fechas de vídeos al hacer scroll."""
+        scheduler.note_user_activity()
         self._sync_tree_from_scroll(
             self.video_scroll_area,
             self.video_group_widgets,
@@ -4198,6 +5183,7 @@ class VisageVaultApp(QMainWindow):
 
     def _on_cloud_scroll_changed(self):
         """Sincroniza el árbol de fechas de la Nube al hacer scroll."""
+        scheduler.note_user_activity()
         self._sync_tree_from_scroll(
             self.cloud_scroll_area,
             self.cloud_group_widgets,
@@ -4391,14 +5377,71 @@ class VisageVaultApp(QMainWindow):
             except RuntimeError:
                 print("Aviso: No se pudo hacer scroll al widget de vídeo.")
 
+    @Slot(dict)
+    def _handle_search_batch(self, batch):
+        """Lote parcial del PhotoFinderWorker: se mezcla ya en memoria y se dibuja más tarde."""
+        added = self._merge_scan_batch(self.photos_by_year_month, batch)
+        self.pending_scan_paths.update(added)
+        if added and not self.scan_batch_timer.isActive():
+            # No se reinicia si ya está en marcha: así se dibuja aunque lleguen lotes sin parar
+            self.scan_batch_timer.start()
+
+    def _merge_scan_batch(self, struct, batch):
+        """
+        Añade {ruta: (año, mes)} al diccionario year/month sin duplicar rutas y
+        devuelve las que eran nuevas, con el mismo formato.
+        Solo añade: las bajas y los cambios de fecha los resuelve el resultado final.
+        """
+        added = {}
+        for path, (year, month) in batch.items():
+            if path in self._date_index(struct):
+                continue
+            self._add_to_memory_struct(path, year, month, struct)
+            added[path] = (year, month)
+        return added
+
+    @Slot()
+    def _flush_scan_batches(self):
+        """Añade a la galería las fotos recibidas desde el último lote, sin reconstruirla."""
+        added, self.pending_scan_paths = self.pending_scan_paths, {}
+        num_fotos = sum(len(photos) for months in self.photos_by_year_month.values() for photos in months.values())
+        self._set_status(f"Escaneando... {num_fotos} fotos en la galería.")
+
+        self.scroll_area.setUpdatesEnabled(False)
+        current_scroll = self.scroll_area.verticalScrollBar().value()
+        if not self._add_to_gallery(added, is_video=False):
+            # Aún no hay galería dibujada: la primera vez se dibuja entera
+            self._display_photos()
+        self.scroll_area.verticalScrollBar().setValue(current_scroll)
+        self.scroll_area.setUpdatesEnabled(True)
+
+    def _same_date_buckets(self, struct, other):
+        """Mismas rutas en los mismos año/mes, sin importar el orden dentro de cada mes."""
+        if struct.keys() != other.keys():
+            return False
+        for year, months in struct.items():
+            if months.keys() != other[year].keys():
+                return False
+            for month, files in months.items():
+                if set(files) != set(other[year][month]):
+                    return False
+        return True
+
     @Slot(dict)
     def _handle_search_finished(self, new_photos_by_year_month):
         """Se llama cuando el PhotoFinderWorker termina."""
         self.select_dir_button.setEnabled(True)
+        self._refresh_thumbnail_index()
+
+        # Lotes pendientes de dibujar: se añaden ya, como los anteriores
+        if self.scan_batch_timer.isActive():
+            self.scan_batch_timer.stop()
+            self._flush_scan_batches()
 
         # 1. OPTIMIZACIÓN: Si los datos no han cambiado, NO redibujamos nada.
-        # Esto evita parpadeos por falsas alarmas del vigilante.
-        if self.photos_by_year_month == new_photos_by_year_month:
+        # Esto evita parpadeos por falsas alarmas del vigilante. Los lotes ya
+        # dibujados llegan en otro orden que el resultado final: no cuenta.
+        if self._same_date_buckets(self.photos_by_year_month, new_photos_by_year_month):
             # print("Escaneo completado: Sin cambios detectados.")
             # Aún así lanzamos el escáner de caras por si acaso
             self._start_face_scan()
@@ -4429,6 +5472,7 @@ class VisageVaultApp(QMainWindow):
     def _handle_video_search_finished(self, new_videos_by_year_month):
         """Se llama cuando el VideoFinderWorker termina."""
         self.select_dir_button.setEnabled(True)
+        self._refresh_thumbnail_index()
 
         # 1. Verificar cambios
         if self.videos_by_year_month == new_videos_by_year_month:
@@ -4453,6 +5497,71 @@ class VisageVaultApp(QMainWindow):
         self.video_scroll_area.verticalScrollBar().setValue(current_scroll)
         self.video_scroll_area.setUpdatesEnabled(True)
 
+    @Slot(dict)
+    def _handle_fs_delta_finished(self, delta):
+        """Parchea los cubos año/mes con el delta del vigilante y solo los meses afectados de la galería."""
+        photo_delta = delta.get('photos', {})
+        video_delta = delta.get('videos', {})
+
+        photos_out, photos_in = self._patch_date_buckets(
+            self.photos_by_year_month, photo_delta.get('added', {}), photo_delta.get('removed', [])
+        )
+        videos_out, videos_in = self._patch_date_buckets(
+            self.videos_by_year_month, video_delta.get('added', {}), video_delta.get('removed', [])
+        )
+
+        if photos_out or photos_in:
+            self._patch_gallery(photos_out, photos_in, is_video=False)
+        if videos_out or videos_in:
+            self._patch_gallery(videos_out, videos_in, is_video=True)
+
+        num_changes = sum(len(d.get('added', {})) + len(d.get('removed', [])) for d in (photo_delta, video_delta))
+        self._set_status(f"Galería actualizada ({num_changes} cambios).")
+
+        changed_paths = photo_delta.get('changed', []) + video_delta.get('changed', [])
+        if changed_paths:
+            self._handle_artifacts_invalidated(changed_paths)
+
+        if photo_delta.get('added'):
+            self._start_face_scan()
+
+    def _refresh_thumbnail_index(self):
+        """
+        Pasa a la BD las miniaturas generadas desde la última vez y recarga
+        {ruta: miniatura} de las que siguen siendo válidas (una consulta por tipo).
+        """
+        try:
+            self.db.save_thumbnails(drain_generated_thumbnails())
+            self.thumbnail_index = {
+                path: key
+                for is_video in (False, True)
+                for path, key in self.db.load_thumbnail_keys(is_video).items()
+            }
+        except Exception as e:
+            print(f"Error cargando el índice de miniaturas: {e}")
+
+    def _thumbnail_level(self):
+        """Nivel de la pirámide de miniaturas para el zoom actual de la galería."""
+        return pick_thumbnail_level(self.current_thumbnail_size)
+
+    def _indexed_thumbnail_entry(self, original_path, level):
+        """Entrada en el almacén de la miniatura ya generada (según la BD) o None si hay que generarla."""
+        thumb_key = self.thumbnail_index.get(original_path)
+        return thumbnail_entry(thumb_key, level) if thumb_key else None
+
+    @Slot(list)
+    def _handle_artifacts_invalidated(self, paths):
+        """Archivos editados en disco: se descarta la miniatura en RAM y se vuelve a pedir."""
+        for path in paths:
+            # Sin la imagen decodificada de antes en RAM
+            decoded_images.invalidate_path(path)
+            self.thumbnail_index.pop(path, None)
+            item = self.photo_list_widget_items.get(path) or self.video_list_widget_items.get(path)
+            if item is not None:
+                item.setData(Qt.UserRole + 1, "not_loaded")
+        self._load_main_visible_thumbnails()
+        self._load_visible_video_thumbnails()
+
     def _set_status(self, message):
         # Usamos la barra de estado nativa de la ventana (visible en todas las pestañas)
         self.statusBar().showMessage(f"Estado: {message}")
@@ -4472,6 +5581,7 @@ class VisageVaultApp(QMainWindow):
 
     def _load_main_visible_thumbnails(self):
         """Carga miniaturas de FOTOS visibles (Refactorizado para QListWidget)."""
+        level = self._thumbnail_level()
         viewport = self.scroll_area.viewport()
         preload_rect = viewport.rect().adjusted(0, -PRELOAD_MARGIN_PX, 0, PRELOAD_MARGIN_PX)
 
@@ -4491,14 +5601,18 @@ class VisageVaultApp(QMainWindow):
                     if load_status == "not_loaded":
                         original_path = item.data(Qt.UserRole)
                         if original_path:
-                            item.setData(Qt.UserRole + 1, "loading") # Marcar como "cargando"
-                            item.setText("Cargando...") # Asegurarse de que el texto de carga está
+                            entry = self._indexed_thumbnail_entry(original_path, level)
+                            self.photo_thumb_jobs.submit(
+                                original_path, item,
+                                lambda p=original_path, e=entry: ThumbnailLoader(p, self.thumb_signals, e, level)
+                            )
 
-                            loader = ThumbnailLoader(original_path, self.thumb_signals)
-                            self.threadpool.start(loader)
+        # Lo más cercano al viewport primero; lo que quedó lejos sale de la cola
+        self.photo_thumb_jobs.reprioritize()
 
     def _load_visible_video_thumbnails(self):
         """Carga miniaturas de VÍDEOS visibles (Refactorizado para QListWidget)."""
+        level = self._thumbnail_level()
         viewport = self.video_scroll_area.viewport()
         preload_rect = viewport.rect().adjusted(0, -PRELOAD_MARGIN_PX, 0, PRELOAD_MARGIN_PX)
 
@@ -4518,11 +5632,29 @@ class VisageVaultApp(QMainWindow):
                     if load_status == "not_loaded":
                         original_path = item.data(Qt.UserRole)
                         if original_path:
-                            item.setData(Qt.UserRole + 1, "loading") # Marcar como "cargando"
-                            item.setText("Cargando...")
+                            entry = self._indexed_thumbnail_entry(original_path, level)
+                            self.video_thumb_jobs.submit(
+                                original_path, item,
+                                lambda p=original_path, e=entry: VideoThumbnailLoader(p, self.thumb_signals, e, level)
+                            )
 
-                            loader = VideoThumbnailLoader(original_path, self.thumb_signals)
-                            self.threadpool.start(loader)
+        self.video_thumb_jobs.reprioritize()
+
+    @Slot(str)
+    def _request_video_sprite(self, original_path):
+        self.threadpool.start(VideoSpriteLoader(original_path, self.video_sprite_signals))
+
+    @Slot(str, bytes)
+    def _handle_video_sprite_loaded(self, original_path, data):
+        item = self.video_list_widget_items.get(original_path)
+        if item is None: return
+        list_widget = item.listWidget()
+        if not isinstance(list_widget, VideoPreviewListWidget): return
+        pixmap = QPixmap()
+        if data:
+            pixmap.loadFromData(data)
+        # Una tira nula se guarda igual: no se vuelve a pedir en cada movimiento
+        list_widget.set_sprite(original_path, pixmap)
 
     @Slot()
     def _load_person_visible_thumbnails(self):
@@ -4542,22 +5674,33 @@ class VisageVaultApp(QMainWindow):
                 label_rect_in_viewport = photo_label.rect().translated(label_pos)
                 if preload_rect.intersects(label_rect_in_viewport):
                     photo_label.setProperty("loaded", None)
-                    loader = ThumbnailLoader(original_path, self.thumb_signals)
+                    # La pestaña Personas muestra siempre el tamaño base
+                    loader = ThumbnailLoader(original_path, self.thumb_signals,
+                                             self._indexed_thumbnail_entry(original_path, THUMBNAIL_SIZE[0]))
                     self.threadpool.start(loader)
 
-    @Slot(str, QPixmap)
-    def _update_thumbnail(self, original_path, pixmap):
+    def _fit_thumbnail(self, pixmap):
+        """
+        Las miniaturas llegan ya en el nivel de la pirámide del zoom actual: en
+        64/128/256 se usan tal cual. Solo en los pasos intermedios se reduce
+        (nunca se amplía) desde el nivel inmediatamente superior.
+        """
+        size = self.current_thumbnail_size
+        if pixmap.width() <= size and pixmap.height() <= size:
+            return pixmap
+        return pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    @Slot(str, QImage)
+    def _update_thumbnail(self, original_path, image):
+        # Los workers mandan QImage: el QPixmap solo se crea aquí, en el hilo de la interfaz
+        pixmap = QPixmap.fromImage(image)
         # ---------------------------------------------------------
         # 1. BLOQUE PARA FOTOS LOCALES
         # ---------------------------------------------------------
         if original_path in self.photo_list_widget_items:
+            self.photo_thumb_jobs.job_done(original_path)
             item = self.photo_list_widget_items[original_path]
-            scaled_pixmap = pixmap.scaled(
-                self.current_thumbnail_size,
-                self.current_thumbnail_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
+            scaled_pixmap = self._fit_thumbnail(pixmap)
             item.setIcon(QIcon(scaled_pixmap))
             item.setSizeHint(scaled_pixmap.size()) # <--- Esto ajusta el tamaño en local
             item.setText("")
@@ -4568,13 +5711,12 @@ class VisageVaultApp(QMainWindow):
         # 2. BLOQUE PARA VÍDEOS
         # ---------------------------------------------------------
         if original_path in self.video_list_widget_items:
+            self.video_thumb_jobs.job_done(original_path)
             item = self.video_list_widget_items[original_path]
-            scaled_pixmap = pixmap.scaled(
-                self.current_thumbnail_size,
-                self.current_thumbnail_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
+            list_widget = item.listWidget()
+            if isinstance(list_widget, VideoPreviewListWidget):
+                list_widget.stop_scrub(item) # Si no, al salir volvería la miniatura anterior
+            scaled_pixmap = self._fit_thumbnail(pixmap)
             item.setIcon(QIcon(scaled_pixmap))
             item.setSizeHint(scaled_pixmap.size())
             item.setText("")
@@ -4637,23 +5779,22 @@ class VisageVaultApp(QMainWindow):
         self._set_status(f"Vista previa: Bajando {name}...")
 
         # --- NUEVA RUTA UNIFICADA ---
-        base_dir = os.path.dirname(os.path.abspath(__file__))
         # visagevault_cache/drive_cache
-        temp_dir = os.path.join(base_dir, "visagevault_cache", "drive_cache")
+        temp_dir = os.path.join(self.root_cache, "drive_cache")
         # ----------------------------
 
         if not os.path.exists(temp_dir): os.makedirs(temp_dir)
         local_path = os.path.join(temp_dir, name)
 
-        # Comprobar Caché
+        # Comprobar Caché (cuenta para las estadísticas y marca el uso para el LRU)
+        drive_cache = cache_manager.get("drive_cache")
+        if drive_cache.lookup(local_path):
+            self._open_preview_dialog(local_path)
+            self._set_status("Vista previa (desde caché).")
+            return
         if os.path.exists(local_path):
-            if os.path.getsize(local_path) == 0:
-                try: os.remove(local_path)
-                except: pass
-            else:
-                self._open_preview_dialog(local_path)
-                self._set_status("Vista previa (desde caché).")
-                return
+            try: os.remove(local_path)
+            except: pass
 
         # Descarga en hilo seguro
         threading.Thread(target=self._download_thread_safe, args=(file_id, local_path), daemon=True).start()
@@ -4715,6 +5856,7 @@ class VisageVaultApp(QMainWindow):
 
         # REFACTOR: Comprobar si es un item de QListWidget de FOTOS
         if original_path in self.photo_list_widget_items:
+            self.photo_thumb_jobs.job_done(original_path)
             item = self.photo_list_widget_items[original_path]
             icon = self.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon) # Icono genérico
             item.setIcon(icon)
@@ -4724,6 +5866,7 @@ class VisageVaultApp(QMainWindow):
 
         # REFACTOR: Comprobar si es un item de QListWidget de VÍDEOS
         if original_path in self.video_list_widget_items:
+            self.video_thumb_jobs.job_done(original_path)
             item = self.video_list_widget_items[original_path]
             icon = self.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon) # Icono genérico
             item.setIcon(icon)
@@ -4870,26 +6013,13 @@ class VisageVaultApp(QMainWindow):
 
         pixmap = QPixmap() # Empezar con un pixmap vacío
 
-        # Definir extensiones RAW (deben coincidir con las de los otros archivos)
-        RAW_EXTENSIONS = ('.nef', '.cr2', '.cr3', '.crw', '.arw', '.srf', '.orf', '.rw2', '.raf', '.pef', '.dng', '.raw')
-        file_suffix = Path(original_path).suffix.lower()
-
         try:
-            if file_suffix in RAW_EXTENSIONS:
-                # 1. Usar rawpy para leer el archivo RAW
-                with rawpy.imread(original_path) as raw:
-                    rgb_array = raw.postprocess()
-
-                # 2. Convertir el array de numpy a QImage
-                height, width, channel = rgb_array.shape
-                bytes_per_line = 3 * width
-                q_image = QImage(rgb_array.data, width, height, bytes_per_line, QImage.Format.Format_RGB888).copy()
-
-                # 3. Convertir QImage a QPixmap
-                pixmap = QPixmap.fromImage(q_image)
+            if is_raw(original_path):
+                # 1. Vista previa incrustada en el RAW (o revelado a media resolución)
+                pixmap = load_raw_pixmap(original_path)
 
             else:
-                # 4. Lógica original para JPG, PNG, etc.
+                # 2. Lógica original para JPG, PNG, etc.
                 pixmap = QPixmap(original_path)
 
             if pixmap.isNull():
@@ -4906,24 +6036,7 @@ class VisageVaultApp(QMainWindow):
     @Slot()
     def _handle_photo_date_changed(self, photo_path: str, new_year: str, new_month: str):
         self._set_status("Metadatos de foto cambiados. Reconstruyendo vista...")
-        path_found_and_removed = False
-        for year, months in self.photos_by_year_month.items():
-            for month, photos in months.items():
-                if photo_path in photos:
-                    photos.remove(photo_path)
-                    path_found_and_removed = True
-                    if not photos:
-                        del self.photos_by_year_month[year][month]
-                    if not self.photos_by_year_month[year]:
-                        del self.photos_by_year_month[year]
-                    break
-            if path_found_and_removed:
-                break
-        if new_year not in self.photos_by_year_month:
-            self.photos_by_year_month[new_year] = {}
-        if new_month not in self.photos_by_year_month[new_year]:
-            self.photos_by_year_month[new_year][new_month] = []
-        self.photos_by_year_month[new_year][new_month].append(photo_path)
+        self._add_to_memory_struct(photo_path, new_year, new_month, self.photos_by_year_month)
         self._display_photos()
 
     @Slot(str)
@@ -4976,6 +6089,9 @@ class VisageVaultApp(QMainWindow):
 
     @Slot(int)
     def _on_tab_changed(self, index):
+        # Las miniaturas que no llegaron a ejecutarse se vuelven a pedir al volver a la pestaña
+        self.photo_thumb_jobs.cancel()
+        self.video_thumb_jobs.cancel()
         self.threadpool.clear()
         tab_name = self.tab_widget.tabText(index)
 
@@ -5007,6 +6123,12 @@ class VisageVaultApp(QMainWindow):
         elif tab_name == "Nube":
             QTimer.singleShot(100, self._load_visible_cloud_thumbnails)
 
+        elif tab_name == "Fotos":
+            QTimer.singleShot(100, self._load_main_visible_thumbnails)
+
+        elif tab_name == "Vídeos":
+            QTimer.singleShot(100, self._load_visible_video_thumbnails)
+
     def _load_people_list(self):
         self.people_tree_widget.clear()
         unknown_item = QTreeWidgetItem(self.people_tree_widget, ["Caras Sin Asignar"])
@@ -5319,6 +6441,7 @@ class VisageVaultApp(QMainWindow):
             self.photo_thread.deleteLater()
         self.photo_thread = None
         self.photo_worker = None
+        self._start_thumbnail_pregen()
 
     @Slot()
     def _on_video_scan_thread_finished(self):
@@ -5327,14 +6450,42 @@ class VisageVaultApp(QMainWindow):
             self.video_thread.deleteLater()
         self.video_thread = None
         self.video_worker = None
+        self._start_thumbnail_pregen()
+
+    @Slot()
+    def _on_fs_delta_thread_finished(self):
+        """Slot de limpieza para el hilo de deltas del vigilante."""
+        if self.fs_delta_thread:
+            self.fs_delta_thread.deleteLater()
+        self.fs_delta_thread = None
+        self.fs_delta_worker = None
+        self._start_thumbnail_pregen()
+
+    @Slot(int)
+    def _handle_thumbnail_pregen_finished(self, generated):
+        # La galería resuelve las nuevas con el índice, sin pasar por el generador
+        self._refresh_thumbnail_index()
+        if generated:
+            self._set_status(f"Miniaturas preparadas: {generated}.")
+
+    @Slot()
+    def _on_thumb_pregen_thread_finished(self):
+        """Slot de limpieza para el hilo de pregeneración de miniaturas."""
+        if self.thumb_pregen_thread:
+            self.thumb_pregen_thread.deleteLater()
+        self.thumb_pregen_thread = None
+        self.thumb_pregen_worker = None
+        if self.thumb_pregen_pending:
+            self._start_thumbnail_pregen()
 
     @Slot()
     def _on_face_scan_thread_finished(self):
         self.face_scan_thread = None
         self.face_scan_worker = None
 
-    @Slot(int, QPixmap, str)
-    def _handle_face_loaded(self, face_id: int, pixmap: QPixmap, photo_path: str):
+    @Slot(int, QImage, str)
+    def _handle_face_loaded(self, face_id: int, image: QImage, photo_path: str):
+        pixmap = QPixmap.fromImage(image)
         placeholder = None
         for i in range(self.unknown_faces_layout.count()):
             widget = self.unknown_faces_layout.itemAt(i).widget()
@@ -5383,16 +6534,34 @@ class VisageVaultApp(QMainWindow):
             config_manager.set_thumbnail_size(self.current_thumbnail_size)
         except Exception: pass
 
-        # 2. Parar vigilante
+        # 2. Parar vigilante (y el latido: los workers que queden terminan sin frenos)
         if self.file_watcher:
             self.file_watcher.stop()
+        self.ui_heartbeat_timer.stop()
+        scheduler.stop_heartbeat()
 
-        # 3. Limpiar cola de miniaturas
+        # Miniaturas generadas en esta sesión: al índice, para el próximo arranque
+        try:
+            self.db.save_thumbnails(drain_generated_thumbnails())
+        except Exception: pass
+
+        # 3. Limpiar cola de miniaturas (y lo pendiente en los procesos de decodificación)
+        self.photo_thumb_jobs.discard()
+        self.video_thumb_jobs.discard()
         self.threadpool.clear()
+        decode_pool.shutdown()
+
+        # 3b. Deltas del vigilante (son pocas filas, terminan enseguida)
+        if self.fs_delta_thread and self.fs_delta_thread.isRunning():
+            self.fs_delta_thread.quit()
+            self.fs_delta_thread.wait(1000)
 
         # 4. DETENER WORKERS DE ESCANEO (FOTOS Y VÍDEOS)
         # Corrección: Si no paran a tiempo, usamos terminate() para evitar el core dump.
-        for thread, worker_name in [(self.photo_thread, 'photo_worker'), (self.video_thread, 'video_worker')]:
+        # No se pierde el trabajo: el recorrido y cada lote guardado son checkpoints
+        # (tablas directories + scan_queue) y el próximo arranque continúa desde ahí.
+        for thread, worker_name in [(self.photo_thread, 'photo_worker'), (self.video_thread, 'video_worker'),
+                                    (self.thumb_pregen_thread, 'thumb_pregen_worker')]:
             if thread and thread.isRunning():
                 worker = getattr(self, worker_name, None)
                 if worker:
@@ -5602,7 +6771,10 @@ class VisageVaultApp(QMainWindow):
 
         # IMPORTANTE: Limpiar referencias a widgets antiguos para evitar RuntimeError
         self.photo_group_widgets.clear()
+        self.photo_month_lists = {}
+        self.photo_year_items = {}
         self.photo_list_widget_items.clear()
+        self.photo_thumb_jobs.discard()
 
         title = QLabel("Fotos Ocultas")
         title.setStyleSheet("font-size: 18pt; color: red; font-weight: bold; margin: 20px;")
@@ -5654,7 +6826,10 @@ class VisageVaultApp(QMainWindow):
             item = self.video_container_layout.takeAt(0)
             if item.widget(): item.widget().deleteLater()
 
+        self.video_month_lists = {}
+        self.video_year_items = {}
         self.video_list_widget_items.clear()
+        self.video_thumb_jobs.discard()
 
         title = QLabel("Vídeos Ocultos")
         title.setStyleSheet("font-size: 18pt; color: red; font-weight: bold; margin: 20px;")
@@ -5703,6 +6878,11 @@ class VisageVaultApp(QMainWindow):
         dialog = HelpDialog(self)
         dialog.exec()
 
+    @Slot()
+    def _open_cache_stats_dialog(self):
+        dialog = CacheStatsDialog(self)
+        dialog.exec()
+
     def _remove_red_eyes_for_selected(self, items):
         """Aplica la corrección de ojos rojos a los elementos seleccionados."""
         count = len(items)
@@ -5721,6 +6901,7 @@ class VisageVaultApp(QMainWindow):
 
         processed = 0
         successes = 0
+        corrected_paths = []
 
         paths_to_update = [item.data(Qt.UserRole) for item in items]
         total = len(paths_to_update)
@@ -5731,22 +6912,20 @@ class VisageVaultApp(QMainWindow):
 
             if self._remove_red_eye_from_image(path):
                 successes += 1
+                corrected_paths.append(path)
 
-                # Borrar miniatura antigua de la caché para obligar a regenerarla
-                # (Asumiendo que importaste hashlib y THUMBNAIL_DIR de thumbnail_generator o copiaste la lógica)
-                # Una forma rápida sin importar es borrarla si sabemos la ruta,
-                # o simplemente recargar el loader que la regenerará si detecta cambio (depende de tu implementación).
-                # Aquí simplemente recargamos la vista.
+                # Borrar miniatura antigua de la caché para obligar a regenerarla.
+                # Las caras siguen en su sitio: se acepta la huella nueva sin invalidarlas.
+                invalidate_thumbnail(path, self.db.pop_thumbnail_keys([path]).get(path))
+                self.db.refresh_fingerprint(path)
 
             processed += 1
 
         self._set_status(f"Proceso finalizado. {successes} fotos corregidas de {processed}.")
 
         if successes > 0:
-            # Refrescar la vista actual para ver cambios (o regenerar thumbnails)
-            # Lo ideal sería invalidar la caché de thumbnails de estas fotos específicas
-            # Como solución simple, recargamos la vista:
-            self._display_photos()
+            # Refrescar solo las miniaturas de las fotos corregidas
+            self._handle_artifacts_invalidated(corrected_paths)
 
     @Slot()
     def _on_gdrive_login_click(self):
@@ -5809,7 +6988,16 @@ class VisageVaultApp(QMainWindow):
         cache_snapshot = os.path.join(self.root_cache, "drive_snapshot_cache")
         cache_full = os.path.join(self.root_cache, "drive_cache")
 
-        for folder_path in [cache_snapshot, cache_full]:
+        # Miniaturas de Drive: el almacén empaquetado se vacía sin borrar su índice abierto
+        try:
+            snapshot_store = open_store(cache_snapshot)
+            snapshot_store.clear()
+            decoded_images.clear(str(snapshot_store.directory))
+            print(f"Caché purgado: {cache_snapshot}")
+        except Exception as e:
+            print(f"Error purgado caché {cache_snapshot}: {e}")
+
+        for folder_path in [cache_full]:
             if os.path.exists(folder_path):
                 try:
                     # Borramos la carpeta ENTERA y su contenido
@@ -6063,8 +7251,6 @@ class VisageVaultApp(QMainWindow):
         self.drive_scan_worker = DriveScanWorker(folder_id, self.db.db_path)
         self.drive_scan_worker.moveToThread(self.drive_scan_thread)
 
-        self.set_drive_priority_low.connect(self.drive_scan_worker.set_slow_mode)
-
         self.drive_scan_thread.started.connect(self.drive_scan_worker.run)
 
         # CAMBIO: Ya no conectamos items_found porque lo hemos quitado
@@ -6285,7 +7471,9 @@ class VisageVaultApp(QMainWindow):
         """Detiene de forma SEGURA cualquier descarga o escaneo."""
         self._set_status("Deteniendo operaciones actuales...")
 
-        # 1. Vaciar cola de descargas de miniaturas
+        # 1. Vaciar cola de descargas de miniaturas (el threadpool es compartido)
+        self.photo_thumb_jobs.cancel()
+        self.video_thumb_jobs.cancel()
         self.threadpool.clear()
 
         # 2. Detener escáner de carpetas si existe
@@ -6363,8 +7551,8 @@ class VisageVaultApp(QMainWindow):
     def _launch_folder_loader(self, folder_id, parent_item):
         """Crea y lanza el hilo para buscar carpetas."""
 
-        # 1. ¡SEMÁFORO ROJO! Decimos al descargador de fotos que se calme
-        self.set_drive_priority_low.emit(True)
+        # 1. ¡SEMÁFORO ROJO! Los workers en segundo plano ceden el paso hasta que lleguen las carpetas
+        scheduler.begin_busy()
 
         thread = QThread()
         worker = FolderLoaderWorker(folder_id, parent_item)
@@ -6389,7 +7577,7 @@ class VisageVaultApp(QMainWindow):
     def _on_folders_loaded(self, folders, parent_item):
         """Recibe la lista de carpetas y actualiza el árbol."""
 
-        self.set_drive_priority_low.emit(False)
+        scheduler.end_busy()
 
         # Si parent_item es Root (invisible), limpiamos el mensaje de "Cargando..." si lo hubiera
         if parent_item == self.cloud_folder_tree.invisibleRootItem():
@@ -6623,6 +7811,8 @@ class VisageVaultApp(QMainWindow):
 
     def _lock_safe(self):
         self.current_safe_password = None
+        # Las miniaturas desencriptadas no se quedan en RAM con la caja cerrada
+        decoded_images.clear("safe")
         # Limpiar grid visualmente por seguridad
         while self.safe_grid.count():
             item = self.safe_grid.takeAt(0)
@@ -6699,43 +7889,50 @@ class VisageVaultApp(QMainWindow):
                     item.setText("")
                     item.setData(Qt.UserRole, row)
 
-                    pixmap = QPixmap()
                     loaded = False
 
                     # --- INTENTO DE CARGA DE IMAGEN (FOTO O THUMBNAIL DE VIDEO) ---
-                    img_bytes = None
+                    # Ya reducida en la caché de RAM: sin volver a desencriptar
+                    image = decoded_images.get("safe", (encrypted_path, thumb_size))
                     try:
-                        if media_type == 'photo':
-                            # Desencriptar la foto en sí
-                            img_bytes = CryptoManager.decrypt_to_bytes(encrypted_path, self.current_safe_password)
-                        elif media_type == 'video':
-                            # Desencriptar el THUMBNAIL asociado (.thumb)
-                            thumb_enc_path = encrypted_path + ".thumb"
-                            if os.path.exists(thumb_enc_path):
-                                img_bytes = CryptoManager.decrypt_to_bytes(thumb_enc_path, self.current_safe_password)
-
-                        if img_bytes:
-                            pixmap.loadFromData(img_bytes)
-                            if not pixmap.isNull():
-                                scaled = pixmap.scaled(thumb_size, thumb_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-                                # Si es vídeo, pintamos el icono de PLAY encima de la foto
-                                if media_type == 'video':
-                                    painter = QPainter(scaled)
-                                    icon = self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
-                                    icon_dim = int(thumb_size * 0.4)
-                                    x = (scaled.width() - icon_dim) // 2
-                                    y = (scaled.height() - icon_dim) // 2
-                                    # Pintar un fondo semitransparente para que se vea el play
-                                    painter.setBrush(QColor(0, 0, 0, 128))
-                                    painter.setPen(Qt.NoPen)
-                                    painter.drawEllipse(x, y, icon_dim, icon_dim)
-                                    icon.paint(painter, x, y, icon_dim, icon_dim)
-                                    painter.end()
-
-                                item.setIcon(QIcon(scaled))
-                                item.setSizeHint(scaled.size())
-                                loaded = True
+                        if image is None:
+                            img_bytes = None
+                            if media_type == 'photo':
+                                # Desencriptar la foto en sí
+                                img_bytes = CryptoManager.decrypt_to_bytes(encrypted_path, self.current_safe_password)
+                            elif media_type == 'video':
+                                # Desencriptar el THUMBNAIL asociado (.thumb)
+                                thumb_enc_path = encrypted_path + ".thumb"
+                                if os.path.exists(thumb_enc_path):
+                                    img_bytes = CryptoManager.decrypt_to_bytes(thumb_enc_path, self.current_safe_password)
+
+                            if img_bytes:
+                                image = QImage()
+                                image.loadFromData(img_bytes)
+                                if not image.isNull():
+                                    image = image.scaled(thumb_size, thumb_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                                    decoded_images.put("safe", (encrypted_path, thumb_size), image, encrypted_path)
+
+                        if image is not None and not image.isNull():
+                            scaled = QPixmap.fromImage(image)
+
+                            # Si es vídeo, pintamos el icono de PLAY encima de la foto
+                            if media_type == 'video':
+                                painter = QPainter(scaled)
+                                icon = self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
+                                icon_dim = int(thumb_size * 0.4)
+                                x = (scaled.width() - icon_dim) // 2
+                                y = (scaled.height() - icon_dim) // 2
+                                # Pintar un fondo semitransparente para que se vea el play
+                                painter.setBrush(QColor(0, 0, 0, 128))
+                                painter.setPen(Qt.NoPen)
+                                painter.drawEllipse(x, y, icon_dim, icon_dim)
+                                icon.paint(painter, x, y, icon_dim, icon_dim)
+                                painter.end()
+
+                            item.setIcon(QIcon(scaled))
+                            item.setSizeHint(scaled.size())
+                            loaded = True
                     except: pass
 
                     # --- FALLBACK (Si no hay thumb o falló) ---
@@ -6938,6 +8135,7 @@ class VisageVaultApp(QMainWindow):
 
     def _restore_from_safe(self, encrypted_path):
         """Restaura un archivo y recupera su fecha personalizada en la BD y el sistema."""
+        decoded_images.invalidate_path(encrypted_path)
         # 1. Buscar info en DB
         cursor = self.db.conn.execute("SELECT * FROM safe_files WHERE encrypted_path = ?", (encrypted_path,))
         row = cursor.fetchone()
@@ -7243,4 +8441,6 @@ def run_visagevault():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Procesos de decodificación (decode_pool) en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     run_visagevault()
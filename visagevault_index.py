@@ -0,0 +1,300 @@
+# visagevault_index.py
+# Indexador de consola: el mismo escaneo de fotos/vídeos, miniaturas y caras
+# que hace la interfaz, pero sin Qt. Sirve para pre-indexar un archivo nuevo
+# desde cron o por SSH antes de abrir la App. Escribe en la misma visagevault.db
+# y en la misma caché de miniaturas, así que la App arranca ya con todo hecho.
+#
+# Uso:
+#   python visagevault_index.py /ruta/fotos [--thumbs] [--faces] [--workers 8]
+#   python -m visagevault_index /ruta/fotos --thumbs --faces
+#
+# La carpeta debe ser la misma que la configurada en la App: al escanear, lo
+# que no está en la carpeta se borra de la BD (igual que hacen los workers).
+# Se puede interrumpir con Ctrl+C: el recorrido va por checkpoints y los
+# lotes ya guardados no se repiten en la siguiente ejecución.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import config_manager
+from db_manager import VisageVaultDB
+from photo_finder import MediaCrawl, fingerprint, compare_fingerprint
+from metadata_reader import get_photo_dates, get_video_date, parse_date_from_filename, DATE_READER_WORKERS
+
+# Fotos/vídeos nuevos que se guardan por transacción (como SCAN_BATCH_SIZE en la App)
+SAVE_BATCH_SIZE = 500
+
+
+class IndexStats:
+    """Tiempos y contadores por fase para el resumen final."""
+
+    def __init__(self):
+        self.phases = []    # [(fase, elementos, segundos)]
+        self.counters = {}
+
+    def add_phase(self, name, items, seconds):
+        self.phases.append((name, items, seconds))
+
+    def count(self, key, amount=1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def report(self):
+        print()
+        print(f"{'fase':<14} {'elementos':>10} {'segundos':>10} {'por segundo':>12}")
+        total_time = 0.0
+        for name, items, seconds in self.phases:
+            total_time += seconds
+            rate = items / seconds if seconds > 0 else 0.0
+            print(f"{name:<14} {items:>10} {seconds:>10.2f} {rate:>12.1f}")
+        print(f"{'total':<14} {'':>10} {total_time:>10.2f}")
+        if self.counters:
+            print()
+            for key, value in self.counters.items():
+                print(f"  {key}: {value}")
+
+
+def _restat_queued(stats_on_disk, path, vanished):
+    """Archivos de la cola de un escaneo interrumpido (stat None): se vuelven a mirar."""
+    stat_result = stats_on_disk[path]
+    if stat_result is None:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            vanished.append(path)
+    return stat_result
+
+
+def _video_date(item):
+    path, stat_result = item
+    year, month = parse_date_from_filename(path)
+    if not year:
+        year, month = get_video_date(path, stat_result)
+    return year, month
+
+
+def index_photos(db, directory, photo_stats_on_disk, pool, stats):
+    """Mismo criterio que PhotoFinderWorker. Devuelve las rutas editadas en disco."""
+    db_dates = db.load_all_photo_dates()
+    db_fingerprints = db.load_photo_fingerprints()
+
+    new_items = []
+    fingerprints_to_adopt = []
+    photos_changed_on_disk = []
+    vanished_from_queue = []
+    for path, stat_result in photo_stats_on_disk.items():
+        if path in db_dates:
+            if stat_result is not None:
+                current = fingerprint(stat_result)
+                state = compare_fingerprint(db_fingerprints.get(path), current)
+                if state == 'unknown':
+                    fingerprints_to_adopt.append(current + (path,))
+                elif state == 'changed':
+                    photos_changed_on_disk.append(current + (path,))
+            continue
+        stat_result = _restat_queued(photo_stats_on_disk, path, vanished_from_queue)
+        if stat_result is not None:
+            new_items.append((path, stat_result))
+
+    start = time.perf_counter()
+    for offset in range(0, len(new_items), SAVE_BATCH_SIZE):
+        chunk = new_items[offset:offset + SAVE_BATCH_SIZE]
+        dates = get_photo_dates(chunk, pool)
+        db.bulk_upsert_photos([
+            (path, *dates[path]) + fingerprint(stat_result) for path, stat_result in chunk
+        ])
+        print(f"  Fotos nuevas: {offset + len(chunk)}/{len(new_items)}", end="\r", flush=True)
+    if new_items:
+        print()
+    stats.add_phase("fotos nuevas", len(new_items), time.perf_counter() - start)
+
+    paths_to_delete = list(set(db_dates) - set(photo_stats_on_disk))
+    if not os.path.isdir(directory):
+        # Unidad desmontada o NAS caído: el recorrido sale vacío, no es un borrado
+        paths_to_delete = []
+    db.bulk_delete_photos(paths_to_delete)
+    db.update_photo_fingerprints(fingerprints_to_adopt)
+    db.remove_from_scan_queue(vanished_from_queue)
+    if photos_changed_on_disk:
+        db.update_photo_fingerprints(photos_changed_on_disk, invalidate=True)
+
+    stats.count("fotos nuevas", len(new_items))
+    stats.count("fotos editadas", len(photos_changed_on_disk))
+    stats.count("fotos eliminadas", len(paths_to_delete))
+    return [row[3] for row in photos_changed_on_disk]
+
+
+def index_videos(db, directory, video_stats_on_disk, pool, stats):
+    """Mismo criterio que VideoFinderWorker. Devuelve las rutas editadas en disco."""
+    db_dates = db.load_all_video_dates()
+    db_fingerprints = db.load_video_fingerprints()
+
+    new_items = []
+    fingerprints_to_update = []
+    videos_changed_on_disk = []
+    vanished_from_queue = []
+    for path, stat_result in video_stats_on_disk.items():
+        if path in db_dates:
+            if stat_result is not None:
+                current = fingerprint(stat_result)
+                state = compare_fingerprint(db_fingerprints.get(path), current)
+                if state != 'same':
+                    fingerprints_to_update.append(current + (path,))
+                if state == 'changed':
+                    videos_changed_on_disk.append(path)
+            continue
+        stat_result = _restat_queued(video_stats_on_disk, path, vanished_from_queue)
+        if stat_result is not None:
+            new_items.append((path, stat_result))
+
+    start = time.perf_counter()
+    for offset in range(0, len(new_items), SAVE_BATCH_SIZE):
+        chunk = new_items[offset:offset + SAVE_BATCH_SIZE]
+        dates = list(pool.map(_video_date, chunk))
+        db.bulk_upsert_videos([
+            (path, year, month) + fingerprint(stat_result)
+            for (path, stat_result), (year, month) in zip(chunk, dates)
+        ])
+    stats.add_phase("vídeos nuevos", len(new_items), time.perf_counter() - start)
+
+    paths_to_delete = list(set(db_dates) - set(video_stats_on_disk))
+    if not os.path.isdir(directory):
+        paths_to_delete = []
+    db.bulk_delete_videos(paths_to_delete)
+    db.update_video_fingerprints(fingerprints_to_update)
+    db.remove_from_scan_queue(vanished_from_queue)
+
+    stats.count("vídeos nuevos", len(new_items))
+    stats.count("vídeos editados", len(videos_changed_on_disk))
+    stats.count("vídeos eliminados", len(paths_to_delete))
+    return videos_changed_on_disk
+
+
+def generate_thumbnails(db, photo_stats_on_disk, video_stats_on_disk, changed_paths, workers, stats):
+    """Miniaturas de toda la biblioteca en paralelo (las ya cacheadas se saltan al momento)."""
+    from thumbnail_generator import (
+        generate_image_thumbnail, generate_video_thumbnail, invalidate_thumbnail,
+        drain_generated_thumbnails, get_thumbnail_store
+    )
+    stale_keys = db.pop_thumbnail_keys(changed_paths)
+    for path in changed_paths:
+        invalidate_thumbnail(path, stale_keys.get(path))
+
+    start = time.perf_counter()
+    jobs = [(generate_image_thumbnail, p, st) for p, st in photo_stats_on_disk.items()]
+    jobs += [(generate_video_thumbnail, p, st) for p, st in video_stats_on_disk.items()]
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, path, stat_result) for func, path, stat_result in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            if future.result() is None:
+                failed += 1
+            if done % 100 == 0 or done == len(futures):
+                print(f"  Miniaturas: {done}/{len(futures)}", end="\r", flush=True)
+    if jobs:
+        print()
+    # Índice de miniaturas: la App las resuelve con una consulta al arrancar
+    db.save_thumbnails(drain_generated_thumbnails())
+    stats.add_phase("miniaturas", len(jobs), time.perf_counter() - start)
+    stats.count("miniaturas fallidas", failed)
+
+    # Los huecos de las miniaturas invalidadas se recuperan aquí, sin la App abierta
+    start = time.perf_counter()
+    freed = get_thumbnail_store().compact()
+    stats.add_phase("compactación", 1, time.perf_counter() - start)
+    stats.count("bytes liberados", freed)
+
+
+def scan_faces(db, workers, stats):
+    """
+    Escaneo de caras de las fotos pendientes, en procesos (dlib es CPU pura).
+    Cada foto se guarda con save_face_scan_result: interrumpir no deja caras a medias.
+    """
+    from face_scanner import detect_faces, warm_up
+
+    unscanned = db.get_unscanned_photos()
+    start = time.perf_counter()
+    faces_found = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_up) as pool:
+        future_to_photo = {
+            pool.submit(detect_faces, row['filepath']): row['id'] for row in unscanned
+        }
+        for done, future in enumerate(as_completed(future_to_photo), 1):
+            photo_id = future_to_photo[future]
+            try:
+                faces = future.result() or []
+                db.save_face_scan_result(photo_id, faces)
+                faces_found += len(faces)
+            except Exception:
+                db.mark_photo_as_scanned(photo_id)
+            if done % 10 == 0 or done == len(future_to_photo):
+                print(f"  Caras: {done}/{len(future_to_photo)} fotos", end="\r", flush=True)
+    if unscanned:
+        print()
+    stats.add_phase("caras", len(unscanned), time.perf_counter() - start)
+    stats.count("caras encontradas", faces_found)
+
+
+def run_index(directory, db_path, workers, scan_workers=None, thumbs=False, faces=False):
+    stats = IndexStats()
+    db = VisageVaultDB(db_path)
+    try:
+        if scan_workers is None:
+            scan_workers = config_manager.get_scan_workers()
+        crawl = MediaCrawl(directory, consumers=1, workers=scan_workers)
+
+        print(f"Recorriendo {directory}...")
+        start = time.perf_counter()
+        photo_stats_on_disk, video_stats_on_disk = crawl.get(db)
+        stats.add_phase("recorrido", len(photo_stats_on_disk) + len(video_stats_on_disk),
+                        time.perf_counter() - start)
+        print(f"  {len(photo_stats_on_disk)} fotos y {len(video_stats_on_disk)} vídeos")
+
+        with ThreadPoolExecutor(max_workers=max(workers, DATE_READER_WORKERS)) as pool:
+            changed_photos = index_photos(db, directory, photo_stats_on_disk, pool, stats)
+            changed_videos = index_videos(db, directory, video_stats_on_disk, pool, stats)
+        crawl.mark_done(db)
+
+        if thumbs:
+            print("Generando miniaturas...")
+            generate_thumbnails(db, photo_stats_on_disk, video_stats_on_disk,
+                                changed_photos + changed_videos, workers, stats)
+        if faces:
+            print("Buscando caras...")
+            scan_faces(db, workers, stats)
+    finally:
+        stats.report()
+        db.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexa una carpeta de VisageVault sin abrir la interfaz")
+    parser.add_argument("directory", nargs="?", default=None,
+                        help="Carpeta a indexar (por defecto, la configurada en la App)")
+    parser.add_argument("--thumbs", action="store_true", help="Generar también las miniaturas")
+    parser.add_argument("--faces", action="store_true", help="Escanear también las caras")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                        help="Hilos/procesos para fechas, miniaturas y caras")
+    parser.add_argument("--scan-workers", type=int, default=None,
+                        help="Hilos del recorrido de carpetas (0 = automático, solo en red)")
+    parser.add_argument("--db", default=None, help="Ruta de visagevault.db (por defecto, la de la App)")
+    args = parser.parse_args()
+
+    directory = args.directory or config_manager.get_photo_directory()
+    if not directory or not os.path.isdir(directory):
+        parser.error(f"La carpeta no existe: {directory!r}")
+    directory = os.path.abspath(directory)
+
+    try:
+        run_index(directory, args.db or config_manager.get_db_path(), max(1, args.workers),
+                  args.scan_workers, thumbs=args.thumbs, faces=args.faces)
+    except KeyboardInterrupt:
+        print("\nInterrumpido: lo guardado se conserva y la próxima ejecución continúa desde ahí.")
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())